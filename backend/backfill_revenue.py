@@ -0,0 +1,55 @@
+"""
+Rebuild the revenue rollups from payment history
+
+Usage:
+    python backfill_revenue.py [--since 2026-01-01]
+
+Copies completed donations, subscription payments and (with
+STATE_BACKEND=mongo) report orders into revenue_events, then regroups the
+events into the daily revenue_rollups buckets. Both steps are ``$merge``
+aggregations that run inside MongoDB (5.0+ for $dateTrunc). Safe to re-run:
+payments already recorded are kept and the buckets are recomputed, not added to.
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+
+from services.revenue_rollups import backfill
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url)
+db = client[os.environ['DB_NAME']]
+
+def print_progress(collection, added):
+    print(f"  {collection}: {added} new payments")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Backfill revenue rollups")
+    parser.add_argument("--since", type=datetime.fromisoformat,
+                        help="only payments on or after this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    try:
+        print(f"Backfilling revenue {'since ' + args.since.date().isoformat() if args.since else 'from all history'}...")
+        report = await backfill(db, since=args.since, progress=print_progress)
+
+        print(f"\n✓ revenue_events: {report['events_before']} -> {report['events_after']}")
+        print(f"✓ {report['buckets']} daily buckets rebuilt")
+        if os.environ.get("STATE_BACKEND", "memory").lower() != "mongo":
+            print("✗ STATE_BACKEND is not mongo: report orders and plan subscriptions "
+                  "only count from when they are verified")
+    except Exception as e:
+        print(f"Error during revenue backfill: {str(e)}")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,432 @@
+"""
+Synthetic data generator for production-scale performance testing
+
+Fills a scratch database with users, user_votes, product_suggestions,
+test_reports, blog_posts, donations and user_subscriptions in the shapes the
+API writes them, with skewed rather than uniform distributions:
+
+- signups follow a growth trend with yearly (festive season / new year) and
+  weekly seasonality
+- votes per product suggestion follow a Zipf distribution, so a few
+  suggestions collect most of the votes and cross the vote threshold
+- blog views are log-normal, donation amounts cluster on common values
+
+Documents are written with batched insert_many from parallel workers and the
+script reports the insert rate per collection plus data/index sizes.
+
+Usage:
+    python benchmarks/generate_data.py [--scale 1.0] [--workers 4] [--batch-size 1000]
+                                       [--users N] [--votes N] [--drop] [--seed 42]
+
+The target database is BENCH_DB_NAME, defaulting to "<DB_NAME>_perf"; start
+the server with DB_NAME set to it to profile against the generated data.
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import struct
+import sys
+import time
+import uuid
+from array import array
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+load_dotenv(ROOT_DIR / '.env')
+
+from auth import get_password_hash
+from seed_data import test_reports_data, blog_posts_data
+from seed_subscriptions import subscription_tiers
+
+COLLECTIONS = [
+    "users", "user_votes", "product_suggestions", "test_reports",
+    "blog_posts", "donations", "user_subscriptions"
+]
+
+# Document counts at --scale 1.0
+DEFAULT_COUNTS = {
+    "users": 100_000,
+    "suggestions": 2_000,
+    "votes": 500_000,
+    "reports": 5_000,
+    "posts": 2_000,
+    "donations": 20_000,
+    "subscriptions": 15_000,
+}
+
+# Signup seasonality: relative weight per calendar month and per weekday
+MONTH_WEIGHTS = {1: 1.3, 2: 1.0, 3: 0.9, 4: 0.9, 5: 0.8, 6: 0.8, 7: 0.9, 8: 1.0, 9: 1.1, 10: 1.4, 11: 1.4, 12: 1.1}
+WEEKDAY_WEIGHTS = (1.0, 1.0, 1.0, 1.0, 0.9, 0.7, 0.8)
+
+CATEGORIES = ["Dairy", "Cooking Oil", "Spices", "Sweeteners", "Baby Food", "Beverages", "Grains", "Snacks"]
+BRANDS = ["Amul", "Mother Dairy", "Dabur", "Patanjali", "Fortune", "Tata", "Aashirvaad", "Everest", "MDH", "Nestle"]
+PRODUCTS = ["Milk", "Ghee", "Paneer", "Honey", "Mustard Oil", "Turmeric Powder", "Chilli Powder", "Atta", "Tea", "Cerelac"]
+FIRST_NAMES = ["Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Meera", "Arjun", "Kavya", "Rahul", "Sneha", "Karan", "Divya"]
+LAST_NAMES = ["Sharma", "Patel", "Singh", "Iyer", "Reddy", "Gupta", "Nair", "Das", "Mehta", "Rao"]
+DONATION_AMOUNTS = (100, 251, 500, 501, 1000, 1100, 2100, 5000, 11000)
+DONATION_AMOUNT_WEIGHTS = (20, 10, 25, 8, 18, 6, 6, 5, 2)
+TIER_WEIGHTS = {"Basic": 6, "Premium": 3, "Annual": 1}
+
+# A product_suggestions document stores its voters inline; keep it well under 16MB
+MAX_VOTERS_PER_SUGGESTION = 100_000
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic ChoosePure data")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier applied to every default count")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--suggestions", type=int)
+    parser.add_argument("--votes", type=int)
+    parser.add_argument("--reports", type=int)
+    parser.add_argument("--posts", type=int)
+    parser.add_argument("--donations", type=int)
+    parser.add_argument("--subscriptions", type=int)
+    parser.add_argument("--days", type=int, default=730, help="history span ending today")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent for votes per suggestion")
+    parser.add_argument("--vote-threshold", type=int, default=350)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--drop", action="store_true", help="empty the target collections first")
+    args = parser.parse_args()
+
+    for name, count in DEFAULT_COUNTS.items():
+        if getattr(args, name) is None:
+            setattr(args, name, max(1, int(count * args.scale)))
+    return args
+
+def make_object_id(timestamp: float, tag: int, index: int) -> ObjectId:
+    """Deterministic ObjectId whose embedded time matches the document's created_at."""
+    return ObjectId(struct.pack(">IB", int(timestamp), tag) + index.to_bytes(7, "big"))
+
+class SignupCalendar:
+    """Samples timestamps from a seasonal, growing daily signup curve."""
+
+    def __init__(self, rng, days: int, growth: float = 4.0):
+        self.rng = rng
+        self.end = datetime.utcnow()
+        self.start = self.end - timedelta(days=days)
+        self.start_ts = self.start.timestamp()
+        self.end_ts = self.end.timestamp()
+        self.day_starts = []
+        weights = []
+        for day in range(days):
+            date = self.start + timedelta(days=day)
+            trend = math.exp(math.log(growth) * day / days)
+            weights.append(trend * MONTH_WEIGHTS[date.month] * WEEKDAY_WEIGHTS[date.weekday()])
+            self.day_starts.append(self.start_ts + day * 86400)
+        self.cum_weights = list(_accumulate(weights))
+
+    def sample(self, count: int) -> list:
+        days = self.rng.choices(self.day_starts, cum_weights=self.cum_weights, k=count)
+        return [day + self.rng.random() * 86400 for day in days]
+
+    def after(self, timestamp: float) -> float:
+        """Uniform time between timestamp and now."""
+        return timestamp + self.rng.random() * max(0.0, self.end_ts - timestamp)
+
+def _accumulate(values):
+    total = 0.0
+    for value in values:
+        total += value
+        yield total
+
+def zipf_counts(total: int, buckets: int, exponent: float, cap: int) -> list:
+    """Split total across buckets proportionally to 1/rank**exponent, capped per bucket."""
+    weights = [1 / (rank ** exponent) for rank in range(1, buckets + 1)]
+    scale = total / sum(weights)
+    return [min(cap, int(round(weight * scale))) for weight in weights]
+
+class BatchWriter:
+    """
+    Buffers documents per collection and hands full batches to a pool of
+    insert_many workers through a bounded queue, so generation and writes
+    overlap without unbounded memory growth.
+    """
+
+    def __init__(self, db, workers: int, batch_size: int):
+        self.db = db
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        self.buffers = {name: [] for name in COLLECTIONS}
+        self.inserted = {name: 0 for name in COLLECTIONS}
+        self.insert_seconds = {name: 0.0 for name in COLLECTIONS}
+        self.errors = 0
+        self.started = time.perf_counter()
+        self.last_progress = self.started
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(workers)]
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            name, docs = item
+            start = time.perf_counter()
+            try:
+                result = await self.db[name].insert_many(docs, ordered=False)
+                self.inserted[name] += len(result.inserted_ids)
+            except Exception as e:
+                self.errors += 1
+                print(f"✗ insert_many into {name} failed: {str(e)[:200]}")
+            self.insert_seconds[name] += time.perf_counter() - start
+
+    async def add(self, name: str, doc: dict):
+        buffer = self.buffers[name]
+        buffer.append(doc)
+        if len(buffer) >= self.batch_size:
+            self.buffers[name] = []
+            await self.queue.put((name, buffer))
+            self._maybe_print_progress()
+
+    def _maybe_print_progress(self):
+        now = time.perf_counter()
+        if now - self.last_progress >= 5:
+            self.last_progress = now
+            total = sum(self.inserted.values())
+            print(f"  {total:,} documents, {total / (now - self.started):,.0f} docs/s")
+
+    async def close(self):
+        for name, buffer in self.buffers.items():
+            if buffer:
+                await self.queue.put((name, buffer))
+        for _ in self.workers:
+            await self.queue.put(None)
+        await asyncio.gather(*self.workers)
+
+def fake_person(rng, index: int) -> dict:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return {
+        "name": f"{first} {last}",
+        "email": f"{first.lower()}.{last.lower()}.{index}@example.com",
+        "mobile": f"9{rng.randrange(10**8, 10**9)}",
+    }
+
+async def generate_users(writer, rng, signups, password_hash: str):
+    for index, created in enumerate(signups):
+        doc = fake_person(rng, index)
+        doc.update({
+            "_id": make_object_id(created, 1, index),
+            "password": password_hash,
+            "role": "member",
+            "created_at": datetime.utcfromtimestamp(created),
+            "last_login": datetime.utcfromtimestamp(rng.uniform(created, time.time())),
+        })
+        await writer.add("users", doc)
+
+async def generate_suggestions_and_votes(writer, rng, args, calendar, signups):
+    """Suggestions in popularity order with their Zipf share of votes."""
+    def user_id_for(index):
+        return str(make_object_id(signups[index], 1, index))
+
+    counts = zipf_counts(args.votes, args.suggestions, args.zipf, min(len(signups), MAX_VOTERS_PER_SUGGESTION))
+
+    for rank, vote_count in enumerate(counts):
+        created = calendar.sample(1)[0]
+        suggestion_id = make_object_id(created, 2, rank)
+        suggestion_key = str(suggestion_id)
+
+        voters = []
+        for user_index in rng.sample(range(len(signups)), vote_count):
+            voted = datetime.utcfromtimestamp(calendar.after(max(created, signups[user_index])))
+            user_id = user_id_for(user_index)
+            voters.append(user_id)
+            await writer.add("user_votes", {
+                "user_id": user_id,
+                "product_suggestion_id": suggestion_key,
+                "voted_at": voted,
+                "month_year": voted.strftime("%Y-%m"),
+            })
+
+        status = "voting"
+        completed_at = None
+        if vote_count >= args.vote_threshold:
+            status = rng.choice(["testing", "completed"])
+            if status == "completed":
+                completed_at = datetime.utcfromtimestamp(calendar.after(created))
+
+        suggested_by_admin = rng.random() < 0.1
+        await writer.add("product_suggestions", {
+            "_id": suggestion_id,
+            "product_name": f"{rng.choice(BRANDS)} {rng.choice(PRODUCTS)}",
+            "brand": rng.choice(BRANDS),
+            "category": rng.choice(CATEGORIES),
+            "description": "Community request to test for adulterants and label accuracy",
+            "suggested_by": "admin" if suggested_by_admin else user_id_for(rng.randrange(len(signups))),
+            "suggested_by_admin": suggested_by_admin,
+            "votes": vote_count,
+            "voters": voters,
+            "status": status,
+            "vote_threshold": args.vote_threshold,
+            "estimated_test_date": None,
+            "created_at": datetime.utcfromtimestamp(created),
+            "completed_at": completed_at,
+            "test_report_id": None,
+        })
+
+async def generate_reports(writer, rng, args, calendar):
+    for index, created in enumerate(calendar.sample(args.reports)):
+        template = rng.choice(test_reports_data)
+        score = round(min(10.0, rng.triangular(4.0, 10.0, 9.0)), 1)
+        parameters = [
+            {**parameter, "status": "pass" if score >= 8 else rng.choice(["pass", "warning", "fail"])}
+            for parameter in template["parameters"]
+        ]
+        brand = rng.choice(BRANDS)
+        await writer.add("test_reports", {
+            "product_name": f"{brand} {rng.choice(PRODUCTS)} #{index}",
+            "brand": brand,
+            "category": rng.choice(CATEGORIES),
+            "purity_score": score,
+            "test_date": datetime.utcfromtimestamp(created).strftime("%Y-%m-%d"),
+            "tested_by": template["tested_by"],
+            "image": template["image"],
+            "parameters": parameters,
+            "summary": template["summary"],
+            "created_at": datetime.utcfromtimestamp(created),
+        })
+
+async def generate_posts(writer, rng, args, calendar):
+    for index, created in enumerate(calendar.sample(args.posts)):
+        template = rng.choice(blog_posts_data)
+        await writer.add("blog_posts", {
+            "title": f"{template['title']} (part {index})",
+            "excerpt": template["excerpt"],
+            "content": template["content"] * rng.randint(1, 20),
+            "author": template["author"],
+            "category": template["category"],
+            "image": template["image"],
+            "views": int(rng.lognormvariate(6.5, 1.3)),
+            "publish_date": datetime.utcfromtimestamp(created).strftime("%Y-%m-%d"),
+            "created_at": datetime.utcfromtimestamp(created),
+        })
+
+async def generate_donations(writer, rng, args, calendar):
+    for index, created in enumerate(calendar.sample(args.donations)):
+        person = fake_person(rng, index)
+        status = rng.choices(["completed", "pending", "failed"], weights=[85, 10, 5])[0]
+        doc = {
+            "donor_name": person["name"],
+            "donor_email": person["email"],
+            "donor_phone": person["mobile"],
+            "amount": rng.choices(DONATION_AMOUNTS, weights=DONATION_AMOUNT_WEIGHTS)[0],
+            "message": None if rng.random() < 0.7 else "Keep up the good work!",
+            "razorpay_order_id": f"order_{uuid.UUID(int=rng.getrandbits(128)).hex[:14]}",
+            "status": status,
+            "created_at": datetime.utcfromtimestamp(created),
+        }
+        if status == "completed":
+            doc["razorpay_payment_id"] = f"pay_{uuid.UUID(int=rng.getrandbits(128)).hex[:14]}"
+            doc["completed_at"] = datetime.utcfromtimestamp(created + rng.uniform(30, 600))
+        await writer.add("donations", doc)
+
+async def generate_subscriptions(writer, rng, args, calendar, signups, tiers):
+    tier_list = list(tiers)
+    tier_weights = [TIER_WEIGHTS.get(tier["name"], 1) for tier in tier_list]
+    now = datetime.utcnow()
+
+    for _ in range(args.subscriptions):
+        user_index = rng.randrange(len(signups))
+        tier = rng.choices(tier_list, weights=tier_weights)[0]
+        created = datetime.utcfromtimestamp(calendar.after(signups[user_index]))
+        doc = {
+            "user_id": str(make_object_id(signups[user_index], 1, user_index)),
+            "tier_id": str(tier["_id"]),
+            "razorpay_order_id": f"order_{uuid.UUID(int=rng.getrandbits(128)).hex[:14]}",
+            "razorpay_payment_id": None,
+            "razorpay_subscription_id": None,
+            "status": "pending",
+            "start_date": None,
+            "end_date": None,
+            "amount_paid": tier["price"],
+            "created_at": created,
+        }
+        if rng.random() >= 0.08:
+            start = created + timedelta(minutes=rng.uniform(1, 15))
+            end = start + timedelta(days=tier["duration_days"])
+            doc.update({
+                "razorpay_payment_id": f"pay_{uuid.UUID(int=rng.getrandbits(128)).hex[:14]}",
+                "status": "cancelled" if rng.random() < 0.03 else ("active" if end > now else "expired"),
+                "start_date": start,
+                "end_date": end,
+            })
+        await writer.add("user_subscriptions", doc)
+
+async def ensure_tiers(db) -> list:
+    tiers = await db.subscription_tiers.find({}).to_list(100)
+    if not tiers:
+        await db.subscription_tiers.insert_many([dict(tier) for tier in subscription_tiers])
+        tiers = await db.subscription_tiers.find({}).to_list(100)
+    return tiers
+
+async def print_sizes(db):
+    print("\nCollection sizes:")
+    print(f"  {'collection':<20} {'documents':>12} {'data MB':>10} {'storage MB':>11} {'index MB':>10}")
+    for name in COLLECTIONS:
+        try:
+            stats = await db.command("collStats", name)
+        except Exception:
+            print(f"  {name:<20} {await db[name].estimated_document_count():>12,}  (collStats unavailable)")
+            continue
+        mb = lambda key: stats.get(key, 0) / (1024 * 1024)
+        print(f"  {name:<20} {stats.get('count', 0):>12,} {mb('size'):>10.1f} {mb('storageSize'):>11.1f} {mb('totalIndexSize'):>10.1f}")
+
+async def main():
+    args = parse_args()
+    db_name = os.environ.get("BENCH_DB_NAME", f"{os.environ['DB_NAME']}_perf")
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[db_name]
+
+    try:
+        if args.drop:
+            print(f"Clearing {', '.join(COLLECTIONS)} in {db_name}...")
+            for name in COLLECTIONS:
+                await db[name].delete_many({})
+
+        rng = random.Random(args.seed)
+        calendar = SignupCalendar(rng, args.days)
+        signups = array("d", sorted(calendar.sample(args.users)))
+        tiers = await ensure_tiers(db)
+        password_hash = get_password_hash("perf-test-password")
+
+        print(f"Generating into {db_name}: {args.users:,} users, {args.suggestions:,} suggestions, "
+              f"~{args.votes:,} votes, {args.reports:,} reports, {args.posts:,} posts, "
+              f"{args.donations:,} donations, {args.subscriptions:,} subscriptions "
+              f"({args.workers} workers, batches of {args.batch_size})")
+
+        writer = BatchWriter(db, args.workers, args.batch_size)
+        try:
+            await generate_users(writer, rng, signups, password_hash)
+            await generate_suggestions_and_votes(writer, rng, args, calendar, signups)
+            await generate_reports(writer, rng, args, calendar)
+            await generate_posts(writer, rng, args, calendar)
+            await generate_donations(writer, rng, args, calendar)
+            await generate_subscriptions(writer, rng, args, calendar, signups, tiers)
+        finally:
+            await writer.close()
+
+        elapsed = time.perf_counter() - writer.started
+        total = sum(writer.inserted.values())
+        print(f"\n✓ Inserted {total:,} documents in {elapsed:.1f}s ({total / elapsed:,.0f} docs/s overall)")
+        for name in COLLECTIONS:
+            seconds = writer.insert_seconds[name]
+            rate = writer.inserted[name] / seconds if seconds else 0
+            print(f"  {name:<20} {writer.inserted[name]:>12,} docs  {rate:>10,.0f} docs/s per worker")
+        if writer.errors:
+            print(f"✗ {writer.errors} batches failed")
+
+        await print_sizes(db)
+    except Exception as e:
+        print(f"\n✗ Error generating data: {str(e)}")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
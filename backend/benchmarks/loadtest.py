@@ -0,0 +1,331 @@
+"""
+Load test for the main API paths under concurrency
+
+Boots the FastAPI app in-process against a scratch MongoDB database (or
+mongomock-motor with --mock), points Mailgun and Razorpay at local stub
+servers, seeds data in the shapes used by seed_data.py/seed_subscriptions.py
+and drives each scenario through the ASGI interface.
+
+Usage:
+    python benchmarks/loadtest.py [--concurrency 20] [--requests 500]
+                                  [--scenarios reports,blog_search,...]
+                                  [--baseline benchmarks/baseline.json] [--save-baseline]
+
+Reports throughput and p50/p95/p99 per scenario. With --baseline, scenarios
+whose p95 or throughput regressed by more than --tolerance are flagged and
+the exit code is 1.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.stubs import StubServer
+
+BENCH_WEBHOOK_SECRET = "loadtest_webhook_secret"
+BENCH_PASSWORD = "loadtest-password"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ChoosePure API load test")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--scenarios", default="register,login,vote,reports,blog_search,webhook")
+    parser.add_argument("--reports", type=int, default=1000, help="test reports to seed")
+    parser.add_argument("--posts", type=int, default=500, help="blog posts to seed")
+    parser.add_argument("--tests", type=int, default=100, help="upcoming tests to seed")
+    parser.add_argument("--mailgun-latency-ms", type=float, default=50)
+    parser.add_argument("--razorpay-latency-ms", type=float, default=150)
+    parser.add_argument("--mock", action="store_true", help="use mongomock-motor instead of MONGO_URL")
+    parser.add_argument("--baseline", default=str(Path(__file__).parent / "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression ratio")
+    return parser.parse_args()
+
+def configure_environment(args):
+    """Must run before the app modules are imported: they read env at import."""
+    from dotenv import load_dotenv
+    load_dotenv(BACKEND_DIR / '.env')
+
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", f"{os.environ.get('DB_NAME', 'choosepure')}_loadtest")
+    os.environ.setdefault("SECRET_KEY", "loadtest-secret-key")
+    os.environ["RAZORPAY_KEY_ID"] = "rzp_test_loadtest"
+    os.environ["RAZORPAY_KEY_SECRET"] = "loadtest_key_secret"
+    os.environ["RAZORPAY_WEBHOOK_SECRET"] = BENCH_WEBHOOK_SECRET
+    # Every request comes from one client: the limits would turn the run into 429s
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    if args.mock:
+        import mongomock_motor
+        import motor.motor_asyncio
+        motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+
+def wire_stubs(stub: StubServer):
+    """Point every Mailgun/Razorpay client in the app at the stub server."""
+    import razorpay
+    from email_service import email_service
+    from services import razorpay_service as razorpay_module
+
+    email_service.api_key = "loadtest"
+    email_service.domain = "loadtest.local"
+    email_service.base_url = f"{stub.base_url}/v3/loadtest.local"
+    email_service.enabled = True
+
+    client = razorpay.Client(
+        auth=(os.environ["RAZORPAY_KEY_ID"], os.environ["RAZORPAY_KEY_SECRET"]),
+        base_url=stub.base_url
+    )
+    razorpay_module.razorpay_service.client = client
+
+async def seed(db, args):
+    """Seed volumes of documents shaped like the seed scripts' fixtures."""
+    from seed_data import test_reports_data, upcoming_tests_data, blog_posts_data
+    from seed_subscriptions import subscription_tiers
+    from auth import get_password_hash
+
+    collections = ["test_reports", "upcoming_tests", "blog_posts", "subscription_tiers", "users"]
+    for name in collections:
+        await db[name].delete_many({})
+
+    def copies(templates, count, name_field):
+        docs = []
+        for i in range(count):
+            doc = {key: value for key, value in random.choice(templates).items() if key != "_id"}
+            doc[name_field] = f"{doc[name_field]} #{i}"
+            doc["created_at"] = datetime.utcnow()
+            docs.append(doc)
+        return docs
+
+    await db.test_reports.insert_many(copies(test_reports_data, args.reports, "product_name"))
+    await db.blog_posts.insert_many(copies(blog_posts_data, args.posts, "title"))
+    tests = copies(upcoming_tests_data, args.tests, "product_category")
+    for test in tests:
+        test["status"] = "voting"
+        test["voters"] = []
+    await db.upcoming_tests.insert_many(tests)
+    await db.subscription_tiers.insert_many([dict(tier) for tier in subscription_tiers])
+    await db.users.insert_one({
+        "name": "Load Test", "email": "loadtest@example.com", "mobile": "9999999999",
+        "password": get_password_hash(BENCH_PASSWORD), "role": "member", "created_at": datetime.utcnow()
+    })
+
+    test_ids = [str(doc["_id"]) async for doc in db.upcoming_tests.find({}, {"_id": 1})]
+    print(f"Seeded {args.reports} reports, {args.posts} blog posts, {args.tests} upcoming tests into {db.name}")
+    return {"test_ids": test_ids}
+
+def build_scenarios(fixtures):
+    """Each scenario returns (method, path, json_body, extra_headers) per request."""
+    def register():
+        email = f"bench_{uuid.uuid4().hex[:12]}@example.com"
+        return "POST", "/api/auth/register", {
+            "name": "Bench User", "email": email, "mobile": "9000000000", "password": BENCH_PASSWORD
+        }, {}
+
+    def login():
+        return "POST", "/api/auth/login", {"email": "loadtest@example.com", "password": BENCH_PASSWORD}, {}
+
+    def vote():
+        return "POST", "/api/voting/vote", {
+            "test_id": random.choice(fixtures["test_ids"]), "user_id": uuid.uuid4().hex
+        }, {}
+
+    def reports():
+        return "GET", "/api/reports?limit=100", None, {}
+
+    def blog_search():
+        return "GET", f"/api/blog/posts?search={random.choice(['milk', 'honey', 'testing', 'safety'])}", None, {}
+
+    def webhook():
+        payload = json.dumps({
+            "event": "payment.captured",
+            "payload": {"payment": {"entity": {
+                "id": f"pay_{uuid.uuid4().hex[:14]}", "order_id": f"order_{uuid.uuid4().hex[:14]}",
+                "amount": 19900, "status": "captured"
+            }}},
+            "created_at": int(time.time())
+        })
+        signature = hmac.new(BENCH_WEBHOOK_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
+        return "POST", "/api/razorpay-webhook", payload, {"x-razorpay-signature": signature}
+
+    return {
+        "register": register,
+        "login": login,
+        "vote": vote,
+        "reports": reports,
+        "blog_search": blog_search,
+        "webhook": webhook,
+    }
+
+async def asgi_request(app, method: str, path: str, body, headers: dict) -> int:
+    """Issue one request through the ASGI interface and return the status code."""
+    if isinstance(body, (dict, list)):
+        raw_body = json.dumps(body).encode()
+    else:
+        raw_body = (body or "").encode()
+
+    raw_path, _, query = path.partition("?")
+    header_list = [(b"host", b"loadtest"), (b"content-type", b"application/json"),
+                   (b"content-length", str(len(raw_body)).encode())]
+    header_list += [(key.lower().encode(), value.encode()) for key, value in headers.items()]
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": raw_path, "raw_path": raw_path.encode(),
+        "query_string": query.encode(), "root_path": "", "headers": header_list,
+        "server": ("loadtest", 80), "client": ("127.0.0.1", random.randint(1024, 65535)),
+    }
+    status = 0
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": raw_body, "more_body": False}
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+class Lifespan:
+    """Drive the app's ASGI lifespan so startup hooks (caches, indexes) run."""
+
+    def __init__(self, app):
+        self.app = app
+        self.inbox = asyncio.Queue()
+        self.outbox = asyncio.Queue()
+
+    async def _receive(self):
+        return await self.inbox.get()
+
+    async def _send(self, message):
+        await self.outbox.put(message)
+
+    async def __aenter__(self):
+        self.task = asyncio.create_task(self.app({"type": "lifespan", "asgi": {"version": "3.0"}}, self._receive, self._send))
+        await self.inbox.put({"type": "lifespan.startup"})
+        message = await self.outbox.get()
+        if message["type"] != "lifespan.startup.complete":
+            raise RuntimeError(f"App startup failed: {message.get('message')}")
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.inbox.put({"type": "lifespan.shutdown"})
+        await self.outbox.get()
+        await self.task
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def run_scenario(app, make_request, total: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            method, path, body, headers = make_request()
+            start = time.perf_counter()
+            try:
+                status = await asgi_request(app, method, path, body, headers)
+            except Exception:
+                status = 599
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if result["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {result['p95_ms']}ms")
+        if result["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput_rps']} -> {result['throughput_rps']} req/s")
+    return regressions
+
+async def main():
+    args = parse_args()
+    configure_environment(args)
+
+    import server
+
+    with StubServer(args.mailgun_latency_ms, args.razorpay_latency_ms) as stub:
+        wire_stubs(stub)
+        fixtures = await seed(server.db, args)
+        scenarios = build_scenarios(fixtures)
+
+        results = {}
+        async with Lifespan(server.app):
+            print(f"\n{'scenario':<14}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+            for name in args.scenarios.split(","):
+                name = name.strip()
+                if name not in scenarios:
+                    print(f"Unknown scenario: {name}")
+                    continue
+                result = await run_scenario(server.app, scenarios[name], args.requests, args.concurrency)
+                results[name] = result
+                print(f"{name:<14}{result['throughput_rps']:>10}{result['p50_ms']:>10}"
+                      f"{result['p95_ms']:>10}{result['p99_ms']:>10}{result['errors']:>8}")
+
+        if not args.mock:
+            await server.client.drop_database(server.db.name)
+
+    baseline_path = Path(args.baseline)
+    exit_code = 0
+    if baseline_path.exists() and not args.save_baseline:
+        regressions = compare(results, json.loads(baseline_path.read_text()), args.tolerance)
+        if regressions:
+            exit_code = 1
+            print(f"\n✗ Regressions against {baseline_path}:")
+            for regression in regressions:
+                print(f"  - {regression}")
+        else:
+            print(f"\n✓ No regressions against {baseline_path} (tolerance {args.tolerance:.0%})")
+
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nBaseline saved to {baseline_path}")
+
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    asyncio.run(main())
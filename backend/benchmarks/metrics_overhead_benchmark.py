@@ -0,0 +1,67 @@
+"""
+Benchmark the per-request overhead of MetricsMiddleware
+
+Usage:
+    python benchmarks/metrics_overhead_benchmark.py [requests]
+
+Drives a minimal FastAPI app in-process through raw ASGI calls (no sockets),
+with and without the middleware, so the difference is the middleware cost.
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from fastapi import FastAPI
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.metrics import MetricsMiddleware, MetricsRegistry
+
+def build_app(with_metrics: bool):
+    app = FastAPI()
+
+    @app.get("/api/items/{item_id}")
+    async def get_item(item_id: str):
+        return {"id": item_id}
+
+    if with_metrics:
+        app.add_middleware(MetricsMiddleware, registry=MetricsRegistry())
+    return app
+
+async def drive(app, requests: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/api/items/42", "raw_path": b"/api/items/42",
+        "query_string": b"", "root_path": "", "headers": [], "server": ("bench", 80), "client": ("bench", 1),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    # Warm up routing and the middleware stack
+    for _ in range(200):
+        await app(dict(scope), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    baseline = await drive(build_app(False), requests)
+    instrumented = await drive(build_app(True), requests)
+
+    print(f"Requests per variant: {requests}")
+    print(f"  without middleware   {baseline * 1_000_000:>8.1f} µs/request")
+    print(f"  with middleware      {instrumented * 1_000_000:>8.1f} µs/request")
+    print(f"  overhead             {(instrumented - baseline) * 1_000_000:>8.1f} µs/request "
+          f"({(instrumented / baseline - 1) * 100:.1f}%)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
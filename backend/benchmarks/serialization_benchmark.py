@@ -0,0 +1,143 @@
+"""
+Benchmark JSON encoding of the 100-report listing (GET /api/reports)
+
+Usage:
+    python benchmarks/serialization_benchmark.py [--reports 100] [--iterations 2000]
+
+Times the body rendering of one listing page, without MongoDB or sockets:
+
+    jsonable_encoder + json   FastAPI's default path for a returned dict
+    FastJSONResponse          the dict handed straight to the response class
+    ResponseSerializer        raw Mongo documents through a typed response
+                              model compiled once with a pydantic TypeAdapter
+    report_mapper + Fast...   the generated DocumentMapper used by the route
+
+The mapping step alone (hand-written dict vs report_mapper) is timed too.
+
+Documents are copies of the seed_data.py fixtures with real ObjectIds and
+datetimes, as they come back from Motor.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "choosepure_bench")
+
+from models import TestParameter, TestReport
+from seed_data import test_reports_data
+from services.document_mapper import DocumentMapper
+from services.serialization import FastJSONResponse, MongoId, ResponseSerializer, orjson
+
+class ReportOut(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: MongoId = Field(validation_alias="_id")
+    productName: str = Field(validation_alias="product_name")
+    brand: str
+    category: str
+    purityScore: float = Field(validation_alias="purity_score")
+    testDate: str = Field(validation_alias="test_date")
+    testedBy: str = Field(validation_alias="tested_by")
+    image: str
+    parameters: List[TestParameter]
+    summary: str
+    created_at: datetime
+
+class ReportPage(BaseModel):
+    reports: List[ReportOut]
+    total: int
+    skip: int
+    limit: int
+
+class ReportListing(BaseModel):
+    success: bool
+    data: ReportPage
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Report listing serialization benchmark")
+    parser.add_argument("--reports", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=2000)
+    return parser.parse_args()
+
+def make_documents(count: int) -> list:
+    now = datetime.utcnow()
+    documents = []
+    for index in range(count):
+        document = dict(test_reports_data[index % len(test_reports_data)])
+        document["_id"] = ObjectId()
+        document["parameters"] = [dict(parameter) for parameter in document["parameters"]]
+        document["created_at"] = now - timedelta(minutes=index)
+        documents.append(document)
+    return documents
+
+def to_report_data(report: dict) -> dict:
+    # Hand-written field mapping report_routes used before report_mapper
+    return {
+        "id": str(report["_id"]),
+        "productName": report["product_name"],
+        "brand": report["brand"],
+        "category": report["category"],
+        "purityScore": report["purity_score"],
+        "testDate": report["test_date"],
+        "testedBy": report["tested_by"],
+        "image": report["image"],
+        "parameters": report["parameters"],
+        "summary": report["summary"],
+        "created_at": report["created_at"]
+    }
+
+def listing(reports: list) -> dict:
+    return {"success": True, "data": {"reports": reports, "total": len(reports), "skip": 0, "limit": len(reports)}}
+
+def time_variant(render, iterations: int):
+    body = render()
+    for _ in range(min(iterations, 100)):
+        render()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render()
+    return (time.perf_counter() - start) / iterations, len(body)
+
+def main():
+    args = parse_args()
+    documents = make_documents(args.reports)
+    serializer = ResponseSerializer(ReportListing)
+    report_mapper = DocumentMapper.for_model(TestReport, camel_case=True, keep=("created_at",))
+
+    variants = [
+        ("jsonable_encoder + json", lambda: JSONResponse(jsonable_encoder(listing([to_report_data(d) for d in documents]))).body),
+        ("FastJSONResponse", lambda: FastJSONResponse(listing([to_report_data(d) for d in documents])).body),
+        ("ResponseSerializer", lambda: serializer.dump(listing(documents))),
+        ("report_mapper + FastJSON", lambda: FastJSONResponse(listing(report_mapper.many(documents))).body),
+    ]
+
+    print(f"Reports per page: {args.reports}, iterations: {args.iterations}, orjson: {'yes' if orjson else 'no'}")
+    print(f"{'variant':<26}{'µs/page':>10}{'µs/report':>11}{'bytes':>8}{'speedup':>9}")
+    baseline = None
+    for name, render in variants:
+        seconds, size = time_variant(render, args.iterations)
+        baseline = baseline or seconds
+        print(f"{name:<26}{seconds * 1_000_000:>10.1f}{seconds * 1_000_000 / args.reports:>11.2f}"
+              f"{size:>8}{baseline / seconds:>8.1f}x")
+
+    print(f"\n{'mapping only':<26}{'µs/page':>10}{'µs/report':>11}")
+    for name, mapping in [
+        ("hand-written dict", lambda: [to_report_data(d) for d in documents]),
+        ("report_mapper.many", lambda: report_mapper.many(documents)),
+    ]:
+        seconds, _ = time_variant(mapping, args.iterations)
+        print(f"{name:<26}{seconds * 1_000_000:>10.1f}{seconds * 1_000_000 / args.reports:>11.2f}")
+
+if __name__ == "__main__":
+    main()
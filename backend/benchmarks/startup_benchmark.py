@@ -0,0 +1,129 @@
+"""
+Cold start profile: interpreter + `import server` + lifespan startup
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5] [--mock] [--top 15]
+                                           [--importtime-report importtime.txt]
+
+Each run is a fresh interpreter started with `-X importtime`, once with the
+development feature set and once with ENVIRONMENT=production, so the cost
+of the debug/test routers and of any eagerly imported dependency shows up
+as a difference. The slowest direct imports of server.py are listed from
+the last run's importtime output.
+
+Without --mock the lifespan talks to MONGO_URL (scratch database
+BENCH_DB_NAME, default "<DB_NAME>_bench"); with --mock it uses mongomock-motor
+and the startup column only covers the in-process work.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+CHILD = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+if {mock!r}:
+    import mongomock_motor, motor.motor_asyncio
+    motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+import server
+imported = time.perf_counter()
+
+async def run_lifespan():
+    async with server.app.router.lifespan_context(server.app):
+        return time.perf_counter()
+
+ready = asyncio.run(run_lifespan())
+print(json.dumps({{"import_ms": (imported - start) * 1000, "startup_ms": (ready - imported) * 1000,
+                   "routes": len(server.app.routes), "modules": len(sys.modules)}}))
+"""
+
+CONFIGURATIONS = {
+    "development": {"ENVIRONMENT": "development"},
+    "production": {"ENVIRONMENT": "production"},
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ChoosePure cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mock", action="store_true", help="use mongomock-motor instead of MONGO_URL")
+    parser.add_argument("--top", type=int, default=15, help="slowest direct imports of server.py to list")
+    parser.add_argument("--importtime-report", help="write the raw -X importtime output of the last run here")
+    return parser.parse_args()
+
+def child_environment(overrides: dict) -> dict:
+    from dotenv import load_dotenv
+    load_dotenv(ROOT_DIR / '.env')
+    env = dict(os.environ)
+    env["DB_NAME"] = env.get("BENCH_DB_NAME", f"{env.get('DB_NAME', 'choosepure')}_bench")
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("SECRET_KEY", "startup-benchmark")
+    env["MONGO_WARM_CONNECTIONS"] = env.get("MONGO_WARM_CONNECTIONS", "5")
+    env.update(overrides)
+    return env
+
+def run_once(env: dict, mock: bool):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(mock=mock)],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "child failed")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["wall_ms"] = wall_ms
+    return timings, result.stderr
+
+def direct_imports(importtime_output: str, top: int) -> list:
+    """(module, cumulative_ms) for modules imported directly by server.py."""
+    # importtime lists children before their parent: collect depth-1 entries
+    # until the depth-0 line that owns them
+    pending, entries = [], []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 1:
+            pending.append((name.strip(), int(cumulative) / 1000))
+        elif depth == 0:
+            if name.strip() == "server":
+                entries = pending + [("server (total)", int(cumulative) / 1000)]
+            pending = []
+    entries.sort(key=lambda entry: entry[1], reverse=True)
+    return entries[:top]
+
+def main():
+    args = parse_args()
+    print(f"{'configuration':<14}{'wall ms':>10}{'import ms':>11}{'startup ms':>12}{'routes':>8}{'modules':>9}")
+
+    last_output = ""
+    for name, overrides in CONFIGURATIONS.items():
+        env = child_environment(overrides)
+        runs = []
+        for _ in range(args.runs):
+            timings, last_output = run_once(env, args.mock)
+            runs.append(timings)
+        median = lambda key: statistics.median(run[key] for run in runs)
+        print(f"{name:<14}{median('wall_ms'):>10.0f}{median('import_ms'):>11.0f}{median('startup_ms'):>12.0f}"
+              f"{runs[-1]['routes']:>8}{runs[-1]['modules']:>9}")
+
+    print(f"\nSlowest direct imports of server.py (production, last run):")
+    for module, cumulative_ms in direct_imports(last_output, args.top):
+        print(f"  {module:<40}{cumulative_ms:>8.1f} ms")
+
+    if args.importtime_report:
+        Path(args.importtime_report).write_text(last_output)
+        print(f"\nRaw importtime output written to {args.importtime_report}")
+
+if __name__ == "__main__":
+    main()
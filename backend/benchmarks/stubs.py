@@ -0,0 +1,98 @@
+"""
+Local stand-ins for the Mailgun and Razorpay HTTP APIs used by the load test
+
+Both services are served by one threaded HTTP server on 127.0.0.1 with a
+configurable artificial latency, so outbound calls keep their real cost
+profile (blocking requests, TLS aside) without leaving the machine.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server_version = "ChoosePureStub/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw or b"{}")
+        except ValueError:
+            return {}
+
+    def do_POST(self):
+        if self.path.endswith("/messages"):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(self.server.mailgun_latency)
+            self._reply({"id": f"<{uuid.uuid4().hex}@stub.mailgun>", "message": "Queued. Thank you."})
+            return
+
+        data = self._read_json()
+        time.sleep(self.server.razorpay_latency)
+        now = int(time.time())
+        if self.path.startswith("/v1/orders"):
+            self._reply({
+                "id": f"order_{uuid.uuid4().hex[:14]}", "entity": "order",
+                "amount": data.get("amount", 0), "currency": data.get("currency", "INR"),
+                "receipt": data.get("receipt"), "status": "created", "created_at": now
+            })
+        elif self.path.startswith("/v1/plans"):
+            item = data.get("item", {})
+            self._reply({
+                "id": f"plan_{uuid.uuid4().hex[:14]}", "period": data.get("period"),
+                "interval": data.get("interval"), "item": item, "created_at": now
+            })
+        elif self.path.startswith("/v1/subscriptions"):
+            self._reply({
+                "id": f"sub_{uuid.uuid4().hex[:14]}", "plan_id": data.get("plan_id"),
+                "status": "created", "created_at": now, "short_url": "https://rzp.io/stub"
+            })
+        else:
+            self._reply({"error": {"description": "Not stubbed"}}, status=404)
+
+    def do_GET(self):
+        time.sleep(self.server.razorpay_latency)
+        if self.path.startswith("/v1/payments/"):
+            payment_id = self.path.rsplit("/", 1)[-1]
+            self._reply({
+                "id": payment_id, "order_id": "order_stub", "amount": 19900, "currency": "INR",
+                "status": "captured", "method": "upi", "created_at": int(time.time()), "captured": True
+            })
+        else:
+            self._reply({"error": {"description": "Not stubbed"}}, status=404)
+
+class StubServer:
+    """Context manager running the stub APIs on an ephemeral port."""
+
+    def __init__(self, mailgun_latency_ms: float = 50, razorpay_latency_ms: float = 150):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mailgun_latency = mailgun_latency_ms / 1000
+        self.httpd.razorpay_latency = razorpay_latency_ms / 1000
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
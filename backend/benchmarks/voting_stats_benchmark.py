@@ -0,0 +1,134 @@
+"""
+Benchmark /product-voting/stats: per-status count_documents vs one $facet vs leaderboard
+
+Usage:
+    python benchmarks/voting_stats_benchmark.py [suggestions] [iterations]
+
+Seeds a throwaway database (BENCH_DB_NAME, default "<DB_NAME>_bench") and
+drops it afterwards.
+"""
+import asyncio
+import random
+import sys
+import time
+import os
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+load_dotenv(ROOT_DIR / '.env')
+
+from routes.product_voting_routes import aggregate_voting_stats
+from services.leaderboard import Leaderboard
+
+CATEGORIES = ["Dairy", "Cooking Oil", "Spices", "Sweeteners", "Baby Food", "Beverages"]
+STATUSES = ["voting"] * 8 + ["testing", "completed"]
+
+class RoundTripCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+async def legacy_voting_stats(db):
+    """The pre-$facet implementation: six sequential round trips"""
+    total_suggestions = await db.product_suggestions.count_documents({})
+    active_voting = await db.product_suggestions.count_documents({"status": "voting"})
+    testing_phase = await db.product_suggestions.count_documents({"status": "testing"})
+    completed_tests = await db.product_suggestions.count_documents({"status": "completed"})
+    total_votes = await db.user_votes.count_documents({})
+    most_voted = await db.product_suggestions.find(
+        {"status": "voting"}
+    ).sort("votes", -1).limit(5).to_list(5)
+    return {
+        "total_suggestions": total_suggestions,
+        "active_voting": active_voting,
+        "testing_phase": testing_phase,
+        "completed_tests": completed_tests,
+        "total_votes": total_votes,
+        "most_voted_products": most_voted
+    }
+
+def leaderboard_voting_stats(leaderboard):
+    return {
+        "total_suggestions": leaderboard.count(),
+        "active_voting": leaderboard.count("voting"),
+        "testing_phase": leaderboard.count("testing"),
+        "completed_tests": leaderboard.count("completed"),
+        "total_votes": leaderboard.total_votes(),
+        "most_voted_products": leaderboard.top("voting", 5),
+        "category_breakdown": leaderboard.category_breakdown()
+    }
+
+async def seed(db, suggestion_count):
+    suggestions = []
+    for i in range(suggestion_count):
+        suggestions.append({
+            "product_name": f"Product {i}",
+            "brand": f"Brand {i % 50}",
+            "category": random.choice(CATEGORIES),
+            "description": "Benchmark suggestion",
+            "suggested_by": "benchmark",
+            "votes": int(random.paretovariate(1.2)) - 1,
+            "voters": [],
+            "status": random.choice(STATUSES),
+            "vote_threshold": 350,
+            "created_at": datetime.utcnow()
+        })
+    await db.product_suggestions.insert_many(suggestions)
+
+    votes = [
+        {"user_id": f"user_{i % 1000}", "product_suggestion_id": "x", "month_year": "2025-01", "voted_at": datetime.utcnow()}
+        for i in range(sum(s["votes"] for s in suggestions))
+    ]
+    for i in range(0, len(votes), 10000):
+        await db.user_votes.insert_many(votes[i:i + 10000])
+    await db.product_suggestions.create_index([("status", 1), ("votes", -1)])
+
+async def measure(label, fn, iterations, counter):
+    counter.count = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = fn()
+        if asyncio.iscoroutine(result):
+            await result
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<22} {counter.count / iterations:>6.1f} round trips   {elapsed / iterations * 1000:>9.3f} ms/request")
+
+async def main():
+    suggestion_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    counter = RoundTripCounter()
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], event_listeners=[counter])
+    db = client[os.environ.get('BENCH_DB_NAME', f"{os.environ['DB_NAME']}_bench")]
+
+    try:
+        print(f"Seeding {suggestion_count} product suggestions into {db.name}...")
+        await seed(db, suggestion_count)
+
+        leaderboard = Leaderboard("benchmark")
+        await leaderboard.rebuild(db.product_suggestions)
+
+        print(f"\nVoting stats, {iterations} iterations:")
+        await measure("count_documents x6", lambda: legacy_voting_stats(db), iterations, counter)
+        await measure("$facet aggregation", lambda: aggregate_voting_stats(db), iterations, counter)
+        await measure("in-memory leaderboard", lambda: leaderboard_voting_stats(leaderboard), iterations, counter)
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
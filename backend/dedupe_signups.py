@@ -0,0 +1,81 @@
+"""
+Merge duplicate waitlist and newsletter signups before the unique email index
+
+Usage:
+    python dedupe_signups.py [--dry-run]
+
+Signups used to be checked with a find_one before the insert, so concurrent
+requests could store the same email twice, and the unique ``email_unique``
+indexes cannot be built while such duplicates exist. For each duplicated
+email the earliest signup is kept; a newsletter subscriber stays active if
+any of its copies was. The indexes are then created.
+"""
+import argparse
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+
+from services.lifecycle import ensure_indexes
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url)
+db = client[os.environ['DB_NAME']]
+
+# collection -> field holding the signup time
+SIGNUP_COLLECTIONS = {
+    "waitlist": "joined_at",
+    "newsletter_subscribers": "subscribed_at",
+}
+
+async def dedupe(collection: str, signed_up_field: str, dry_run: bool) -> int:
+    """Remove all but the earliest signup of every duplicated email; returns how many."""
+    duplicates = db[collection].aggregate([
+        {"$sort": {signed_up_field: 1, "_id": 1}},
+        {"$group": {
+            "_id": "$email",
+            "ids": {"$push": "$_id"},
+            "active": {"$max": {"$ifNull": ["$active", False]}},
+            "count": {"$sum": 1},
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+
+    removed = 0
+    async for group in duplicates:
+        keep, extra = group["ids"][0], group["ids"][1:]
+        removed += len(extra)
+        if dry_run:
+            continue
+        if collection == "newsletter_subscribers" and group["active"]:
+            await db[collection].update_one({"_id": keep}, {"$set": {"active": True}})
+        await db[collection].delete_many({"_id": {"$in": extra}})
+    return removed
+
+async def main():
+    parser = argparse.ArgumentParser(description="Merge duplicate waitlist/newsletter signups")
+    parser.add_argument("--dry-run", action="store_true", help="only count the duplicates")
+    args = parser.parse_args()
+
+    try:
+        for collection, signed_up_field in SIGNUP_COLLECTIONS.items():
+            removed = await dedupe(collection, signed_up_field, args.dry_run)
+            print(f"✓ {collection}: {removed} duplicate signups {'found' if args.dry_run else 'removed'}")
+
+        if not args.dry_run:
+            results = await ensure_indexes(db)
+            for collection in SIGNUP_COLLECTIONS:
+                mark = "✓" if results.get(collection) == "ok" else "✗"
+                print(f"{mark} {collection}: unique email index {results.get(collection)}")
+    except Exception as e:
+        print(f"Error during signup dedupe: {str(e)}")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,8 +1,8 @@
 import os
-import requests
 import logging
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from services.metrics import track_dependency
 
 logger = logging.getLogger(__name__)
 
@@ -17,14 +17,15 @@ class MailgunEmailService:
         # Check for EU region endpoint
         self.endpoint = os.getenv('MAILGUN_ENDPOINT', 'api.mailgun.net')
         self.base_url = f'https://{self.endpoint}/v3/{self.domain}'
-        
-        if not self.api_key or not self.domain:
+        self.enabled = bool(self.api_key and self.domain)
+    
+    def log_status(self):
+        """Log the configuration; called from the app lifespan rather than at import."""
+        if not self.enabled:
             logger.warning("Mailgun credentials not configured. Email sending will be disabled.")
             logger.warning(f"MAILGUN_API_KEY present: {bool(self.api_key)}")
             logger.warning(f"MAILGUN_DOMAIN present: {bool(self.domain)}")
-            self.enabled = False
         else:
-            self.enabled = True
             logger.info(f"Mailgun email service initialized for domain: {self.domain}")
             logger.info(f"From email: {self.from_email}")
             logger.info(f"Endpoint: {self.endpoint}")
@@ -63,6 +64,9 @@ class MailgunEmailService:
                 "message": "Mailgun credentials not set"
             }
         
+        # Imported on first send to keep it out of the app's startup path
+        import requests
+        
         try:
             # Prepare email data
             data = {
@@ -87,12 +91,13 @@ class MailgunEmailService:
             logger.debug(f"Mailgun URL: {self.base_url}/messages")
             
             # Send email via Mailgun API
-            response = requests.post(
-                f'{self.base_url}/messages',
-                auth=('api', self.api_key),
-                data=data,
-                timeout=30
-            )
+            with track_dependency("mailgun"):
+                response = requests.post(
+                    f'{self.base_url}/messages',
+                    auth=('api', self.api_key),
+                    data=data,
+                    timeout=30
+                )
             
             logger.info(f"Mailgun API response status: {response.status_code}")
             logger.debug(f"Mailgun API response: {response.text}")
@@ -491,5 +496,69 @@ class MailgunEmailService:
             tags=['waitlist', 'confirmation']
         )
 
+    async def send_renewal_reminder_email(self, to_email: str, user_name: str, plan_name: str, end_date: str) -> Dict[str, Any]:
+        """Send a reminder that a subscription is about to end"""
+        subject = f"Your {plan_name} subscription ends on {end_date} - ChoosePure"
+        
+        html_content = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>Subscription Renewal Reminder</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <div style="background: linear-gradient(135deg, #10b981, #059669); padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
+                <h1 style="color: white; margin: 0; font-size: 28px;">Your Subscription Ends Soon</h1>
+            </div>
+            
+            <div style="background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; border: 1px solid #ddd;">
+                <p style="font-size: 16px; margin-bottom: 20px;">
+                    Hello {user_name}!
+                </p>
+                
+                <p style="font-size: 16px; margin-bottom: 20px;">
+                    Your <strong>{plan_name}</strong> subscription ends on <strong>{end_date}</strong>.
+                    Renew before then to keep your premium voting rights and full access to our test reports.
+                </p>
+                
+                <div style="text-align: center; margin: 30px 0;">
+                    <a href="https://choosepure.in/pricing" style="background: #10b981; color: white; padding: 12px 30px; text-decoration: none; border-radius: 5px; font-weight: bold;">
+                        Renew Subscription
+                    </a>
+                </div>
+                
+                <hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">
+                
+                <p style="font-size: 12px; color: #999; text-align: center;">
+                    Thank you for choosing ChoosePure!
+                </p>
+            </div>
+        </body>
+        </html>
+        """
+        
+        text_content = f"""
+        Your Subscription Ends Soon
+        
+        Hello {user_name}!
+        
+        Your {plan_name} subscription ends on {end_date}.
+        Renew before then to keep your premium voting rights and full access to our test reports:
+        https://choosepure.in/pricing
+        
+        Best regards,
+        The ChoosePure Team
+        """
+        
+        return await self.send_email(
+            to_email=to_email,
+            subject=subject,
+            html_content=html_content,
+            text_content=text_content,
+            tags=['subscription', 'renewal-reminder']
+        )
+
 # Global email service instance
 email_service = MailgunEmailService()
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""
+Replay a vote file (JSONL or CSV) into user_votes
+
+Usage:
+    python import_votes.py votes.jsonl [--format jsonl|csv] [--batch-size 1000]
+
+CSV files need a header row with at least user_id and product_suggestion_id.
+"""
+import argparse
+import asyncio
+import json
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+
+from services.uploads import iter_lines, iter_rows
+from services.vote_import import DEFAULT_BATCH_SIZE, import_votes
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url)
+db = client[os.environ['DB_NAME']]
+
+def print_progress(report):
+    print(f"  {report['processed']} rows, {report['imported']} imported, "
+          f"{report['rejected']} rejected ({report['rows_per_second']} rows/s)")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Bulk import product votes")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["jsonl", "csv"])
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    file_format = args.format or ("csv" if args.path.endswith(".csv") else "jsonl")
+
+    try:
+        print(f"Importing votes from {args.path} ({file_format})...")
+        with open(args.path, encoding="utf-8") as f:
+            report = await import_votes(
+                db,
+                iter_rows(iter_lines(f), file_format),
+                batch_size=args.batch_size,
+                progress=print_progress
+            )
+
+        print(f"\n✓ Imported {report['imported']} of {report['processed']} votes "
+              f"in {report['elapsed_seconds']}s ({report['rows_per_second']} rows/s)")
+        print(f"  Suggestions moved to testing: {report['suggestions_moved_to_testing']}")
+        if report["rejected"]:
+            print(f"✗ Rejected {report['rejected']} rows, first {len(report['rejected_rows'])}:")
+            for rejection in report["rejected_rows"]:
+                print(f"  - {json.dumps(rejection)}")
+    except Exception as e:
+        print(f"Error during vote import: {str(e)}")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -276,7 +276,7 @@ class UserSubscription(BaseModel):
     razorpay_order_id: Optional[str] = None
     razorpay_payment_id: Optional[str] = None
     razorpay_subscription_id: Optional[str] = None
-    status: str  # pending, active, expired, cancelled
+    status: str  # pending, active, expired, cancelled, abandoned
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
     amount_paid: float
@@ -0,0 +1,40 @@
+"""
+Rebuild the donation ledger summary from the donations collection
+
+Usage:
+    python rebuild_donation_ledger.py
+
+Drops the ``donation_ledger`` summary and recomputes the totals and the
+recent donations from completed donations. Run it if the summary drifted,
+for example after "Failed to record donation ... in the ledger" was logged.
+Workers pick up the rebuilt summary within DONATION_LEDGER_TTL_SECONDS.
+"""
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+
+from services.donation_ledger import donation_ledger
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url)
+db = client[os.environ['DB_NAME']]
+
+async def main():
+    try:
+        print("Rebuilding donation ledger summary...")
+        stats = await donation_ledger.rebuild(db)
+        print(f"✓ {stats['total_donors']} donations, {stats['total_amount']} total")
+        print(f"✓ {len(donation_ledger.latest(donation_ledger.recent_size))} recent donations")
+    except Exception as e:
+        print(f"Error during donation ledger rebuild: {str(e)}")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, HTTPException, Depends
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional
+import logging
+from middleware import require_admin
+from services.revenue_rollups import SOURCES, revenue_summary
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+async def get_db():
+    from server import db
+    return db
+
+# Bounds the number of daily buckets a single request reads
+MAX_RANGE_DAYS = 3 * 366
+
+@router.get("/revenue")
+async def get_revenue(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: Literal["day", "week", "month"] = "day",
+    source: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    admin_user = Depends(require_admin)
+):
+    """Revenue per day/week/month across donations, reports and subscriptions (from the rollups, see services/revenue_rollups.py)."""
+    try:
+        end = end or datetime.utcnow().date()
+        start = start or end - timedelta(days=29)
+        if start > end:
+            raise HTTPException(status_code=400, detail="start must not be after end")
+        if (end - start).days >= MAX_RANGE_DAYS:
+            raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_RANGE_DAYS} days")
+        if source is not None and source not in SOURCES:
+            raise HTTPException(status_code=400, detail=f"source must be one of: {', '.join(SOURCES)}")
+        
+        return await revenue_summary(db, start, end, granularity, source)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get revenue analytics error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to get revenue analytics")
@@ -3,6 +3,7 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from models import BlogPostCreate, BlogPost
 from bson import ObjectId
 from typing import Optional
+from services.document_mapper import DocumentMapper
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,6 +14,13 @@ async def get_db():
     from server import db
     return db
 
+def read_time(post: dict) -> str:
+    return f"{len(post.get('content', '').split()) // 200} min read"
+
+post_mapper = DocumentMapper.for_model(
+    BlogPost, camel_case=True, exclude=("created_at",), passthrough=True, computed={"readTime": read_time}
+)
+
 @router.get("/posts")
 async def get_blog_posts(
     search: Optional[str] = Query(None),
@@ -32,16 +40,7 @@ async def get_blog_posts(
         
         posts = await db.blog_posts.find(query).sort("created_at", -1).to_list(100)
         
-        # Convert ObjectId to string and format keys
-        for post in posts:
-            post["id"] = str(post["_id"])
-            del post["_id"]
-            post["publishDate"] = post.pop("publish_date")
-            post["readTime"] = f"{len(post.get('content', '').split()) // 200} min read"
-            if "created_at" in post:
-                del post["created_at"]
-        
-        return {"posts": posts}
+        return {"posts": post_mapper.many(posts)}
     except Exception as e:
         logger.error(f"Get blog posts error: {str(e)}")
         raise HTTPException(
@@ -73,15 +72,7 @@ async def get_blog_post(post_id: str, db: AsyncIOMotorDatabase = Depends(get_db)
             {"$inc": {"views": 1}}
         )
         
-        # Format response
-        post["id"] = str(post["_id"])
-        del post["_id"]
-        post["publishDate"] = post.pop("publish_date")
-        post["readTime"] = f"{len(post.get('content', '').split()) // 200} min read"
-        if "created_at" in post:
-            del post["created_at"]
-        
-        return post
+        return post_mapper(post)
     except HTTPException:
         raise
     except Exception as e:
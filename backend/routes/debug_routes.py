@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 import os
 import logging
 from services.razorpay_service import razorpay_service
+from services.mongo_monitoring import mongo_monitoring
+from middleware import require_admin
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -70,6 +72,23 @@ async def debug_razorpay_status():
         logger.error(f"Debug endpoint error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Debug check failed: {str(e)}")
 
+@router.get("/debug/mongo-queries")
+async def debug_mongo_queries(top: int = 20, admin_user = Depends(require_admin)):
+    """
+    Per-collection command latency and the costliest query shapes
+    (admin only; requires MONGO_MONITORING_ENABLED=true)
+    """
+    if not mongo_monitoring.enabled:
+        return {
+            "enabled": False,
+            "message": "Set MONGO_MONITORING_ENABLED=true to record MongoDB command statistics"
+        }
+    
+    return {
+        "enabled": True,
+        **mongo_monitoring.monitor.snapshot(top)
+    }
+
 @router.get("/debug/env-vars")
 async def debug_env_vars():
     """
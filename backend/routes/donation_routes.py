@@ -1,23 +1,22 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Header
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
 from datetime import datetime
-import razorpay
-import os
-import hmac
-import hashlib
+from typing import Optional
+import asyncio
 import logging
+from services.donation_ledger import donation_ledger
+from services.razorpay_service import razorpay_service
+from services.revenue_rollups import record_revenue
+from services.serialization import FastJSONResponse
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/donations", tags=["Donations"])
 
-# Initialize Razorpay client
-razorpay_client = razorpay.Client(auth=(
-    os.environ.get("RAZORPAY_KEY_ID"),
-    os.environ.get("RAZORPAY_KEY_SECRET")
-))
-
 async def get_db():
     from server import db
     return db
@@ -39,48 +38,111 @@ class DonationVerification(BaseModel):
     amount: float
     message: str = ""
 
+def order_response(order_id: str, amount: float) -> dict:
+    return {
+        "success": True,
+        "order_id": order_id,
+        "amount": int(amount * 100),
+        "currency": "INR",
+        "key_id": razorpay_service.key_id
+    }
+
+async def replay_donation_order(existing: dict, donation: DonationCreate) -> dict:
+    """Answer a retried create-order with the order minted for the first attempt."""
+    if existing.get("amount") != donation.amount or existing.get("donor_email") != donation.donor_email:
+        raise HTTPException(status_code=409, detail="Idempotency key was already used for a different donation")
+    if not existing.get("razorpay_order_id"):
+        raise HTTPException(status_code=409, detail="Donation order is still being created, please retry")
+    logger.info(f"Replaying donation order {existing['razorpay_order_id']} for a retried request")
+    return order_response(existing["razorpay_order_id"], existing["amount"])
+
+async def release_donation_claim(db, donation_id: ObjectId):
+    """Drop a pending donation whose Razorpay order was never created."""
+    try:
+        await db.donations.delete_one({"_id": donation_id, "razorpay_order_id": None})
+    except Exception as e:
+        logger.error(f"Failed to release donation {donation_id}: {str(e)}")
+
 @router.post("/create-order")
-async def create_donation_order(donation: DonationCreate, db: AsyncIOMotorDatabase = Depends(get_db)):
-    """Create Razorpay order for donation."""
+async def create_donation_order(
+    donation: DonationCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Create Razorpay order for donation.
+
+    Send an Idempotency-Key header to make retries safe: a repeated key
+    returns the order created by the first request instead of a new one.
+    """
     try:
-        # Create Razorpay order
-        order_amount = int(donation.amount * 100)  # Convert to paise
-        order_data = {
-            "amount": order_amount,
-            "currency": "INR",
-            "receipt": f"donation_{datetime.utcnow().timestamp()}",
-            "notes": {
-                "donor_name": donation.donor_name,
-                "donor_email": donation.donor_email,
-                "donor_phone": donation.donor_phone,
-                "message": donation.message,
-                "type": "donation"
-            }
-        }
-        
-        order = razorpay_client.order.create(data=order_data)
-        
-        # Store pending donation
+        if not razorpay_service.client:
+            raise HTTPException(status_code=500, detail="Payment service not configured")
+
+        donation_id = ObjectId()
         donation_record = {
+            "_id": donation_id,
             "donor_name": donation.donor_name,
             "donor_email": donation.donor_email,
             "donor_phone": donation.donor_phone,
             "amount": donation.amount,
             "message": donation.message,
-            "razorpay_order_id": order["id"],
+            "razorpay_order_id": None,
             "status": "pending",
             "created_at": datetime.utcnow()
         }
-        
-        await db.donations.insert_one(donation_record)
-        
-        return {
-            "success": True,
-            "order_id": order["id"],
-            "amount": order_amount,
-            "currency": order["currency"],
-            "key_id": os.environ.get("RAZORPAY_KEY_ID")
+        order_notes = {
+            "donor_name": donation.donor_name,
+            "donor_email": donation.donor_email,
+            "donor_phone": donation.donor_phone,
+            "message": donation.message,
+            "type": "donation"
         }
+        receipt = f"donation_{donation_id}"
+
+        if idempotency_key:
+            # Claim the key before calling Razorpay so a retry cannot mint a second order
+            donation_record["idempotency_key"] = idempotency_key
+            try:
+                existing = await db.donations.find_one_and_update(
+                    {"idempotency_key": idempotency_key},
+                    {"$setOnInsert": donation_record},
+                    upsert=True,
+                    return_document=ReturnDocument.BEFORE
+                )
+            except DuplicateKeyError:
+                existing = await db.donations.find_one({"idempotency_key": idempotency_key})
+            if existing is not None:
+                return await replay_donation_order(existing, donation)
+
+        try:
+            if idempotency_key:
+                order = await razorpay_service.create_order_async(donation.amount, receipt=receipt, notes=order_notes)
+            else:
+                # Nothing to deduplicate: record the pending donation while Razorpay works
+                order, inserted = await asyncio.gather(
+                    razorpay_service.create_order_async(donation.amount, receipt=receipt, notes=order_notes),
+                    db.donations.insert_one(donation_record),
+                    return_exceptions=True
+                )
+                for result in (order, inserted):
+                    if isinstance(result, BaseException):
+                        raise result
+            if not order["success"]:
+                raise Exception(order["error"])
+
+            await db.donations.update_one(
+                {"_id": donation_id},
+                {"$set": {"razorpay_order_id": order["order_id"]}}
+            )
+        except BaseException:
+            # Failed, timed out or cancelled: release the idempotency key so a retry can create the order
+            await asyncio.shield(release_donation_claim(db, donation_id))
+            raise
+
+        return order_response(order["order_id"], donation.amount)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Create donation order error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to create donation order")
@@ -89,19 +151,17 @@ async def create_donation_order(donation: DonationCreate, db: AsyncIOMotorDataba
 async def verify_donation_payment(payment_data: DonationVerification, db: AsyncIOMotorDatabase = Depends(get_db)):
     """Verify Razorpay payment for donation."""
     try:
-        # Verify signature
-        signature = hmac.new(
-            os.environ.get("RAZORPAY_KEY_SECRET").encode(),
-            f"{payment_data.razorpay_order_id}|{payment_data.razorpay_payment_id}".encode(),
-            hashlib.sha256
-        ).hexdigest()
-        
-        if signature != payment_data.razorpay_signature:
+        # Verify signature (constant-time comparison)
+        if not razorpay_service.verify_payment_signature(
+            payment_data.razorpay_order_id,
+            payment_data.razorpay_payment_id,
+            payment_data.razorpay_signature
+        ):
             raise HTTPException(status_code=400, detail="Invalid payment signature")
         
-        # Update donation record
-        result = await db.donations.update_one(
-            {"razorpay_order_id": payment_data.razorpay_order_id},
+        # Complete the donation; only the first verification of an order counts towards the totals
+        donation = await db.donations.find_one_and_update(
+            {"razorpay_order_id": payment_data.razorpay_order_id, "status": {"$ne": "completed"}},
             {
                 "$set": {
                     "razorpay_payment_id": payment_data.razorpay_payment_id,
@@ -113,10 +173,17 @@ async def verify_donation_payment(payment_data: DonationVerification, db: AsyncI
                     "amount": payment_data.amount,
                     "message": payment_data.message
                 }
-            }
+            },
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0:
+        if donation is not None:
+            await donation_ledger.record(db, donation)
+            await record_revenue(
+                db, "donations", payment_data.razorpay_payment_id, donation["amount"],
+                plan="donation", at=donation["completed_at"]
+            )
+        elif not await db.donations.find_one({"razorpay_order_id": payment_data.razorpay_order_id}, {"_id": 1}):
             raise HTTPException(status_code=404, detail="Donation record not found")
         
         return {
@@ -131,49 +198,26 @@ async def verify_donation_payment(payment_data: DonationVerification, db: AsyncI
 
 @router.get("/stats")
 async def get_donation_stats(db: AsyncIOMotorDatabase = Depends(get_db)):
-    """Get donation statistics."""
+    """Get donation statistics (from the ledger summary, see services/donation_ledger.py)."""
     try:
-        # Get total donations
-        pipeline = [
-            {"$match": {"status": "completed"}},
-            {"$group": {
-                "_id": None,
-                "total_amount": {"$sum": "$amount"},
-                "total_count": {"$sum": 1}
-            }}
-        ]
-        
-        result = await db.donations.aggregate(pipeline).to_list(1)
-        
-        if result:
-            return {
-                "total_amount": result[0]["total_amount"],
-                "total_donors": result[0]["total_count"]
-            }
-        else:
-            return {
-                "total_amount": 0,
-                "total_donors": 0
-            }
+        await donation_ledger.refresh(db)
+        return donation_ledger.stats()
     except Exception as e:
         logger.error(f"Get donation stats error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get donation stats")
 
 @router.get("/recent")
 async def get_recent_donations(limit: int = 10, db: AsyncIOMotorDatabase = Depends(get_db)):
-    """Get recent donations (for public display)."""
+    """Get recent donations (for public display); at most DONATION_RECENT_SIZE are kept."""
     try:
-        donations = await db.donations.find(
-            {"status": "completed"},
-            {"donor_name": 1, "amount": 1, "message": 1, "completed_at": 1, "_id": 0}
-        ).sort("completed_at", -1).limit(limit).to_list(limit)
-        
-        # Format dates
-        for donation in donations:
-            if donation.get("completed_at"):
-                donation["completed_at"] = donation["completed_at"].isoformat()
+        await donation_ledger.refresh(db)
         
-        return {"donations": donations}
+        # Dates are encoded by the response class
+        return FastJSONResponse({"donations": donation_ledger.latest(limit)})
     except Exception as e:
         logger.error(f"Get recent donations error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get recent donations")
+
+async def warm_donation_ledger(db):
+    """Startup warmup: load (or build) the donation summary and recent donations."""
+    await donation_ledger.load(db)
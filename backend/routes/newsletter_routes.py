@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
 from models import NewsletterSubscribe, Newsletter
 import logging
+from typing import Optional
 from email_service import email_service
+from middleware import require_admin
+from services.signup_lists import export_response, import_upload
 
 logger = logging.getLogger(__name__)
 
@@ -16,28 +20,33 @@ async def get_db():
 async def subscribe_to_newsletter(subscribe_data: NewsletterSubscribe, db: AsyncIOMotorDatabase = Depends(get_db)):
     """Subscribe to newsletter."""
     try:
-        # Check if email already exists
-        existing = await db.newsletter_subscribers.find_one({"email": subscribe_data.email})
-        if existing:
-            if existing.get("active", False):
-                return {
-                    "success": True,
-                    "message": "Email already subscribed"
-                }
-            else:
-                # Reactivate subscription
-                await db.newsletter_subscribers.update_one(
-                    {"email": subscribe_data.email},
-                    {"$set": {"active": True}}
-                )
+        # One upsert on the email: creates the subscriber, or flips an existing
+        # one to active; the unique email index rejects a concurrent second one
+        newsletter = Newsletter(email=subscribe_data.email)
+        new_subscriber = newsletter.dict(by_alias=True, exclude={"id", "active"})
+        try:
+            result = await db.newsletter_subscribers.update_one(
+                {"email": subscribe_data.email},
+                {"$set": {"active": True}, "$setOnInsert": new_subscriber},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A concurrent request for the same email created it first
+            return {
+                "success": True,
+                "message": "Email already subscribed"
+            }
+        
+        if result.upserted_id is None:
+            if result.modified_count:
                 return {
                     "success": True,
                     "message": "Subscription reactivated"
                 }
-        
-        # Create new subscription
-        newsletter = Newsletter(email=subscribe_data.email)
-        result = await db.newsletter_subscribers.insert_one(newsletter.dict(by_alias=True, exclude={"id"}))
+            return {
+                "success": True,
+                "message": "Email already subscribed"
+            }
         
         # Send confirmation email
         email_result = await email_service.send_newsletter_confirmation_email(subscribe_data.email)
@@ -48,7 +57,7 @@ async def subscribe_to_newsletter(subscribe_data: NewsletterSubscribe, db: Async
         return {
             "success": True,
             "message": "Successfully subscribed to newsletter",
-            "subscriberId": str(result.inserted_id)
+            "subscriberId": str(result.upserted_id)
         }
     except Exception as e:
         logger.error(f"Newsletter subscription error: {str(e)}")
@@ -84,3 +93,47 @@ async def unsubscribe_from_newsletter(subscribe_data: NewsletterSubscribe, db: A
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to unsubscribe from newsletter"
         )
+
+@router.post("/import")
+async def import_subscribers(
+    file: UploadFile = File(...),
+    file_format: Optional[str] = None,
+    batch_size: int = 1000,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    admin_user = Depends(require_admin)
+):
+    """Bulk import subscribers from a JSONL or CSV upload; existing emails are skipped (Admin only)"""
+    try:
+        report = await import_upload(db, "newsletter", file, file_format, batch_size)
+        return {
+            "success": True,
+            "message": f"Imported {report['imported']} subscribers",
+            "data": report
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Newsletter import error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to import subscribers"
+        )
+
+@router.get("/export")
+async def export_subscribers(
+    file_format: str = "csv",
+    active_only: bool = True,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    admin_user = Depends(require_admin)
+):
+    """Download newsletter subscribers as CSV or JSONL, active ones only by default (Admin only)"""
+    try:
+        return await export_response(db, "newsletter", file_format, {"active": True} if active_only else None)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Newsletter export error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to export newsletter subscribers"
+        )
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Request
 from pydantic import BaseModel, EmailStr
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timedelta
@@ -6,7 +6,9 @@ import secrets
 import hashlib
 from passlib.context import CryptContext
 import logging
+import os
 from email_service import email_service
+from services.rate_limit import client_ip, sliding_window_limiter, too_many_requests
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +16,18 @@ router = APIRouter(prefix="/password-reset", tags=["Password Reset"])
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Reset codes requested per email and per client IP, and code checks
+# (verify-token / reset-password) per email, as "<hits>/<seconds>"
+reset_email_limiter = sliding_window_limiter(
+    "password_reset_email", os.getenv("PASSWORD_RESET_EMAIL_RATE", "3/900")
+)
+reset_ip_limiter = sliding_window_limiter(
+    "password_reset_ip", os.getenv("PASSWORD_RESET_IP_RATE", "20/900")
+)
+reset_attempt_limiter = sliding_window_limiter(
+    "password_reset_attempt", os.getenv("PASSWORD_RESET_ATTEMPT_RATE", "10/900")
+)
+
 async def get_db():
     from server import db
     return db
@@ -34,10 +48,40 @@ def generate_reset_token():
     """Generate a secure 6-digit reset token"""
     return ''.join([str(secrets.randbelow(10)) for _ in range(6)])
 
+async def check_attempt_limit(email: str):
+    decision = await reset_attempt_limiter.hit(email.lower())
+    if not decision.allowed:
+        raise too_many_requests(decision, "Too many attempts, please request a new code later")
+
+async def send_reset_email(email: str, reset_token: str, user_name: str):
+    """Runs after the response is sent"""
+    try:
+        email_result = await email_service.send_password_reset_email(
+            to_email=email,
+            reset_token=reset_token,
+            user_name=user_name
+        )
+        if not email_result["success"]:
+            logger.error(f"Failed to send password reset email: {email_result.get('message')}")
+    except Exception as e:
+        logger.error(f"Failed to send password reset email: {str(e)}")
+
 @router.post("/request-reset")
-async def request_password_reset(request: ForgotPasswordRequest, db: AsyncIOMotorDatabase = Depends(get_db)):
+async def request_password_reset(
+    request: ForgotPasswordRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
     """Request password reset - generates OTP and stores it"""
     try:
+        # Per IP first, so one client cycling through emails is stopped too
+        decision = await reset_ip_limiter.hit(client_ip(http_request))
+        if decision.allowed:
+            decision = await reset_email_limiter.hit(request.email.lower())
+        if not decision.allowed:
+            raise too_many_requests(decision, "Too many password reset requests, please try again later")
+
         # Check if user exists
         user = await db.users.find_one({"email": request.email}, {"_id": 0})
         
@@ -71,17 +115,9 @@ async def request_password_reset(request: ForgotPasswordRequest, db: AsyncIOMoto
             upsert=True
         )
         
-        # Send password reset email
+        # Send password reset email off the request path; a failure is only logged
         user_name = user.get("name", user.get("username", ""))
-        email_result = await email_service.send_password_reset_email(
-            to_email=request.email,
-            reset_token=reset_token,
-            user_name=user_name
-        )
-        
-        if not email_result["success"]:
-            logger.error(f"Failed to send password reset email: {email_result.get('message')}")
-            # Don't fail the request if email fails, but log it
+        background_tasks.add_task(send_reset_email, request.email, reset_token, user_name)
         
         logger.info(f"Password reset requested for {request.email}")
         
@@ -90,6 +126,8 @@ async def request_password_reset(request: ForgotPasswordRequest, db: AsyncIOMoto
             "message": "Password reset code sent to your email"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Request password reset error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to process password reset request")
@@ -98,6 +136,8 @@ async def request_password_reset(request: ForgotPasswordRequest, db: AsyncIOMoto
 async def verify_reset_token(request: VerifyTokenRequest, db: AsyncIOMotorDatabase = Depends(get_db)):
     """Verify if the reset token is valid"""
     try:
+        await check_attempt_limit(request.email)
+        
         # Hash the provided token
         token_hash = hashlib.sha256(request.reset_token.encode()).hexdigest()
         
@@ -130,6 +170,8 @@ async def verify_reset_token(request: VerifyTokenRequest, db: AsyncIOMotorDataba
 async def reset_password(request: ResetPasswordRequest, db: AsyncIOMotorDatabase = Depends(get_db)):
     """Reset password using verified token"""
     try:
+        await check_attempt_limit(request.email)
+        
         # Verify user exists
         user = await db.users.find_one({"email": request.email}, {"_id": 0})
         if not user:
@@ -171,6 +213,8 @@ async def reset_password(request: ResetPasswordRequest, db: AsyncIOMotorDatabase
             {"$set": {"used": True, "used_at": datetime.utcnow()}}
         )
         
+        await reset_attempt_limiter.reset(request.email.lower())
+        
         logger.info(f"Password reset successful for {request.email}")
         
         return {
@@ -186,7 +230,10 @@ async def reset_password(request: ResetPasswordRequest, db: AsyncIOMotorDatabase
 
 @router.delete("/cleanup-expired")
 async def cleanup_expired_tokens(db: AsyncIOMotorDatabase = Depends(get_db)):
-    """Cleanup expired reset tokens (can be called by a scheduled job)"""
+    """
+    Cleanup expired reset tokens. The expiration_ttl index already removes
+    them within about a minute of expiring; kept for existing scheduled jobs.
+    """
     try:
         result = await db.password_resets.delete_many({
             "expiration": {"$lt": datetime.utcnow()}
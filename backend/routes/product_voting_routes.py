@@ -1,6 +1,14 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models import ProductSuggestion, ProductSuggestionCreate, UserVote, VoteRequest, ShareInvite
+from services.dataloader import find_by_ids
+from services.document_mapper import DocumentMapper
+from services.entitlements import entitlements
+from services.leaderboard import WITHOUT_VOTERS, suggestion_leaderboard
+from services.repository import Repository
+from services.uploads import iter_rows, iter_upload_lines
+from services.vote_import import import_votes
+from middleware import require_admin
 from bson import ObjectId
 from datetime import datetime, timedelta
 import logging
@@ -14,26 +22,24 @@ async def get_db():
     from server import db
     return db
 
+suggestion_repository = Repository("product_suggestions")
+
+def vote_progress(suggestion: dict) -> float:
+    return min((suggestion["votes"] / suggestion["vote_threshold"]) * 100, 100)
+
+suggestion_mapper = DocumentMapper({"_id": "id"}, passthrough=True)
+listed_suggestion_mapper = DocumentMapper(
+    {"_id": "id"}, passthrough=True, computed={"progress_percentage": vote_progress}
+)
+
 async def get_current_user_id():
     # This should be replaced with actual JWT token validation
     # For now, returning a placeholder
     return "user_123"
 
 async def is_premium_user(user_id: str, db: AsyncIOMotorDatabase):
-    """Check if user has premium subscription"""
-    # Check user's subscription status
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        return False
-    
-    # Check if user has active subscription
-    subscription = await db.user_subscriptions.find_one({
-        "user_id": user_id,
-        "status": "active",
-        "end_date": {"$gt": datetime.utcnow()}
-    })
-    
-    return subscription is not None
+    """Check if user has premium subscription (cached, see services/entitlements.py)"""
+    return await entitlements.is_premium(db, user_id)
 
 async def get_user_monthly_vote_count(user_id: str, db: AsyncIOMotorDatabase):
     """Get user's vote count for current month"""
@@ -59,19 +65,16 @@ async def get_product_suggestions(
         query = {"status": status}
         
         # Get suggestions sorted by vote count (descending)
-        cursor = db.product_suggestions.find(query).sort("votes", -1).skip(skip).limit(limit)
-        suggestions = await cursor.to_list(length=limit)
-        
-        # Convert ObjectId to string and format response
+        if suggestion_leaderboard.ready:
+            suggestions = suggestion_leaderboard.top(status, limit, skip)
+            total_count = suggestion_leaderboard.count(status)
+        else:
+            cursor = db.product_suggestions.find(query, WITHOUT_VOTERS).sort("votes", -1).skip(skip).limit(limit)
+            suggestions = await cursor.to_list(length=limit)
+            total_count = await db.product_suggestions.count_documents(query)
+        
+        suggestions = listed_suggestion_mapper.many(suggestions)
         for suggestion in suggestions:
-            suggestion["id"] = str(suggestion["_id"])
-            del suggestion["_id"]
-            
-            # Calculate progress percentage
-            suggestion["progress_percentage"] = min(
-                (suggestion["votes"] / suggestion["vote_threshold"]) * 100, 100
-            )
-            
             # Add time remaining estimate
             if suggestion["votes"] > 0:
                 days_since_creation = (datetime.utcnow() - suggestion["created_at"]).days
@@ -82,8 +85,6 @@ async def get_product_suggestions(
                         estimated_days = max(1, int(remaining_votes / votes_per_day))
                         suggestion["estimated_completion_days"] = estimated_days
         
-        total_count = await db.product_suggestions.count_documents(query)
-        
         return {
             "success": True,
             "data": {
@@ -123,20 +124,14 @@ async def create_product_suggestion(
             estimated_test_date=suggestion_data.estimated_test_date
         )
         
-        # Insert into database
-        result = await db.product_suggestions.insert_one(
-            suggestion.dict(by_alias=True, exclude={"id"})
-        )
-        
-        # Get the created suggestion
-        created_suggestion = await db.product_suggestions.find_one(
-            {"_id": result.inserted_id}
+        # Insert into database; the inserted document is the response
+        created_suggestion = await suggestion_repository.insert(
+            db, suggestion.dict(by_alias=True, exclude={"id"})
         )
+        suggestion_leaderboard.upsert(created_suggestion)
         
-        created_suggestion["id"] = str(created_suggestion["_id"])
-        del created_suggestion["_id"]
-        
-        logger.info(f"Product suggestion created: {result.inserted_id}")
+        logger.info(f"Product suggestion created: {created_suggestion['_id']}")
+        created_suggestion = suggestion_mapper(created_suggestion)
         
         return {
             "success": True,
@@ -169,7 +164,8 @@ async def vote_for_product(
             )
         
         suggestion = await db.product_suggestions.find_one(
-            {"_id": ObjectId(vote_request.product_suggestion_id)}
+            {"_id": ObjectId(vote_request.product_suggestion_id)},
+            WITHOUT_VOTERS
         )
         
         if not suggestion:
@@ -184,8 +180,10 @@ async def vote_for_product(
                 detail="Voting is closed for this product"
             )
         
-        # Check if user already voted for this product
-        if current_user_id in suggestion.get("voters", []):
+        # Check if user already voted for this product, without loading every voter
+        if await db.product_suggestions.find_one(
+            {"_id": suggestion["_id"], "voters": current_user_id}, {"_id": 1}
+        ):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="You have already voted for this product"
@@ -214,18 +212,15 @@ async def vote_for_product(
         
         await db.user_votes.insert_one(user_vote.dict(by_alias=True, exclude={"id"}))
         
-        # Update suggestion vote count and voters list
-        result = await db.product_suggestions.update_one(
-            {"_id": ObjectId(vote_request.product_suggestion_id)},
+        # Update suggestion vote count and voters list, getting the updated suggestion back
+        updated_suggestion = await suggestion_repository.update_by_id(
+            db,
+            vote_request.product_suggestion_id,
             {
                 "$inc": {"votes": 1},
                 "$push": {"voters": current_user_id}
-            }
-        )
-        
-        # Get updated suggestion
-        updated_suggestion = await db.product_suggestions.find_one(
-            {"_id": ObjectId(vote_request.product_suggestion_id)}
+            },
+            projection=WITHOUT_VOTERS
         )
         
         # Check if vote threshold reached
@@ -236,8 +231,12 @@ async def vote_for_product(
                 {"$set": {"status": "testing"}}
             )
             
+            updated_suggestion["status"] = "testing"
+            
             logger.info(f"Product suggestion {vote_request.product_suggestion_id} reached vote threshold")
         
+        suggestion_leaderboard.upsert(updated_suggestion)
+        
         return {
             "success": True,
             "message": "Vote recorded successfully",
@@ -278,15 +277,16 @@ async def get_user_votes(
             {"user_id": current_user_id}
         ).sort("voted_at", -1).to_list(100)
         
-        # Get product details for voted products
+        # Get product details for voted products in one $in query
+        products = await find_by_ids(
+            db.product_suggestions,
+            (vote["product_suggestion_id"] for vote in user_votes)
+        )
         voted_products = []
         for vote in user_votes:
-            product = await db.product_suggestions.find_one(
-                {"_id": ObjectId(vote["product_suggestion_id"])}
-            )
+            product = products.get(str(vote["product_suggestion_id"]))
             if product:
-                product["id"] = str(product["_id"])
-                del product["_id"]
+                product = suggestion_mapper(product)
                 product["voted_at"] = vote["voted_at"]
                 voted_products.append(product)
         
@@ -373,40 +373,114 @@ async def share_product_suggestion(
             detail="Failed to record share"
         )
 
+@router.post("/votes/import")
+async def import_user_votes(
+    file: UploadFile = File(...),
+    file_format: Optional[str] = None,
+    batch_size: int = 1000,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    admin_user = Depends(require_admin)
+):
+    """Bulk import / replay votes from a JSONL or CSV upload (Admin only)"""
+    try:
+        file_format = file_format or ("csv" if (file.filename or "").endswith(".csv") else "jsonl")
+        if file_format not in ("jsonl", "csv"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Format must be jsonl or csv"
+            )
+        
+        report = await import_votes(
+            db,
+            iter_rows(iter_upload_lines(file), file_format),
+            batch_size=max(1, min(batch_size, 10000))
+        )
+        
+        # Counters changed behind the leaderboard's back
+        await suggestion_leaderboard.rebuild(db.product_suggestions)
+        
+        return {
+            "success": True,
+            "message": f"Imported {report['imported']} votes",
+            "data": report
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing votes: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to import votes"
+        )
+
+VOTING_STATS_PIPELINE = [
+    {"$facet": {
+        "by_status": [
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ],
+        "totals": [
+            {"$group": {"_id": None, "suggestions": {"$sum": 1}, "votes": {"$sum": "$votes"}}}
+        ],
+        "most_voted": [
+            {"$match": {"status": "voting"}},
+            {"$sort": {"votes": -1}},
+            {"$limit": 5},
+            {"$project": {"voters": 0}}
+        ],
+        "by_category": [
+            {"$group": {"_id": "$category", "suggestions": {"$sum": 1}, "votes": {"$sum": "$votes"}}},
+            {"$sort": {"votes": -1, "_id": 1}}
+        ]
+    }}
+]
+
+async def aggregate_voting_stats(db: AsyncIOMotorDatabase):
+    """Compute voting statistics from MongoDB in a single $facet round trip"""
+    result = await db.product_suggestions.aggregate(VOTING_STATS_PIPELINE).to_list(1)
+    facets = result[0] if result else {}
+    
+    status_counts = {item["_id"]: item["count"] for item in facets.get("by_status", [])}
+    totals = facets["totals"][0] if facets.get("totals") else {"suggestions": 0, "votes": 0}
+    
+    return {
+        "total_suggestions": totals["suggestions"],
+        "active_voting": status_counts.get("voting", 0),
+        "testing_phase": status_counts.get("testing", 0),
+        "completed_tests": status_counts.get("completed", 0),
+        "total_votes": totals["votes"],
+        "most_voted_products": facets.get("most_voted", []),
+        "category_breakdown": [
+            {"category": item["_id"], "suggestions": item["suggestions"], "votes": item["votes"]}
+            for item in facets.get("by_category", [])
+        ]
+    }
+
 @router.get("/stats")
 async def get_voting_stats(
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get overall voting statistics"""
     try:
-        # Get various statistics
-        total_suggestions = await db.product_suggestions.count_documents({})
-        active_voting = await db.product_suggestions.count_documents({"status": "voting"})
-        testing_phase = await db.product_suggestions.count_documents({"status": "testing"})
-        completed_tests = await db.product_suggestions.count_documents({"status": "completed"})
-        
-        # Get total votes cast
-        total_votes = await db.user_votes.count_documents({})
-        
-        # Get most voted products
-        most_voted = await db.product_suggestions.find(
-            {"status": "voting"}
-        ).sort("votes", -1).limit(5).to_list(5)
+        # Answer from the in-memory leaderboard, or one aggregation while it is cold
+        if suggestion_leaderboard.ready:
+            stats = {
+                "total_suggestions": suggestion_leaderboard.count(),
+                "active_voting": suggestion_leaderboard.count("voting"),
+                "testing_phase": suggestion_leaderboard.count("testing"),
+                "completed_tests": suggestion_leaderboard.count("completed"),
+                "total_votes": suggestion_leaderboard.total_votes(),
+                "most_voted_products": suggestion_leaderboard.top("voting", 5),
+                "category_breakdown": suggestion_leaderboard.category_breakdown()
+            }
+        else:
+            stats = await aggregate_voting_stats(db)
         
-        for product in most_voted:
-            product["id"] = str(product["_id"])
-            del product["_id"]
+        stats["most_voted_products"] = suggestion_mapper.many(stats["most_voted_products"])
         
         return {
             "success": True,
-            "data": {
-                "total_suggestions": total_suggestions,
-                "active_voting": active_voting,
-                "testing_phase": testing_phase,
-                "completed_tests": completed_tests,
-                "total_votes": total_votes,
-                "most_voted_products": most_voted
-            }
+            "data": stats
         }
         
     except Exception as e:
@@ -414,4 +488,4 @@ async def get_voting_stats(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to fetch voting stats"
-        )
\ No newline at end of file
+        )
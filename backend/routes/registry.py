@@ -0,0 +1,89 @@
+"""
+Router registry: which route modules the API serves, gated by feature flags
+
+Configured through environment variables:
+    ENVIRONMENT        "production" turns off the debug and test endpoints by default
+    ENABLED_FEATURES   comma-separated features to turn on in addition to the defaults
+    DISABLED_FEATURES  comma-separated features to turn off
+
+Route modules are imported only when their feature is enabled, so disabled
+features cost nothing at startup.
+"""
+import importlib
+import logging
+import os
+from typing import List, NamedTuple, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class RouterSpec(NamedTuple):
+    feature: str
+    module: str
+    # Off in production unless listed in ENABLED_FEATURES
+    development_only: bool = False
+    # Missing module is logged and skipped instead of failing startup
+    optional: bool = False
+    # Names of async (db) -> None callables in the module to run during startup warmup
+    warmups: Tuple[str, ...] = ()
+
+ROUTERS: List[RouterSpec] = [
+    RouterSpec("auth", "routes.auth_routes"),
+    RouterSpec("waitlist", "routes.waitlist_routes"),
+    RouterSpec("voting", "routes.voting_routes"),
+    RouterSpec("product_voting", "routes.product_voting_routes"),
+    RouterSpec("blog", "routes.blog_routes"),
+    RouterSpec("newsletter", "routes.newsletter_routes"),
+    RouterSpec("stats", "routes.stats_routes", warmups=("warm_community_stats",)),
+    RouterSpec("subscriptions", "routes.subscription_routes", warmups=("warm_tier_catalog",)),
+    RouterSpec("password_reset", "routes.password_reset_routes"),
+    RouterSpec("email", "routes.email_routes"),
+    RouterSpec("reports", "routes.report_routes"),
+    RouterSpec("subscription_payments", "routes.subscription_payment_routes"),
+    RouterSpec("webhooks", "routes.webhook_routes"),
+    RouterSpec("analytics", "routes.analytics_routes"),
+    RouterSpec("debug", "routes.debug_routes", development_only=True),
+    RouterSpec("test_endpoints", "routes.test_routes", development_only=True),
+    # May not exist in older deployments
+    RouterSpec("donations", "routes.donation_routes", optional=True, warmups=("warm_donation_ledger",)),
+]
+
+def _feature_list(name: str) -> Set[str]:
+    return {feature.strip() for feature in os.getenv(name, "").split(",") if feature.strip()}
+
+def enabled_features() -> Set[str]:
+    production = os.getenv("ENVIRONMENT", "development").lower() == "production"
+    features = {spec.feature for spec in ROUTERS if not (production and spec.development_only)}
+    features |= _feature_list("ENABLED_FEATURES")
+    features -= _feature_list("DISABLED_FEATURES")
+    return features
+
+def include_routers(api_router, features: Set[str]) -> List[Tuple[str, object]]:
+    """
+    Import and include the routers of enabled features
+
+    Returns (name, callable) warmup tasks declared by the included modules.
+    """
+    unknown = features - {spec.feature for spec in ROUTERS}
+    if unknown:
+        logger.warning(f"Unknown features in configuration: {', '.join(sorted(unknown))}")
+
+    warmups = []
+    included = []
+    for spec in ROUTERS:
+        if spec.feature not in features:
+            continue
+        try:
+            module = importlib.import_module(spec.module)
+        except ImportError as e:
+            if not spec.optional:
+                raise
+            logger.warning(f"{spec.module} not found - {spec.feature} features will be disabled ({str(e)})")
+            continue
+
+        api_router.include_router(module.router)
+        included.append(spec.feature)
+        warmups += [(f"{spec.feature}.{name}", getattr(module, name)) for name in spec.warmups]
+
+    skipped = sorted({spec.feature for spec in ROUTERS} - set(included))
+    logger.info(f"Routers enabled: {', '.join(included)}" + (f"; disabled: {', '.join(skipped)}" if skipped else ""))
+    return warmups
@@ -5,22 +5,25 @@ import uuid
 from datetime import datetime, timedelta
 import logging
 import json
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 
 # Import email service and razorpay service
 from email_service import email_service
 from services.razorpay_service import razorpay_service
 from models import TestReport, TestReportCreate, TestParameter
+from services.document_mapper import DocumentMapper
+from services.repository import Repository
+from services.revenue_rollups import record_revenue
+from services.serialization import FastJSONResponse
+from services.state_store import create_store
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+async def get_db():
+    from server import db
+    return db
 
 class ReportPurchaseRequest(BaseModel):
     firstName: str
@@ -48,39 +51,27 @@ class PaymentVerificationRequest(BaseModel):
     razorpay_signature: str
     customer_order_id: str
 
-# In-memory storage for demo (use database in production)
-report_orders = {}
+report_repository = Repository("test_reports")
+
+# Stored test_reports documents -> camelCase API shape
+report_mapper = DocumentMapper.for_model(TestReport, camel_case=True, keep=("created_at",))
+
+# Report purchase orders keyed by our order ID (backend set by STATE_BACKEND)
+report_orders = create_store("report_orders", lookup_fields=("razorpayOrderId",))
 
 # Test Report CRUD Operations
 @router.get("/reports")
-async def get_all_reports(skip: int = 0, limit: int = 100):
+async def get_all_reports(skip: int = 0, limit: int = 100, db: AsyncIOMotorDatabase = Depends(get_db)):
     """
     Get all test reports with pagination
     """
     try:
         cursor = db.test_reports.find().skip(skip).limit(limit).sort("created_at", -1)
-        reports = []
-        
-        async for report in cursor:
-            # Convert ObjectId to string and adjust field names for frontend compatibility
-            report_data = {
-                "id": str(report["_id"]),
-                "productName": report["product_name"],
-                "brand": report["brand"],
-                "category": report["category"],
-                "purityScore": report["purity_score"],
-                "testDate": report["test_date"],
-                "testedBy": report["tested_by"],
-                "image": report["image"],
-                "parameters": report["parameters"],
-                "summary": report["summary"],
-                "created_at": report["created_at"]
-            }
-            reports.append(report_data)
+        reports = report_mapper.many(await cursor.to_list(limit))
         
         total_count = await db.test_reports.count_documents({})
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "data": {
                 "reports": reports,
@@ -88,14 +79,14 @@ async def get_all_reports(skip: int = 0, limit: int = 100):
                 "skip": skip,
                 "limit": limit
             }
-        }
+        })
         
     except Exception as e:
         logger.error(f"Error fetching reports: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch reports")
 
 @router.get("/reports/{report_id}")
-async def get_report_by_id(report_id: str):
+async def get_report_by_id(report_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
     """
     Get a specific test report by ID
     """
@@ -108,24 +99,9 @@ async def get_report_by_id(report_id: str):
         if not report:
             raise HTTPException(status_code=404, detail="Report not found")
         
-        # Convert ObjectId to string and adjust field names for frontend compatibility
-        report_data = {
-            "id": str(report["_id"]),
-            "productName": report["product_name"],
-            "brand": report["brand"],
-            "category": report["category"],
-            "purityScore": report["purity_score"],
-            "testDate": report["test_date"],
-            "testedBy": report["tested_by"],
-            "image": report["image"],
-            "parameters": report["parameters"],
-            "summary": report["summary"],
-            "created_at": report["created_at"]
-        }
-        
         return {
             "success": True,
-            "data": report_data
+            "data": report_mapper(report)
         }
         
     except HTTPException:
@@ -135,7 +111,7 @@ async def get_report_by_id(report_id: str):
         raise HTTPException(status_code=500, detail="Failed to fetch report")
 
 @router.post("/reports")
-async def create_report(report_data: TestReportCreate):
+async def create_report(report_data: TestReportCreate, db: AsyncIOMotorDatabase = Depends(get_db)):
     """
     Create a new test report
     """
@@ -154,27 +130,12 @@ async def create_report(report_data: TestReportCreate):
             "created_at": datetime.utcnow()
         }
         
-        # Insert into database
-        result = await db.test_reports.insert_one(report_doc)
-        
-        # Return the created report
-        created_report = await db.test_reports.find_one({"_id": result.inserted_id})
-        
-        report_response = {
-            "id": str(created_report["_id"]),
-            "productName": created_report["product_name"],
-            "brand": created_report["brand"],
-            "category": created_report["category"],
-            "purityScore": created_report["purity_score"],
-            "testDate": created_report["test_date"],
-            "testedBy": created_report["tested_by"],
-            "image": created_report["image"],
-            "parameters": created_report["parameters"],
-            "summary": created_report["summary"],
-            "created_at": created_report["created_at"]
-        }
+        # Insert into database; the inserted document is the response
+        created_report = await report_repository.insert(db, report_doc)
+        
+        report_response = report_mapper(created_report)
         
-        logger.info(f"Test report created successfully: {result.inserted_id}")
+        logger.info(f"Test report created successfully: {created_report['_id']}")
         
         return {
             "success": True,
@@ -187,7 +148,7 @@ async def create_report(report_data: TestReportCreate):
         raise HTTPException(status_code=500, detail="Failed to create report")
 
 @router.put("/reports/{report_id}")
-async def update_report(report_id: str, report_data: TestReportCreate):
+async def update_report(report_id: str, report_data: TestReportCreate, db: AsyncIOMotorDatabase = Depends(get_db)):
     """
     Update an existing test report
     """
@@ -195,11 +156,6 @@ async def update_report(report_id: str, report_data: TestReportCreate):
         if not ObjectId.is_valid(report_id):
             raise HTTPException(status_code=400, detail="Invalid report ID")
         
-        # Check if report exists
-        existing_report = await db.test_reports.find_one({"_id": ObjectId(report_id)})
-        if not existing_report:
-            raise HTTPException(status_code=404, detail="Report not found")
-        
         # Update the report document
         update_doc = {
             "product_name": report_data.product_name,
@@ -214,31 +170,12 @@ async def update_report(report_id: str, report_data: TestReportCreate):
             "updated_at": datetime.utcnow()
         }
         
-        # Update in database
-        result = await db.test_reports.update_one(
-            {"_id": ObjectId(report_id)},
-            {"$set": update_doc}
-        )
+        # Update in database and get the updated report back in the same call
+        updated_report = await report_repository.update_by_id(db, report_id, {"$set": update_doc})
+        if not updated_report:
+            raise HTTPException(status_code=404, detail="Report not found")
         
-        if result.modified_count == 0:
-            raise HTTPException(status_code=400, detail="No changes made to report")
-        
-        # Return the updated report
-        updated_report = await db.test_reports.find_one({"_id": ObjectId(report_id)})
-        
-        report_response = {
-            "id": str(updated_report["_id"]),
-            "productName": updated_report["product_name"],
-            "brand": updated_report["brand"],
-            "category": updated_report["category"],
-            "purityScore": updated_report["purity_score"],
-            "testDate": updated_report["test_date"],
-            "testedBy": updated_report["tested_by"],
-            "image": updated_report["image"],
-            "parameters": updated_report["parameters"],
-            "summary": updated_report["summary"],
-            "created_at": updated_report["created_at"]
-        }
+        report_response = report_mapper(updated_report)
         
         logger.info(f"Test report updated successfully: {report_id}")
         
@@ -255,7 +192,7 @@ async def update_report(report_id: str, report_data: TestReportCreate):
         raise HTTPException(status_code=500, detail="Failed to update report")
 
 @router.delete("/reports/{report_id}")
-async def delete_report(report_id: str):
+async def delete_report(report_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
     """
     Delete a test report
     """
@@ -263,16 +200,9 @@ async def delete_report(report_id: str):
         if not ObjectId.is_valid(report_id):
             raise HTTPException(status_code=400, detail="Invalid report ID")
         
-        # Check if report exists
-        existing_report = await db.test_reports.find_one({"_id": ObjectId(report_id)})
-        if not existing_report:
-            raise HTTPException(status_code=404, detail="Report not found")
-        
         # Delete the report
-        result = await db.test_reports.delete_one({"_id": ObjectId(report_id)})
-        
-        if result.deleted_count == 0:
-            raise HTTPException(status_code=400, detail="Failed to delete report")
+        if not await report_repository.delete_by_id(db, report_id):
+            raise HTTPException(status_code=404, detail="Report not found")
         
         logger.info(f"Test report deleted successfully: {report_id}")
         
@@ -317,7 +247,7 @@ async def purchase_report(
         
         # Create Razorpay order
         logger.info(f"Creating Razorpay order for amount: ₹{request.amount}")
-        razorpay_order = razorpay_service.create_order(
+        razorpay_order = await razorpay_service.create_order_async(
             amount=request.amount,
             currency="INR",
             receipt=order_id,
@@ -351,7 +281,7 @@ async def purchase_report(
             "amount": request.amount,
             "paymentStatus": "pending"
         }
-        report_orders[order_id] = order_data
+        await report_orders.set(order_id, order_data)
         
         logger.info(f"Report purchase order created successfully: {order_id} -> {razorpay_order['order_id']}")
         
@@ -375,7 +305,8 @@ async def purchase_report(
 @router.post("/verify-report-payment")
 async def verify_report_payment(
     request: PaymentVerificationRequest,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Verify Razorpay payment and process report delivery
@@ -392,22 +323,27 @@ async def verify_report_payment(
             raise HTTPException(status_code=400, detail="Invalid payment signature")
         
         # Get payment details
-        payment_details = razorpay_service.get_payment_details(request.razorpay_payment_id)
+        payment_details = await razorpay_service.run(razorpay_service.get_payment_details, request.razorpay_payment_id)
         
         if not payment_details["success"]:
             raise HTTPException(status_code=400, detail="Failed to fetch payment details")
         
         # Update order status
-        if request.customer_order_id in report_orders:
-            order_data = report_orders[request.customer_order_id]
-            order_data["status"] = "confirmed"
-            order_data["paymentStatus"] = "completed"
-            order_data["razorpayPaymentId"] = request.razorpay_payment_id
-            order_data["paymentDetails"] = payment_details
-            order_data["confirmedAt"] = datetime.now().isoformat()
+        order_data = await report_orders.update(request.customer_order_id, {
+            "status": "confirmed",
+            "paymentStatus": "completed",
+            "razorpayPaymentId": request.razorpay_payment_id,
+            "paymentDetails": payment_details,
+            "confirmedAt": datetime.now().isoformat()
+        })
+        if order_data is not None:
+            customer_info = order_data["customerInfo"]
+            await record_revenue(
+                db, "reports", request.razorpay_payment_id, customer_info["amount"],
+                plan=customer_info.get("reportType")
+            )
             
             # Send confirmation email
-            customer_info = order_data["customerInfo"]
             background_tasks.add_task(
                 send_purchase_confirmation_email,
                 customer_info["email"],
@@ -447,10 +383,11 @@ async def get_order_status(order_id: str):
     """
     Get order status and details
     """
-    if order_id not in report_orders:
+    order_data = await report_orders.get(order_id)
+    if order_data is None:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    return report_orders[order_id]
+    return order_data
 
 async def send_purchase_confirmation_email(
     email: str, 
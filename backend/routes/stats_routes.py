@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
+import asyncio
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -11,36 +13,55 @@ async def get_db():
     from server import db
     return db
 
+# Community stats are marketing counters; serving them up to a minute stale
+# spares five collection scans per page view
+COMMUNITY_STATS_TTL_SECONDS = 60
+_community_stats = {"value": None, "expires_at": 0.0}
+
+async def compute_community_stats(db: AsyncIOMotorDatabase) -> dict:
+    """Run the community stats queries concurrently."""
+    # Calculate products analyzed (unique brands * categories)
+    pipeline = [
+        {"$group": {"_id": {"brand": "$brand", "category": "$category"}}},
+        {"$count": "total"}
+    ]
+    users, waitlist, tests_completed, upcoming_tests, active_posts, products_result = await asyncio.gather(
+        db.users.count_documents({}),
+        db.waitlist.count_documents({}),
+        db.test_reports.count_documents({}),
+        db.upcoming_tests.count_documents({"status": "voting"}),
+        db.blog_posts.count_documents({}),
+        db.test_reports.aggregate(pipeline).to_list(1)
+    )
+    total_members = users + waitlist
+    products_analyzed = products_result[0]["total"] if products_result else 0
+    
+    # Calculate total funds pooled (simplified - Rs 150 per member * active contributors)
+    # In real scenario, this would sum actual contributions
+    active_contributors = max(50, total_members // 10)  # Estimate 10% contribute
+    funds_pooled = active_contributors * 150  # Rs 150 per month average
+    
+    return {
+        "totalMembers": total_members,
+        "testsCompleted": tests_completed,
+        "productsAnalyzed": max(products_analyzed, tests_completed * 3),  # At least 3 products per test
+        "fundsPooled": funds_pooled,
+        "upcomingTests": upcoming_tests,
+        "activePosts": active_posts
+    }
+
+async def warm_community_stats(db: AsyncIOMotorDatabase):
+    """Fill the community stats cache (startup warmup)."""
+    _community_stats["value"] = await compute_community_stats(db)
+    _community_stats["expires_at"] = time.monotonic() + COMMUNITY_STATS_TTL_SECONDS
+
 @router.get("/community")
 async def get_community_stats(db: AsyncIOMotorDatabase = Depends(get_db)):
     """Get community statistics."""
     try:
-        # Get counts from different collections
-        total_members = await db.users.count_documents({}) + await db.waitlist.count_documents({})
-        tests_completed = await db.test_reports.count_documents({})
-        upcoming_tests = await db.upcoming_tests.count_documents({"status": "voting"})
-        
-        # Calculate products analyzed (unique brands * categories)
-        pipeline = [
-            {"$group": {"_id": {"brand": "$brand", "category": "$category"}}},
-            {"$count": "total"}
-        ]
-        products_result = await db.test_reports.aggregate(pipeline).to_list(1)
-        products_analyzed = products_result[0]["total"] if products_result else 0
-        
-        # Calculate total funds pooled (simplified - Rs 150 per member * active contributors)
-        # In real scenario, this would sum actual contributions
-        active_contributors = max(50, total_members // 10)  # Estimate 10% contribute
-        funds_pooled = active_contributors * 150  # Rs 150 per month average
-        
-        return {
-            "totalMembers": total_members,
-            "testsCompleted": tests_completed,
-            "productsAnalyzed": max(products_analyzed, tests_completed * 3),  # At least 3 products per test
-            "fundsPooled": funds_pooled,
-            "upcomingTests": upcoming_tests,
-            "activePosts": active_posts
-        }
+        if _community_stats["value"] is None or time.monotonic() >= _community_stats["expires_at"]:
+            await warm_community_stats(db)
+        return _community_stats["value"]
     except Exception as e:
         logger.error(f"Get community stats error: {str(e)}")
         raise HTTPException(
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request, Depends, Header
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import BaseModel, ConfigDict, EmailStr
+from typing import Optional, Tuple
 import uuid
 from datetime import datetime, timedelta
 import logging
@@ -9,18 +10,28 @@ import json
 # Import services
 from email_service import email_service
 from services.razorpay_service import razorpay_service
+from services.plan_registry import load_plan_registry
+from services.revenue_rollups import record_revenue
+from services.serialization import cached_response
+from services.state_store import create_store
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+async def get_db():
+    from server import db
+    return db
+
 class SubscriptionPlan(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     id: str
     name: str
     description: str
     amount: float
     interval: str  # monthly, yearly
     interval_count: int = 1
-    features: List[str]
+    features: Tuple[str, ...]
     popular: bool = False
 
 class SubscriptionRequest(BaseModel):
@@ -44,9 +55,9 @@ class SubscriptionVerificationRequest(BaseModel):
     razorpay_signature: str
     customer_subscription_id: str
 
-# Predefined subscription plans
-SUBSCRIPTION_PLANS = {
-    "basic_monthly": SubscriptionPlan(
+# Default subscription plans (SUBSCRIPTION_PLANS_FILE replaces them, see services/plan_registry.py)
+DEFAULT_SUBSCRIPTION_PLANS = [
+    SubscriptionPlan(
         id="basic_monthly",
         name="Basic Monthly",
         description="Monthly access to all reports and community features",
@@ -61,7 +72,7 @@ SUBSCRIPTION_PLANS = {
             "Basic customer support"
         ]
     ),
-    "premium_monthly": SubscriptionPlan(
+    SubscriptionPlan(
         id="premium_monthly",
         name="Premium Monthly",
         description="Premium monthly plan with additional benefits",
@@ -78,7 +89,7 @@ SUBSCRIPTION_PLANS = {
         ],
         popular=True
     ),
-    "basic_yearly": SubscriptionPlan(
+    SubscriptionPlan(
         id="basic_yearly",
         name="Basic Yearly",
         description="Yearly access with 2 months free",
@@ -92,7 +103,7 @@ SUBSCRIPTION_PLANS = {
             "Year-end insights"
         ]
     ),
-    "premium_yearly": SubscriptionPlan(
+    SubscriptionPlan(
         id="premium_yearly",
         name="Premium Yearly",
         description="Premium yearly plan with maximum savings",
@@ -107,34 +118,37 @@ SUBSCRIPTION_PLANS = {
             "Custom family meal planning"
         ]
     )
-}
+]
+
+# Validated and rendered once; the plan endpoints send these bytes as they are
+plan_registry = load_plan_registry(SubscriptionPlan, DEFAULT_SUBSCRIPTION_PLANS)
+SUBSCRIPTION_PLANS = plan_registry.plans
+
+# Subscriptions keyed by our subscription ID, and Razorpay plans created so far
+# (backend set by STATE_BACKEND)
+subscriptions = create_store("subscriptions", lookup_fields=("razorpaySubscriptionId",))
+razorpay_plans = create_store("razorpay_plans")
 
-# In-memory storage for demo (use database in production)
-subscriptions = {}
-razorpay_plans = {}
+# Plans only change with a deploy (or a new SUBSCRIPTION_PLANS_FILE and restart)
+PLAN_CACHE_CONTROL = "public, max-age=300"
 
 @router.get("/subscription-plans")
-async def get_subscription_plans():
+async def get_subscription_plans(if_none_match: Optional[str] = Header(None)):
     """
     Get all available subscription plans
     """
-    return {
-        "success": True,
-        "plans": list(SUBSCRIPTION_PLANS.values())
-    }
+    return cached_response(plan_registry.listing_body, plan_registry.listing_etag, if_none_match, PLAN_CACHE_CONTROL)
 
 @router.get("/subscription-plans/{plan_id}")
-async def get_subscription_plan(plan_id: str):
+async def get_subscription_plan(plan_id: str, if_none_match: Optional[str] = Header(None)):
     """
     Get specific subscription plan details
     """
-    if plan_id not in SUBSCRIPTION_PLANS:
+    if plan_id not in plan_registry:
         raise HTTPException(status_code=404, detail="Plan not found")
     
-    return {
-        "success": True,
-        "plan": SUBSCRIPTION_PLANS[plan_id]
-    }
+    body, etag = plan_registry.plan_bodies[plan_id]
+    return cached_response(body, etag, if_none_match, PLAN_CACHE_CONTROL)
 
 @router.post("/create-subscription", response_model=SubscriptionResponse)
 async def create_subscription(
@@ -146,17 +160,20 @@ async def create_subscription(
     """
     try:
         # Validate plan
-        if request.plan_id not in SUBSCRIPTION_PLANS:
+        if request.plan_id not in plan_registry:
             raise HTTPException(status_code=400, detail="Invalid plan ID")
         
-        plan_details = SUBSCRIPTION_PLANS[request.plan_id]
+        plan_details = plan_registry.plans[request.plan_id]
+        plan_data = plan_registry.plan_details(request.plan_id)
         
         # Create or get Razorpay plan
         razorpay_plan_id = f"plan_{request.plan_id}"
         
-        if razorpay_plan_id not in razorpay_plans:
+        razorpay_plan = await razorpay_plans.get(razorpay_plan_id)
+        if razorpay_plan is None:
             # Create plan in Razorpay
-            razorpay_plan = razorpay_service.create_subscription_plan(
+            razorpay_plan = await razorpay_service.run(
+                razorpay_service.create_subscription_plan,
                 plan_id=razorpay_plan_id,
                 name=plan_details.name,
                 amount=plan_details.amount,
@@ -167,15 +184,14 @@ async def create_subscription(
             if not razorpay_plan["success"]:
                 raise HTTPException(status_code=500, detail=f"Failed to create subscription plan: {razorpay_plan.get('error')}")
             
-            razorpay_plans[razorpay_plan_id] = razorpay_plan
-        else:
-            razorpay_plan = razorpay_plans[razorpay_plan_id]
+            await razorpay_plans.set(razorpay_plan_id, razorpay_plan)
         
         # Generate our internal subscription ID
         subscription_id = f"SUB{uuid.uuid4().hex[:8].upper()}"
         
         # Create subscription in Razorpay
-        razorpay_subscription = razorpay_service.create_subscription(
+        razorpay_subscription = await razorpay_service.run(
+            razorpay_service.create_subscription,
             plan_id=razorpay_plan["plan_id"],
             customer_email=request.customer_email,
             customer_contact=request.customer_phone,
@@ -196,13 +212,13 @@ async def create_subscription(
             "subscriptionId": subscription_id,
             "razorpaySubscriptionId": razorpay_subscription["subscription_id"],
             "planId": request.plan_id,
-            "planDetails": plan_details.dict(),
+            "planDetails": plan_data,
             "customerInfo": request.dict(),
             "createdAt": datetime.now().isoformat(),
             "status": "created",
             "paymentStatus": "pending"
         }
-        subscriptions[subscription_id] = subscription_data
+        await subscriptions.set(subscription_id, subscription_data)
         
         logger.info(f"Subscription created: {subscription_id} -> {razorpay_subscription['subscription_id']}")
         
@@ -210,7 +226,7 @@ async def create_subscription(
             success=True,
             subscription_id=subscription_id,
             razorpay_subscription_id=razorpay_subscription["subscription_id"],
-            plan_details=plan_details.dict(),
+            plan_details=plan_data,
             payment_url=razorpay_subscription.get("short_url"),
             message="Subscription created successfully"
         )
@@ -222,7 +238,8 @@ async def create_subscription(
 @router.post("/verify-subscription-payment")
 async def verify_subscription_payment(
     request: SubscriptionVerificationRequest,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Verify subscription payment and activate subscription
@@ -239,20 +256,14 @@ async def verify_subscription_payment(
             raise HTTPException(status_code=400, detail="Invalid payment signature")
         
         # Get payment details
-        payment_details = razorpay_service.get_payment_details(request.razorpay_payment_id)
+        payment_details = await razorpay_service.run(razorpay_service.get_payment_details, request.razorpay_payment_id)
         
         if not payment_details["success"]:
             raise HTTPException(status_code=400, detail="Failed to fetch payment details")
         
         # Update subscription status
-        if request.customer_subscription_id in subscriptions:
-            subscription_data = subscriptions[request.customer_subscription_id]
-            subscription_data["status"] = "active"
-            subscription_data["paymentStatus"] = "completed"
-            subscription_data["razorpayPaymentId"] = request.razorpay_payment_id
-            subscription_data["paymentDetails"] = payment_details
-            subscription_data["activatedAt"] = datetime.now().isoformat()
-            
+        subscription_data = await subscriptions.get(request.customer_subscription_id)
+        if subscription_data is not None:
             # Calculate next billing date
             plan_details = subscription_data["planDetails"]
             if plan_details["interval"] == "monthly":
@@ -260,7 +271,19 @@ async def verify_subscription_payment(
             else:  # yearly
                 next_billing = datetime.now() + timedelta(days=365)
             
-            subscription_data["nextBillingDate"] = next_billing.isoformat()
+            subscription_data = await subscriptions.update(request.customer_subscription_id, {
+                "status": "active",
+                "paymentStatus": "completed",
+                "razorpayPaymentId": request.razorpay_payment_id,
+                "paymentDetails": payment_details,
+                "activatedAt": datetime.now().isoformat(),
+                "nextBillingDate": next_billing.isoformat()
+            })
+            # The first charge; its subscription.charged webhook carries the same payment id
+            await record_revenue(
+                db, "subscriptions", request.razorpay_payment_id, plan_details["amount"],
+                plan=plan_details.get("id")
+            )
             
             # Send welcome email
             customer_info = subscription_data["customerInfo"]
@@ -295,12 +318,13 @@ async def get_subscription_status(subscription_id: str):
     """
     Get subscription status and details
     """
-    if subscription_id not in subscriptions:
+    subscription_data = await subscriptions.get(subscription_id)
+    if subscription_data is None:
         raise HTTPException(status_code=404, detail="Subscription not found")
     
     return {
         "success": True,
-        "subscription": subscriptions[subscription_id]
+        "subscription": subscription_data
     }
 
 @router.post("/cancel-subscription/{subscription_id}")
@@ -308,18 +332,19 @@ async def cancel_subscription(subscription_id: str, background_tasks: Background
     """
     Cancel a subscription
     """
-    if subscription_id not in subscriptions:
+    subscription_data = await subscriptions.get(subscription_id)
+    if subscription_data is None:
         raise HTTPException(status_code=404, detail="Subscription not found")
     
     try:
-        subscription_data = subscriptions[subscription_id]
-        
         # Cancel in Razorpay (if needed)
         # razorpay_service.cancel_subscription(subscription_data["razorpaySubscriptionId"])
         
         # Update status
-        subscription_data["status"] = "cancelled"
-        subscription_data["cancelledAt"] = datetime.now().isoformat()
+        subscription_data = await subscriptions.update(subscription_id, {
+            "status": "cancelled",
+            "cancelledAt": datetime.now().isoformat()
+        })
         
         # Send cancellation email
         customer_info = subscription_data["customerInfo"]
@@ -1,44 +1,54 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Header
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models import SubscriptionTier, SubscriptionTierCreate, UserSubscription, PaymentVerification
+from pydantic import BaseModel, ConfigDict, Field
+from pymongo import ReturnDocument
 from bson import ObjectId
 from datetime import datetime, timedelta
-import razorpay
+from typing import List, Optional
 import os
 import hmac
 import hashlib
 import logging
+from services.entitlements import entitlements
+from services.metrics import track_dependency
+from services.razorpay_service import razorpay_service
+from services.revenue_rollups import record_revenue
+from services.serialization import MongoId, ResponseSerializer, cached_response
+from services.tier_catalog import tier_catalog
 from middleware import require_admin
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/subscriptions", tags=["Subscriptions"])
 
-# Initialize Razorpay client
-razorpay_client = razorpay.Client(auth=(
-    os.environ.get("RAZORPAY_KEY_ID"),
-    os.environ.get("RAZORPAY_KEY_SECRET")
-))
-
 async def get_db():
     from server import db
     return db
 
+class SubscriptionRecord(BaseModel):
+    """A user_subscriptions document as returned by the API: `_id` becomes `id`, other fields pass through."""
+    model_config = ConfigDict(extra="allow")
+
+    id: MongoId = Field(validation_alias="_id")
+
+class SubscriptionHistory(BaseModel):
+    subscriptions: List[SubscriptionRecord]
+
+subscription_history_response = ResponseSerializer(SubscriptionHistory)
+
 # ============ SUBSCRIPTION TIER MANAGEMENT (Admin) ============
 
+async def warm_tier_catalog(db):
+    """Load the tier catalog (startup warmup)."""
+    await tier_catalog.load(db)
+
 @router.get("/tiers")
-async def get_subscription_tiers(db: AsyncIOMotorDatabase = Depends(get_db)):
-    """Get all subscription tiers."""
+async def get_subscription_tiers(if_none_match: Optional[str] = Header(None), db: AsyncIOMotorDatabase = Depends(get_db)):
+    """Get all subscription tiers (pre-rendered by the tier catalog, see services/tier_catalog.py)."""
     try:
-        tiers = await db.subscription_tiers.find({"is_active": True}).sort("price", 1).to_list(100)
-        
-        for tier in tiers:
-            tier["id"] = str(tier["_id"])
-            del tier["_id"]
-            if "created_at" in tier:
-                del tier["created_at"]
-        
-        return {"tiers": tiers}
+        body, etag = await tier_catalog.listing(db)
+        return cached_response(body, etag, if_none_match)
     except Exception as e:
         logger.error(f"Get tiers error: {str(e)}")
         raise HTTPException(
@@ -53,15 +63,10 @@ async def get_tier(tier_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
         if not ObjectId.is_valid(tier_id):
             raise HTTPException(status_code=400, detail="Invalid tier ID")
         
-        tier = await db.subscription_tiers.find_one({"_id": ObjectId(tier_id)})
+        tier = await tier_catalog.get(db, tier_id)
         if not tier:
             raise HTTPException(status_code=404, detail="Tier not found")
         
-        tier["id"] = str(tier["_id"])
-        del tier["_id"]
-        if "created_at" in tier:
-            del tier["created_at"]
-        
         return tier
     except HTTPException:
         raise
@@ -74,7 +79,9 @@ async def create_subscription_tier(tier_data: SubscriptionTierCreate, db: AsyncI
     """Create a new subscription tier (Admin only)."""
     try:
         tier = SubscriptionTier(**tier_data.dict())
-        result = await db.subscription_tiers.insert_one(tier.dict(by_alias=True, exclude={"id"}))
+        tier_doc = tier.dict(by_alias=True, exclude={"id"})
+        result = await db.subscription_tiers.insert_one(tier_doc)
+        tier_catalog.put(tier_doc)
         
         return {
             "success": True,
@@ -92,13 +99,15 @@ async def update_subscription_tier(tier_id: str, tier_data: SubscriptionTierCrea
         if not ObjectId.is_valid(tier_id):
             raise HTTPException(status_code=400, detail="Invalid tier ID")
         
-        result = await db.subscription_tiers.update_one(
+        tier = await db.subscription_tiers.find_one_and_update(
             {"_id": ObjectId(tier_id)},
-            {"$set": tier_data.dict()}
+            {"$set": tier_data.dict()},
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0:
+        if tier is None:
             raise HTTPException(status_code=404, detail="Tier not found")
+        tier_catalog.put(tier)
         
         return {"success": True, "message": "Tier updated successfully"}
     except HTTPException:
@@ -114,13 +123,15 @@ async def delete_subscription_tier(tier_id: str, db: AsyncIOMotorDatabase = Depe
         if not ObjectId.is_valid(tier_id):
             raise HTTPException(status_code=400, detail="Invalid tier ID")
         
-        result = await db.subscription_tiers.update_one(
+        tier = await db.subscription_tiers.find_one_and_update(
             {"_id": ObjectId(tier_id)},
-            {"$set": {"is_active": False}}
+            {"$set": {"is_active": False}},
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0:
+        if tier is None:
             raise HTTPException(status_code=404, detail="Tier not found")
+        tier_catalog.put(tier)
         
         return {"success": True, "message": "Tier deleted successfully"}
     except HTTPException:
@@ -139,7 +150,7 @@ async def create_razorpay_order(tier_id: str, user_id: str, db: AsyncIOMotorData
         if not ObjectId.is_valid(tier_id):
             raise HTTPException(status_code=400, detail="Invalid tier ID")
         
-        tier = await db.subscription_tiers.find_one({"_id": ObjectId(tier_id)})
+        tier = await tier_catalog.get(db, tier_id)
         if not tier:
             raise HTTPException(status_code=404, detail="Tier not found")
         
@@ -156,7 +167,8 @@ async def create_razorpay_order(tier_id: str, user_id: str, db: AsyncIOMotorData
             }
         }
         
-        order = razorpay_client.order.create(data=order_data)
+        with track_dependency("razorpay"):
+            order = await razorpay_service.run(razorpay_service.client.order.create, data=order_data)
         
         # Store pending subscription
         subscription = UserSubscription(
@@ -198,7 +210,7 @@ async def verify_payment(payment_data: PaymentVerification, db: AsyncIOMotorData
             raise HTTPException(status_code=400, detail="Invalid payment signature")
         
         # Get tier details
-        tier = await db.subscription_tiers.find_one({"_id": ObjectId(payment_data.tier_id)})
+        tier = await tier_catalog.get(db, payment_data.tier_id)
         if not tier:
             raise HTTPException(status_code=404, detail="Tier not found")
         
@@ -224,6 +236,12 @@ async def verify_payment(payment_data: PaymentVerification, db: AsyncIOMotorData
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Subscription not found")
+        entitlements.invalidate(payment_data.user_id)
+        
+        await record_revenue(
+            db, "subscriptions", payment_data.razorpay_payment_id, tier["price"],
+            plan=payment_data.tier_id, at=start_date
+        )
         
         return {
             "success": True,
@@ -240,18 +258,14 @@ async def verify_payment(payment_data: PaymentVerification, db: AsyncIOMotorData
 async def get_user_subscription_status(user_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
     """Check if user has active subscription."""
     try:
-        subscription = await db.user_subscriptions.find_one({
-            "user_id": user_id,
-            "status": "active",
-            "end_date": {"$gt": datetime.utcnow()}
-        })
+        subscription = await entitlements.get(db, user_id)
         
         if subscription:
             return {
                 "is_subscribed": True,
-                "tier_id": subscription["tier_id"],
-                "end_date": subscription["end_date"].isoformat(),
-                "days_remaining": (subscription["end_date"] - datetime.utcnow()).days
+                "tier_id": subscription.tier_id,
+                "end_date": subscription.end_date.isoformat(),
+                "days_remaining": (subscription.end_date - datetime.utcnow()).days
             }
         else:
             return {
@@ -272,17 +286,7 @@ async def get_user_subscription_history(user_id: str, db: AsyncIOMotorDatabase =
             {"user_id": user_id}
         ).sort("created_at", -1).to_list(100)
         
-        for sub in subscriptions:
-            sub["id"] = str(sub["_id"])
-            del sub["_id"]
-            if sub.get("start_date"):
-                sub["start_date"] = sub["start_date"].isoformat()
-            if sub.get("end_date"):
-                sub["end_date"] = sub["end_date"].isoformat()
-            if sub.get("created_at"):
-                sub["created_at"] = sub["created_at"].isoformat()
-        
-        return {"subscriptions": subscriptions}
+        return subscription_history_response.response({"subscriptions": subscriptions})
     except Exception as e:
         logger.error(f"Get subscription history error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get subscription history")
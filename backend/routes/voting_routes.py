@@ -2,6 +2,9 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models import UpcomingTestCreate, UpcomingTest, VoteCreate
 from bson import ObjectId
+from services.document_mapper import DocumentMapper
+from services.leaderboard import WITHOUT_VOTERS, upcoming_test_leaderboard
+from services.repository import Repository
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,23 +15,20 @@ async def get_db():
     from server import db
     return db
 
+test_repository = Repository("upcoming_tests")
+
+test_mapper = DocumentMapper.for_model(UpcomingTest, camel_case=True, exclude=("created_at",), passthrough=True)
+
 @router.get("/upcoming-tests")
 async def get_upcoming_tests(db: AsyncIOMotorDatabase = Depends(get_db)):
     """Get all upcoming tests for voting."""
     try:
-        tests = await db.upcoming_tests.find({"status": "voting"}).sort("votes", -1).to_list(100)
-        
-        # Convert ObjectId to string and format keys
-        for test in tests:
-            test["id"] = str(test["_id"])
-            del test["_id"]
-            test["productCategory"] = test.pop("product_category")
-            test["targetFunding"] = test.pop("target_funding")
-            test["estimatedTestDate"] = test.pop("estimated_test_date")
-            if "created_at" in test:
-                del test["created_at"]
+        if upcoming_test_leaderboard.ready:
+            tests = upcoming_test_leaderboard.top("voting", 100)
+        else:
+            tests = await db.upcoming_tests.find({"status": "voting"}, WITHOUT_VOTERS).sort("votes", -1).to_list(100)
         
-        return {"tests": tests}
+        return {"tests": test_mapper.many(tests)}
     except Exception as e:
         logger.error(f"Get upcoming tests error: {str(e)}")
         raise HTTPException(
@@ -46,32 +46,31 @@ async def vote_for_test(vote_data: VoteCreate, db: AsyncIOMotorDatabase = Depend
                 detail="Invalid test ID"
             )
         
-        # Check if test exists
-        test = await db.upcoming_tests.find_one({"_id": ObjectId(vote_data.test_id)})
-        if not test:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Test not found"
-            )
+        # Add the vote unless this user already voted, getting the updated test back
+        updated_test = await test_repository.update_by_id(
+            db,
+            vote_data.test_id,
+            {
+                "$inc": {"votes": 1},
+                "$push": {"voters": vote_data.user_id}
+            },
+            conditions={"voters": {"$ne": vote_data.user_id}},
+            projection=WITHOUT_VOTERS
+        )
         
-        # Check if user already voted
-        if vote_data.user_id in test.get("voters", []):
+        if not updated_test:
+            # Only the failure path needs to know why nothing was updated
+            if not await test_repository.find_by_id(db, vote_data.test_id, {"_id": 1}):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Test not found"
+                )
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Already voted for this test"
             )
         
-        # Add vote
-        result = await db.upcoming_tests.update_one(
-            {"_id": ObjectId(vote_data.test_id)},
-            {
-                "$inc": {"votes": 1},
-                "$push": {"voters": vote_data.user_id}
-            }
-        )
-        
-        # Get updated vote count
-        updated_test = await db.upcoming_tests.find_one({"_id": ObjectId(vote_data.test_id)})
+        upcoming_test_leaderboard.upsert(updated_test)
         
         return {
             "success": True,
@@ -92,7 +91,9 @@ async def create_upcoming_test(test_data: UpcomingTestCreate, db: AsyncIOMotorDa
     """Create a new upcoming test (admin only)."""
     try:
         test = UpcomingTest(**test_data.dict())
-        result = await db.upcoming_tests.insert_one(test.dict(by_alias=True, exclude={"id"}))
+        test_doc = test.dict(by_alias=True, exclude={"id"})
+        result = await db.upcoming_tests.insert_one(test_doc)
+        upcoming_test_leaderboard.upsert(test_doc)
         
         return {
             "success": True,
@@ -121,6 +122,11 @@ async def update_upcoming_test(test_id: str, test_data: UpcomingTestCreate, db:
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Test not found")
         
+        cached_test = upcoming_test_leaderboard.get(test_id)
+        if cached_test:
+            cached_test.update(test_data.dict())
+            upcoming_test_leaderboard.upsert(cached_test)
+        
         return {"success": True, "message": "Test updated successfully"}
     except HTTPException:
         raise
@@ -140,6 +146,8 @@ async def delete_upcoming_test(test_id: str, db: AsyncIOMotorDatabase = Depends(
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Test not found")
         
+        upcoming_test_leaderboard.remove(test_id)
+        
         return {"success": True, "message": "Test deleted successfully"}
     except HTTPException:
         raise
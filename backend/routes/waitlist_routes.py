@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException, status, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, status, Depends, BackgroundTasks, UploadFile, File
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
 from models import WaitlistCreate, Waitlist
 from email_service import email_service
+from middleware import require_admin
+from services.signup_lists import export_response, import_upload
 import logging
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
@@ -20,14 +24,6 @@ async def add_to_waitlist(
 ):
     """Add user to waitlist."""
     try:
-        # Check if email already exists
-        existing = await db.waitlist.find_one({"email": waitlist_data.email})
-        if existing:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already on waitlist"
-            )
-        
         # Create waitlist entry
         waitlist = Waitlist(
             first_name=waitlist_data.firstName,
@@ -36,7 +32,21 @@ async def add_to_waitlist(
             pincode=waitlist_data.pincode
         )
         
-        result = await db.waitlist.insert_one(waitlist.dict(by_alias=True, exclude={"id"}))
+        # One upsert on the email: an existing signup is left alone, and the
+        # unique email index rejects a concurrent second one
+        try:
+            result = await db.waitlist.update_one(
+                {"email": waitlist_data.email},
+                {"$setOnInsert": waitlist.dict(by_alias=True, exclude={"id"})},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            result = None
+        if result is None or result.upserted_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already on waitlist"
+            )
         
         # Send waitlist confirmation email
         logger.info(f"Attempting to send waitlist confirmation email to {waitlist_data.email}")
@@ -57,7 +67,7 @@ async def add_to_waitlist(
         return {
             "success": True,
             "message": "Successfully added to waitlist",
-            "waitlistId": str(result.inserted_id)
+            "waitlistId": str(result.upserted_id)
         }
     except HTTPException:
         raise
@@ -80,3 +90,46 @@ async def get_waitlist_count(db: AsyncIOMotorDatabase = Depends(get_db)):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to get waitlist count"
         )
+
+@router.post("/import")
+async def import_waitlist(
+    file: UploadFile = File(...),
+    file_format: Optional[str] = None,
+    batch_size: int = 1000,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    admin_user = Depends(require_admin)
+):
+    """Bulk import leads from a JSONL or CSV upload; existing emails are skipped (Admin only)"""
+    try:
+        report = await import_upload(db, "waitlist", file, file_format, batch_size)
+        return {
+            "success": True,
+            "message": f"Imported {report['imported']} leads",
+            "data": report
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Waitlist import error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to import leads"
+        )
+
+@router.get("/export")
+async def export_waitlist(
+    file_format: str = "csv",
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    admin_user = Depends(require_admin)
+):
+    """Download the waitlist as CSV or JSONL (Admin only)"""
+    try:
+        return await export_response(db, "waitlist", file_format)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Waitlist export error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to export waitlist"
+        )
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, Request, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Request, BackgroundTasks, Depends
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
 import json
@@ -7,15 +8,29 @@ from datetime import datetime
 
 # Import services
 from email_service import email_service
+from services.entitlements import entitlements
 from services.razorpay_service import razorpay_service
+from services.revenue_rollups import record_revenue
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# In-memory storage for demo (use database in production)
+async def get_db():
+    from server import db
+    return db
+
+# Shared order/subscription stores (see services/state_store.py)
 from routes.report_routes import report_orders
 from routes.subscription_payment_routes import subscriptions
 
+async def invalidate_customer_entitlement(db, customer_email: Optional[str]):
+    """Drop the cached entitlement of the account registered with this email, if any."""
+    if not customer_email:
+        return
+    user = await db.users.find_one({"email": customer_email}, {"_id": 1})
+    if user:
+        entitlements.invalidate(str(user["_id"]))
+
 class WebhookEvent(BaseModel):
     event: str
     payload: Dict[str, Any]
@@ -24,7 +39,8 @@ class WebhookEvent(BaseModel):
 @router.post("/razorpay-webhook")
 async def razorpay_webhook(
     request: Request,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Handle Razorpay webhook events
@@ -53,19 +69,19 @@ async def razorpay_webhook(
         
         # Handle different event types
         if event_type == 'payment.captured':
-            await handle_payment_captured(event_data, background_tasks)
+            await handle_payment_captured(event_data, background_tasks, db)
         elif event_type == 'payment.failed':
             await handle_payment_failed(event_data, background_tasks)
         elif event_type == 'subscription.activated':
-            await handle_subscription_activated(event_data, background_tasks)
+            await handle_subscription_activated(event_data, background_tasks, db)
         elif event_type == 'subscription.charged':
-            await handle_subscription_charged(event_data, background_tasks)
+            await handle_subscription_charged(event_data, background_tasks, db)
         elif event_type == 'subscription.cancelled':
-            await handle_subscription_cancelled(event_data, background_tasks)
+            await handle_subscription_cancelled(event_data, background_tasks, db)
         elif event_type == 'subscription.completed':
-            await handle_subscription_completed(event_data, background_tasks)
+            await handle_subscription_completed(event_data, background_tasks, db)
         elif event_type == 'order.paid':
-            await handle_order_paid(event_data, background_tasks)
+            await handle_order_paid(event_data, background_tasks, db)
         else:
             logger.info(f"Unhandled webhook event: {event_type}")
         
@@ -77,7 +93,7 @@ async def razorpay_webhook(
         logger.error(f"Error processing webhook: {str(e)}")
         raise HTTPException(status_code=500, detail="Webhook processing failed")
 
-async def handle_payment_captured(event_data: Dict[str, Any], background_tasks: BackgroundTasks):
+async def handle_payment_captured(event_data: Dict[str, Any], background_tasks: BackgroundTasks, db):
     """
     Handle payment.captured event
     """
@@ -91,22 +107,26 @@ async def handle_payment_captured(event_data: Dict[str, Any], background_tasks:
         logger.info(f"Payment captured: {payment_id} for order: {order_id}")
         
         # Find corresponding order in our system
-        customer_order_id = None
-        for order_key, order_data in report_orders.items():
-            if order_data.get('razorpayOrderId') == order_id:
-                customer_order_id = order_key
-                break
+        found = await report_orders.find_by('razorpayOrderId', order_id)
         
-        if customer_order_id:
+        if found:
             # Update order status
-            order_data = report_orders[customer_order_id]
-            order_data['paymentStatus'] = 'captured'
-            order_data['razorpayPaymentId'] = payment_id
-            order_data['capturedAt'] = datetime.now().isoformat()
+            customer_order_id, order_data = found
+            already_confirmed = order_data.get('status') == 'confirmed'
+            order_data = await report_orders.update(customer_order_id, {
+                'paymentStatus': 'captured',
+                'razorpayPaymentId': payment_id,
+                'capturedAt': datetime.now().isoformat(),
+                'status': 'confirmed'
+            })
+            # Counted once whether the verify endpoint or this webhook gets there first
+            await record_revenue(
+                db, 'reports', payment_id, order_data['customerInfo']['amount'],
+                plan=order_data['customerInfo'].get('reportType')
+            )
             
             # Send confirmation email if not already sent
-            if order_data.get('status') != 'confirmed':
-                order_data['status'] = 'confirmed'
+            if not already_confirmed:
                 customer_info = order_data['customerInfo']
                 
                 background_tasks.add_task(
@@ -143,18 +163,16 @@ async def handle_payment_failed(event_data: Dict[str, Any], background_tasks: Ba
         logger.warning(f"Payment failed: {payment_id} for order: {order_id} - {error_description}")
         
         # Find corresponding order
-        customer_order_id = None
-        for order_key, order_data in report_orders.items():
-            if order_data.get('razorpayOrderId') == order_id:
-                customer_order_id = order_key
-                break
+        found = await report_orders.find_by('razorpayOrderId', order_id)
         
-        if customer_order_id:
+        if found:
             # Update order status
-            order_data = report_orders[customer_order_id]
-            order_data['paymentStatus'] = 'failed'
-            order_data['failureReason'] = error_description
-            order_data['failedAt'] = datetime.now().isoformat()
+            customer_order_id, order_data = found
+            order_data = await report_orders.update(customer_order_id, {
+                'paymentStatus': 'failed',
+                'failureReason': error_description,
+                'failedAt': datetime.now().isoformat()
+            })
             
             # Send failure notification email
             customer_info = order_data['customerInfo']
@@ -169,7 +187,7 @@ async def handle_payment_failed(event_data: Dict[str, Any], background_tasks: Ba
     except Exception as e:
         logger.error(f"Error handling payment.failed: {str(e)}")
 
-async def handle_subscription_activated(event_data: Dict[str, Any], background_tasks: BackgroundTasks):
+async def handle_subscription_activated(event_data: Dict[str, Any], background_tasks: BackgroundTasks, db):
     """
     Handle subscription.activated event
     """
@@ -182,20 +200,19 @@ async def handle_subscription_activated(event_data: Dict[str, Any], background_t
         logger.info(f"Subscription activated: {subscription_id}")
         
         # Find corresponding subscription in our system
-        customer_subscription_id = None
-        for sub_key, sub_data in subscriptions.items():
-            if sub_data.get('razorpaySubscriptionId') == subscription_id:
-                customer_subscription_id = sub_key
-                break
+        found = await subscriptions.find_by('razorpaySubscriptionId', subscription_id)
         
-        if customer_subscription_id:
+        if found:
+            customer_subscription_id, sub_data = found
             # Update subscription status
-            sub_data = subscriptions[customer_subscription_id]
-            sub_data['status'] = 'active'
-            sub_data['activatedAt'] = datetime.now().isoformat()
+            sub_data = await subscriptions.update(customer_subscription_id, {
+                'status': 'active',
+                'activatedAt': datetime.now().isoformat()
+            })
             
             # Send activation email if not already sent
             customer_info = sub_data['customerInfo']
+            await invalidate_customer_entitlement(db, customer_info.get('customer_email'))
             plan_details = sub_data['planDetails']
             
             background_tasks.add_task(
@@ -209,32 +226,36 @@ async def handle_subscription_activated(event_data: Dict[str, Any], background_t
     except Exception as e:
         logger.error(f"Error handling subscription.activated: {str(e)}")
 
-async def handle_subscription_charged(event_data: Dict[str, Any], background_tasks: BackgroundTasks):
+async def handle_subscription_charged(event_data: Dict[str, Any], background_tasks: BackgroundTasks, db):
     """
     Handle subscription.charged event (recurring payments)
     """
     try:
         payment = event_data.get('payment', {}).get('entity', {})
+        payment_id = payment.get('id')
         subscription_id = payment.get('subscription_id')
         amount = payment.get('amount', 0) / 100
         
         logger.info(f"Subscription charged: {subscription_id} - ₹{amount}")
         
         # Find corresponding subscription
-        customer_subscription_id = None
-        for sub_key, sub_data in subscriptions.items():
-            if sub_data.get('razorpaySubscriptionId') == subscription_id:
-                customer_subscription_id = sub_key
-                break
+        found = await subscriptions.find_by('razorpaySubscriptionId', subscription_id)
         
-        if customer_subscription_id:
+        if found:
+            customer_subscription_id, sub_data = found
             # Update subscription with latest payment
-            sub_data = subscriptions[customer_subscription_id]
-            sub_data['lastChargedAt'] = datetime.now().isoformat()
-            sub_data['lastChargedAmount'] = amount
+            sub_data = await subscriptions.update(customer_subscription_id, {
+                'lastChargedAt': datetime.now().isoformat(),
+                'lastChargedAmount': amount
+            })
+            await record_revenue(
+                db, 'subscriptions', payment_id, amount,
+                plan=sub_data['planDetails'].get('id')
+            )
             
             # Send payment receipt email
             customer_info = sub_data['customerInfo']
+            await invalidate_customer_entitlement(db, customer_info.get('customer_email'))
             plan_details = sub_data['planDetails']
             
             background_tasks.add_task(
@@ -249,7 +270,7 @@ async def handle_subscription_charged(event_data: Dict[str, Any], background_tas
     except Exception as e:
         logger.error(f"Error handling subscription.charged: {str(e)}")
 
-async def handle_subscription_cancelled(event_data: Dict[str, Any], background_tasks: BackgroundTasks):
+async def handle_subscription_cancelled(event_data: Dict[str, Any], background_tasks: BackgroundTasks, db):
     """
     Handle subscription.cancelled event
     """
@@ -260,20 +281,19 @@ async def handle_subscription_cancelled(event_data: Dict[str, Any], background_t
         logger.info(f"Subscription cancelled: {subscription_id}")
         
         # Find corresponding subscription
-        customer_subscription_id = None
-        for sub_key, sub_data in subscriptions.items():
-            if sub_data.get('razorpaySubscriptionId') == subscription_id:
-                customer_subscription_id = sub_key
-                break
+        found = await subscriptions.find_by('razorpaySubscriptionId', subscription_id)
         
-        if customer_subscription_id:
+        if found:
+            customer_subscription_id, sub_data = found
             # Update subscription status
-            sub_data = subscriptions[customer_subscription_id]
-            sub_data['status'] = 'cancelled'
-            sub_data['cancelledAt'] = datetime.now().isoformat()
+            sub_data = await subscriptions.update(customer_subscription_id, {
+                'status': 'cancelled',
+                'cancelledAt': datetime.now().isoformat()
+            })
             
             # Send cancellation confirmation email
             customer_info = sub_data['customerInfo']
+            await invalidate_customer_entitlement(db, customer_info.get('customer_email'))
             background_tasks.add_task(
                 send_subscription_cancelled_webhook_email,
                 customer_info['customer_email'],
@@ -284,7 +304,7 @@ async def handle_subscription_cancelled(event_data: Dict[str, Any], background_t
     except Exception as e:
         logger.error(f"Error handling subscription.cancelled: {str(e)}")
 
-async def handle_subscription_completed(event_data: Dict[str, Any], background_tasks: BackgroundTasks):
+async def handle_subscription_completed(event_data: Dict[str, Any], background_tasks: BackgroundTasks, db):
     """
     Handle subscription.completed event
     """
@@ -295,22 +315,21 @@ async def handle_subscription_completed(event_data: Dict[str, Any], background_t
         logger.info(f"Subscription completed: {subscription_id}")
         
         # Find corresponding subscription
-        customer_subscription_id = None
-        for sub_key, sub_data in subscriptions.items():
-            if sub_data.get('razorpaySubscriptionId') == subscription_id:
-                customer_subscription_id = sub_key
-                break
+        found = await subscriptions.find_by('razorpaySubscriptionId', subscription_id)
         
-        if customer_subscription_id:
+        if found:
+            customer_subscription_id, sub_data = found
             # Update subscription status
-            sub_data = subscriptions[customer_subscription_id]
-            sub_data['status'] = 'completed'
-            sub_data['completedAt'] = datetime.now().isoformat()
+            sub_data = await subscriptions.update(customer_subscription_id, {
+                'status': 'completed',
+                'completedAt': datetime.now().isoformat()
+            })
+            await invalidate_customer_entitlement(db, sub_data['customerInfo'].get('customer_email'))
         
     except Exception as e:
         logger.error(f"Error handling subscription.completed: {str(e)}")
 
-async def handle_order_paid(event_data: Dict[str, Any], background_tasks: BackgroundTasks):
+async def handle_order_paid(event_data: Dict[str, Any], background_tasks: BackgroundTasks, db):
     """
     Handle order.paid event
     """
@@ -321,7 +340,12 @@ async def handle_order_paid(event_data: Dict[str, Any], background_tasks: Backgr
         
         logger.info(f"Order paid: {order_id} - ₹{amount}")
         
-        # This is usually handled by payment.captured, but we can add additional logic here if needed
+        # Tier subscription orders carry the user in their notes
+        user_id = (order.get('notes') or {}).get('user_id')
+        if user_id:
+            entitlements.invalidate(user_id)
+        
+        # Otherwise usually handled by payment.captured, but we can add additional logic here if needed
         
     except Exception as e:
         logger.error(f"Error handling order.paid: {str(e)}")
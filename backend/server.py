@@ -1,34 +1,86 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Response
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
 import logging
 from pathlib import Path
 
-# Import routes
-from routes import auth_routes, waitlist_routes, voting_routes
-from routes import blog_routes, newsletter_routes, stats_routes, subscription_routes, password_reset_routes, email_routes
-from routes import report_routes, subscription_payment_routes, webhook_routes, debug_routes, test_routes, product_voting_routes
-
-# Try to import donation_routes (may not exist in older deployments)
-try:
-    from routes import donation_routes
-    HAS_DONATION_ROUTES = True
-except ImportError:
-    HAS_DONATION_ROUTES = False
-    logging.warning("donation_routes not found - donation features will be disabled")
+from routes.registry import enabled_features, include_routers
+from email_service import email_service
+from services.leaderboard import disable_leaderboards, rebuild_leaderboards
+from services.lifecycle import health_state
+from services.metrics import MetricsMiddleware, metrics_registry, mongo_timing_listener
+from services.mongo_monitoring import mongo_monitoring
+from services.rate_limit import RateLimitMiddleware, rate_limiter
+from services.razorpay_service import razorpay_service
+from services.serialization import FastJSONResponse
+from services.state_store import check_worker_safety, detect_worker_count, prepare_stores
+from services.subscription_sweeper import subscription_sweeper
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_timing_listener] + mongo_monitoring.listeners())
 db = client[os.environ['DB_NAME']]
 
+async def warm_password_hashing(db):
+    """Load the bcrypt backend (and its self-test) before the first login."""
+    from auth import pwd_context
+    await asyncio.to_thread(lambda: pwd_context.handler().get_backend())
+
+# Vote leaderboards are kept current only by this process's own writes
+LEADERBOARD_WARMUP = ("leaderboards", rebuild_leaderboards)
+
+# Caches filled before the app accepts traffic; enabled routers add their own
+WARMUPS = [
+    LEADERBOARD_WARMUP,
+    ("password_hashing", warm_password_hashing),
+    ("state_stores", prepare_stores),
+]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("ChoosePure API starting up...")
+    logger.info(f"Connected to database: {db.name}")
+    email_service.log_status()
+    razorpay_service.log_status()
+
+    # Refuse to serve from several workers on top of process-local state
+    workers = detect_worker_count()
+    check_worker_safety(workers)
+    warmups = list(WARMUPS)
+    if workers > 1:
+        # Left cold, the leaderboard routes read from MongoDB, which every worker sees
+        logger.info(f"Running with {workers} workers: in-process vote leaderboards disabled")
+        warmups.remove(LEADERBOARD_WARMUP)
+        # ...and stay cold: bulk imports and writes must not warm them either
+        disable_leaderboards()
+
+    await health_state.startup_sequence(db, warmups)
+    mongo_monitoring.start(client)
+    subscription_sweeper.start(db)
+    yield
+    logger.info("Shutting down...")
+    health_state.shutting_down = True
+    await subscription_sweeper.stop()
+    await mongo_monitoring.stop()
+    client.close()
+
 # Create the main app without a prefix
-app = FastAPI(title="ChoosePure API", version="1.0.0")
+app = FastAPI(title="ChoosePure API", version="1.0.0", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -40,32 +92,45 @@ async def root():
 
 @api_router.get("/health")
 async def health_check():
-    return {"status": "healthy", "database": "connected"}
-
-# Include all route modules
-api_router.include_router(auth_routes.router)
-api_router.include_router(waitlist_routes.router)
-api_router.include_router(voting_routes.router)
-api_router.include_router(product_voting_routes.router)
-api_router.include_router(blog_routes.router)
-api_router.include_router(newsletter_routes.router)
-api_router.include_router(stats_routes.router)
-api_router.include_router(subscription_routes.router)
-api_router.include_router(password_reset_routes.router)
-api_router.include_router(email_routes.router)
-api_router.include_router(report_routes.router)
-api_router.include_router(subscription_payment_routes.router)
-api_router.include_router(webhook_routes.router)
-api_router.include_router(debug_routes.router)
-api_router.include_router(test_routes.router)
-
-# Include donation routes if available
-if HAS_DONATION_ROUTES:
-    api_router.include_router(donation_routes.router)
+    """Overall status with the (cached) database check; always 200."""
+    database_ok = await health_state.check_database()
+    return {"status": "healthy" if database_ok else "degraded", "database": health_state.database_status()}
+
+@api_router.get("/live")
+async def liveness_check():
+    """Liveness probe: the process is up and its event loop is responsive."""
+    return health_state.liveness()
+
+@api_router.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until startup warmup is done and while MongoDB is unreachable."""
+    ready, body = await health_state.readiness()
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+@api_router.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint."""
+    content = (
+        metrics_registry.render_prometheus()
+        + subscription_sweeper.render_prometheus()
+        + rate_limiter.render_prometheus()
+    )
+    if mongo_monitoring.enabled:
+        content += mongo_monitoring.monitor.render_prometheus()
+    return Response(
+        content=content,
+        media_type="text/plain; version=0.0.4"
+    )
+
+# Include the route modules of enabled features (see routes/registry.py)
+WARMUPS += include_routers(api_router, enabled_features())
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Per-route rate limits (innermost, so 429s carry the CORS headers and are timed)
+app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -73,21 +138,8 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
-@app.on_event("startup")
-async def startup_event():
-    logger.info("ChoosePure API starting up...")
-    logger.info(f"Connected to database: {db.name}")
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    logger.info("Shutting down...")
-    client.close()
\ No newline at end of file
+# Per-route latency metrics and Server-Timing (outermost, so CORS is timed too)
+app.add_middleware(MetricsMiddleware)
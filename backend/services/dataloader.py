@@ -0,0 +1,27 @@
+"""
+Batched ID lookups: one ``$in`` query instead of a ``find_one`` per id
+"""
+from typing import Any, Dict, Iterable, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+def to_object_id(value: Any) -> Optional[ObjectId]:
+    """ObjectId for a stored string/ObjectId reference, None if it is not a valid id."""
+    if isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+async def find_by_ids(collection, ids: Iterable[Any], projection: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    One ``$in`` query for all ids; returns documents keyed by ``str(_id)``.
+    Invalid or unknown ids are simply absent from the result.
+    """
+    object_ids = list({oid for oid in map(to_object_id, ids) if oid is not None})
+    if not object_ids:
+        return {}
+    cursor = collection.find({"_id": {"$in": object_ids}}, projection)
+    return {str(doc["_id"]): doc async for doc in cursor}
@@ -0,0 +1,110 @@
+"""
+Declarative Mongo document -> API dict mapping
+
+A DocumentMapper describes how a stored document is exposed (renamed,
+computed and dropped fields) and generates the mapping function once, so
+converting a page of documents is a single pass of plain dict operations
+instead of per-route pop/del surgery:
+
+    report_mapper = DocumentMapper.for_model(TestReport, camel_case=True, keep=("created_at",))
+    reports = report_mapper.many(await cursor.to_list(100))
+
+``_id`` is always exposed as a string.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+def to_camel(name: str) -> str:
+    head, *rest = name.split("_")
+    return head + "".join(part.title() for part in rest)
+
+class DocumentMapper:
+    """
+    rename      source key -> output key
+    optional    source keys that may be missing (copied only when present)
+    computed    output key -> callable(doc), evaluated after the renames
+    exclude     source keys never exposed
+    passthrough copy every other key of the document unchanged
+    """
+
+    def __init__(
+        self,
+        rename: Dict[str, str],
+        optional: Iterable[str] = (),
+        computed: Optional[Dict[str, Callable[[Dict[str, Any]], Any]]] = None,
+        exclude: Iterable[str] = (),
+        passthrough: bool = False,
+    ):
+        self.rename = dict(rename)
+        self.optional = frozenset(optional)
+        self.computed = dict(computed or {})
+        self.exclude = frozenset(exclude)
+        self.passthrough = passthrough
+        self.map_one = self._compile()
+
+    @classmethod
+    def for_model(
+        cls,
+        model: Type[BaseModel],
+        camel_case: bool = False,
+        keep: Tuple[str, ...] = (),
+        **options,
+    ) -> "DocumentMapper":
+        """
+        Mapper for documents stored from ``model``: fields aliased in the model
+        (``_id``) are read under their alias and exposed under the field name;
+        with camel_case other fields are exposed camelCased, except ``keep``.
+        Fields with defaults are optional.
+        """
+        exclude = set(options.get("exclude", ()))
+        rename, optional = {}, []
+        for name, field in model.model_fields.items():
+            source = field.alias or name
+            if source in exclude:
+                continue
+            output = name if not camel_case or name in keep or field.alias else to_camel(name)
+            rename[source] = output
+            if not field.is_required() and source != "_id":
+                optional.append(source)
+        return cls(rename, optional=optional, **options)
+
+    @property
+    def aliases(self) -> Dict[str, str]:
+        """Output key -> source key, e.g. for translating sort/filter parameters."""
+        return {output: source for source, output in self.rename.items()}
+
+    def _compile(self) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        namespace: Dict[str, Any] = {"_skip": frozenset(self.rename) | self.exclude}
+
+        def read(source: str) -> str:
+            value = f"doc[{source!r}]"
+            return f"str({value})" if source == "_id" else value
+
+        required = [(source, output) for source, output in self.rename.items() if source not in self.optional]
+        optional = [(source, output) for source, output in self.rename.items() if source in self.optional]
+
+        lines = ["def map_document(doc):"]
+        if self.passthrough:
+            lines.append("    out = {key: value for key, value in doc.items() if key not in _skip}")
+            lines += [f"    out[{output!r}] = {read(source)}" for source, output in required]
+        else:
+            pairs = ", ".join(f"{output!r}: {read(source)}" for source, output in required)
+            lines.append(f"    out = {{{pairs}}}")
+        for source, output in optional:
+            lines.append(f"    if {source!r} in doc:")
+            lines.append(f"        out[{output!r}] = {read(source)}")
+        for index, (output, function) in enumerate(self.computed.items()):
+            namespace[f"_computed_{index}"] = function
+            lines.append(f"    out[{output!r}] = _computed_{index}(doc)")
+        lines.append("    return out")
+
+        exec("\n".join(lines), namespace)
+        return namespace["map_document"]
+
+    def __call__(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        return self.map_one(doc)
+
+    def many(self, docs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        map_one = self.map_one
+        return [map_one(doc) for doc in docs]
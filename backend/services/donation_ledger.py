@@ -0,0 +1,158 @@
+"""
+Running donation totals and the latest completed donations
+
+The public donation widget used to aggregate the whole donations
+collection on every load. Totals now live in one summary document in
+``donation_ledger`` that verify_donation_payment updates atomically
+(``$inc`` plus a capped ``$push`` of the donation), and each process keeps
+the latest entries in a bounded ring buffer. Neither endpoint reads the
+donations collection; it is only scanned once, to build the summary if it
+does not exist yet. rebuild_donation_ledger.py rescans it to repair the
+summary after a donation could not be recorded.
+
+    DONATION_RECENT_SIZE           donations kept for /donations/recent (default 50)
+    DONATION_LEDGER_TTL_SECONDS    how long a process serves its copy before
+                                   re-reading the summary, so workers that did
+                                   not record a donation catch up (default 30)
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List
+
+from pymongo import ReturnDocument
+
+from services.state_store import register_local_cache
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_ID = "summary"
+RECENT_FIELDS = ("donor_name", "amount", "message", "completed_at")
+
+class DonationLedger:
+    def __init__(self, recent_size: int, ttl_seconds: float):
+        self.recent_size = recent_size
+        self.ttl_seconds = ttl_seconds
+        self.total_amount = 0
+        self.total_donors = 0
+        self.recent: deque = deque(maxlen=recent_size)
+        self.ready = False
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _apply(self, summary: Dict[str, Any]):
+        self.total_amount = summary.get("total_amount", 0)
+        self.total_donors = summary.get("total_donors", 0)
+        self.recent = deque(summary.get("recent", []), maxlen=self.recent_size)
+        self._loaded_at = time.monotonic()
+        self.ready = True
+
+    async def _build_summary(self, db, exclude: Any = None) -> Dict[str, Any]:
+        """
+        One-off scan of the donations collection for a database without a
+        summary yet; ``exclude`` is the _id of a donation the caller is about
+        to add itself.
+        """
+        query = {"status": "completed"}
+        if exclude is not None:
+            query["_id"] = {"$ne": exclude}
+        totals = await db.donations.aggregate([
+            {"$match": query},
+            {"$group": {"_id": None, "total_amount": {"$sum": "$amount"}, "total_donors": {"$sum": 1}}}
+        ]).to_list(1)
+        recent = await db.donations.find(
+            query,
+            {field: 1 for field in RECENT_FIELDS} | {"_id": 0}
+        ).sort("completed_at", -1).limit(self.recent_size).to_list(self.recent_size)
+
+        summary = {
+            "total_amount": totals[0]["total_amount"] if totals else 0,
+            "total_donors": totals[0]["total_donors"] if totals else 0,
+            "recent": recent,
+            "updated_at": datetime.utcnow()
+        }
+        # $setOnInsert: a summary written by another process in the meantime wins
+        return await db.donation_ledger.find_one_and_update(
+            {"_id": SUMMARY_ID},
+            {"$setOnInsert": summary},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _stale(self) -> bool:
+        return not self.ready or time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    async def _load(self, db, exclude: Any = None):
+        summary = await db.donation_ledger.find_one({"_id": SUMMARY_ID})
+        if summary is None:
+            logger.info("Donation ledger summary missing, building it from donations")
+            summary = await self._build_summary(db, exclude)
+        self._apply(summary)
+
+    async def load(self, db):
+        """Read the summary document, building it on first use."""
+        async with self._lock:
+            await self._load(db)
+
+    async def refresh(self, db):
+        """Reload the summary if this process's copy is older than the TTL."""
+        if self._stale():
+            async with self._lock:
+                # Callers that queued on the lock find the copy already refreshed
+                if self._stale():
+                    await self._load(db)
+
+    async def rebuild(self, db) -> Dict[str, Any]:
+        """Recompute the summary from the donations collection, replacing the stored one."""
+        async with self._lock:
+            await db.donation_ledger.delete_one({"_id": SUMMARY_ID})
+            await self._load(db)
+        return self.stats()
+
+    async def record(self, db, donation: Dict[str, Any]) -> bool:
+        """
+        Add a newly completed donation to the totals and the recent list,
+        atomically. Never raises, so a ledger failure cannot fail the payment
+        flow; False if it was not recorded (rebuild() repairs the summary).
+        """
+        try:
+            if not self.ready:
+                # Never let the upsert below start a summary without the history;
+                # a summary built here must leave out the donation counted below
+                async with self._lock:
+                    await self._load(db, exclude=donation.get("_id"))
+            entry = {field: donation.get(field) for field in RECENT_FIELDS}
+            summary = await db.donation_ledger.find_one_and_update(
+                {"_id": SUMMARY_ID},
+                {
+                    "$inc": {"total_amount": donation.get("amount", 0), "total_donors": 1},
+                    "$push": {"recent": {"$each": [entry], "$position": 0, "$slice": self.recent_size}},
+                    "$set": {"updated_at": datetime.utcnow()}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            self._apply(summary)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to record donation {donation.get('_id')} in the ledger: {str(e)}")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"total_amount": self.total_amount, "total_donors": self.total_donors}
+
+    def latest(self, limit: int) -> List[Dict[str, Any]]:
+        return [dict(entry) for _, entry in zip(range(max(limit, 0)), self.recent)]
+
+donation_ledger = DonationLedger(
+    recent_size=int(os.getenv("DONATION_RECENT_SIZE", "50")),
+    ttl_seconds=float(os.getenv("DONATION_LEDGER_TTL_SECONDS", "30"))
+)
+register_local_cache(
+    "donation_ledger",
+    f"donations verified on another worker show up within {donation_ledger.ttl_seconds:g}s "
+    f"(DONATION_LEDGER_TTL_SECONDS)"
+)
@@ -0,0 +1,159 @@
+"""
+Per-user subscription entitlement (active tier and expiry) cached in memory
+
+Premium gates call ``entitlements.is_premium(db, user_id)``. A user's active
+subscription is read from user_subscriptions once and then answered from
+memory until the earlier of:
+
+    - its end_date: the entry is evicted exactly when the subscription
+      lapses, so the next check sees a renewal or the expiry
+    - ENTITLEMENT_TTL_SECONDS (default 60): bounds how long a worker that did
+      not process a payment or webhook serves the old answer
+
+verify_payment and the subscription webhooks call ``invalidate`` for the
+user they touched. Concurrent misses for one user share a single query, and
+at most ENTITLEMENT_CACHE_SIZE users (default 10000) are kept; when full,
+entries that have already expired go first, then the least recently used.
+"""
+import asyncio
+import heapq
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from services.state_store import register_local_cache
+
+class Entitlement(NamedTuple):
+    tier_id: str
+    end_date: datetime
+
+async def find_active_subscription(db, user_id: str) -> Optional[Entitlement]:
+    subscription = await db.user_subscriptions.find_one(
+        {"user_id": user_id, "status": "active", "end_date": {"$gt": datetime.utcnow()}},
+        {"tier_id": 1, "end_date": 1},
+        sort=[("end_date", -1)]
+    )
+    if subscription is None:
+        return None
+    return Entitlement(subscription["tier_id"], subscription["end_date"])
+
+class EntitlementCache:
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # user_id -> (entitlement or None, monotonic deadline)
+        self._entries: "OrderedDict[str, Tuple[Optional[Entitlement], float]]" = OrderedDict()
+        self._deadlines: List[Tuple[float, str]] = []
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _deadline(self, entitlement: Optional[Entitlement]) -> float:
+        now = time.monotonic()
+        deadline = now + self.ttl_seconds
+        if entitlement is not None:
+            remaining = (entitlement.end_date - datetime.utcnow()).total_seconds()
+            deadline = min(deadline, now + remaining)
+        return deadline
+
+    def _store(self, user_id: str, entitlement: Optional[Entitlement]):
+        deadline = self._deadline(entitlement)
+        self._entries[user_id] = (entitlement, deadline)
+        self._entries.move_to_end(user_id)
+        heapq.heappush(self._deadlines, (deadline, user_id))
+        if len(self._entries) > self.max_entries:
+            self._evict()
+        elif len(self._deadlines) > 2 * len(self._entries) + 64:
+            self._compact()
+
+    def _compact(self):
+        # Drop heap items left behind by refreshed or invalidated entries
+        self._deadlines = [(deadline, user_id) for user_id, (_, deadline) in self._entries.items()]
+        heapq.heapify(self._deadlines)
+
+    def _evict(self):
+        now = time.monotonic()
+        # Expired entries first; stale heap items no longer match their entry
+        while self._deadlines and self._deadlines[0][0] <= now:
+            deadline, user_id = heapq.heappop(self._deadlines)
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] == deadline:
+                del self._entries[user_id]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def cached(self, user_id: str) -> Tuple[bool, Optional[Entitlement]]:
+        """(True, entitlement) for a live entry, (False, None) on a miss."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return False, None
+        if entry[1] <= time.monotonic():
+            del self._entries[user_id]
+            return False, None
+        self._entries.move_to_end(user_id)
+        return True, entry[0]
+
+    async def get(self, db, user_id: str) -> Optional[Entitlement]:
+        """The user's active subscription, None if there is none."""
+        found, entitlement = self.cached(user_id)
+        if found:
+            self.hits += 1
+            return entitlement
+        self.misses += 1
+
+        while user_id in self._pending:
+            future = self._pending[user_id]
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The caller running the query was cancelled, not this one: query again
+                if not future.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[user_id] = future
+        try:
+            entitlement = await find_active_subscription(db, user_id)
+        except BaseException as e:
+            if self._pending.get(user_id) is future:
+                del self._pending[user_id]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Mark retrieved: the waiters, if any, get it re-raised
+                future.exception()
+            raise
+        # Not cached if invalidated while the query ran, the result may predate the change
+        if self._pending.get(user_id) is future:
+            del self._pending[user_id]
+            self._store(user_id, entitlement)
+        future.set_result(entitlement)
+        return entitlement
+
+    async def is_premium(self, db, user_id: str) -> bool:
+        return await self.get(db, user_id) is not None
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+        self._pending.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._deadlines = []
+        self._pending.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+entitlements = EntitlementCache(
+    ttl_seconds=float(os.getenv("ENTITLEMENT_TTL_SECONDS", "60")),
+    max_entries=int(os.getenv("ENTITLEMENT_CACHE_SIZE", "10000"))
+)
+register_local_cache(
+    "entitlements",
+    f"payments and webhooks handled by another worker show up within {entitlements.ttl_seconds:g}s "
+    f"(ENTITLEMENT_TTL_SECONDS)"
+)
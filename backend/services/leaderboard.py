@@ -0,0 +1,169 @@
+"""
+In-memory vote leaderboards for product suggestions and upcoming tests
+
+The ``voters`` array grows with every vote and is never part of a listing,
+so it is neither loaded nor kept; "has this user voted" is asked of MongoDB.
+"""
+import bisect
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Projection for voting documents read for listings and the leaderboards
+WITHOUT_VOTERS = {"voters": 0}
+
+class Leaderboard:
+    """
+    Ranked view of a voting collection kept in process memory.
+
+    Documents are grouped by status and kept sorted by vote count
+    (descending) so top-N and per-status counts never touch MongoDB.
+    Routes must call ``upsert``/``remove`` after every write to the
+    underlying collection to keep the view in sync.
+
+    A disabled leaderboard (several workers, each seeing only its own writes)
+    holds nothing and never becomes ready, so routes keep reading MongoDB.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.ready = False
+        self.disabled = False
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._ranked: Dict[str, List[Tuple[int, str]]] = {}
+        self._status_counts: Counter = Counter()
+        self._category_counts: Counter = Counter()
+        self._category_votes: Counter = Counter()
+        self._total_votes = 0
+
+    @staticmethod
+    def _rank_key(doc: Dict[str, Any]) -> Tuple[int, str]:
+        return (-doc.get("votes", 0), str(doc["_id"]))
+
+    def _unlink(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return None
+
+        status = doc.get("status")
+        ranked = self._ranked.get(status, [])
+        key = self._rank_key(doc)
+        index = bisect.bisect_left(ranked, key)
+        if index < len(ranked) and ranked[index] == key:
+            del ranked[index]
+
+        self._status_counts[status] -= 1
+        if self._status_counts[status] <= 0:
+            del self._status_counts[status]
+
+        category = doc.get("category")
+        self._category_counts[category] -= 1
+        self._category_votes[category] -= doc.get("votes", 0)
+        if self._category_counts[category] <= 0:
+            del self._category_counts[category]
+            del self._category_votes[category]
+        self._total_votes -= doc.get("votes", 0)
+
+        return doc
+
+    def upsert(self, doc: Dict[str, Any]):
+        """Insert or re-rank a document after it was written to MongoDB."""
+        if self.disabled:
+            return
+        doc_id = str(doc["_id"])
+        self._unlink(doc_id)
+
+        status = doc.get("status")
+        bisect.insort(self._ranked.setdefault(status, []), self._rank_key(doc))
+        self._status_counts[status] += 1
+        self._category_counts[doc.get("category")] += 1
+        self._category_votes[doc.get("category")] += doc.get("votes", 0)
+        self._total_votes += doc.get("votes", 0)
+        self._docs[doc_id] = {key: value for key, value in doc.items() if key != "voters"}
+
+    def remove(self, doc_id: str):
+        """Drop a document that was deleted from MongoDB."""
+        self._unlink(str(doc_id))
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        doc = self._docs.get(str(doc_id))
+        return dict(doc) if doc is not None else None
+
+    def top(self, status: str, limit: int, skip: int = 0) -> List[Dict[str, Any]]:
+        """
+        Highest-voted documents for a status
+
+        Returns shallow copies so callers can reshape them for the response
+        without corrupting the cached documents.
+        """
+        ranked = self._ranked.get(status, [])
+        return [dict(self._docs[doc_id]) for _, doc_id in ranked[skip:skip + limit]]
+
+    def count(self, status: Optional[str] = None) -> int:
+        if status is None:
+            return len(self._docs)
+        return self._status_counts.get(status, 0)
+
+    def total_votes(self) -> int:
+        return self._total_votes
+
+    def category_breakdown(self) -> List[Dict[str, Any]]:
+        """Document and vote totals per category, most voted first."""
+        breakdown = [
+            {"category": category, "suggestions": count, "votes": self._category_votes[category]}
+            for category, count in self._category_counts.items()
+        ]
+        breakdown.sort(key=lambda item: (-item["votes"], str(item["category"])))
+        return breakdown
+
+    def load(self, docs: List[Dict[str, Any]]):
+        """Replace the whole view, e.g. after a restart or a bulk write."""
+        if self.disabled:
+            return
+        self._docs = {}
+        self._ranked = {}
+        self._status_counts = Counter()
+        self._category_counts = Counter()
+        self._category_votes = Counter()
+        self._total_votes = 0
+        for doc in docs:
+            self.upsert(doc)
+        self.ready = True
+
+    def disable(self):
+        self.disabled = True
+        self.ready = False
+        self._docs = {}
+        self._ranked = {}
+        self._status_counts = Counter()
+        self._category_counts = Counter()
+        self._category_votes = Counter()
+        self._total_votes = 0
+
+    async def rebuild(self, collection):
+        """Reload the view from a Motor collection (no-op when disabled)."""
+        if self.disabled:
+            return
+        docs = await collection.find({}, WITHOUT_VOTERS).to_list(None)
+        self.load(docs)
+        logger.info(f"{self.name} leaderboard loaded with {len(docs)} documents")
+
+# Global instances
+suggestion_leaderboard = Leaderboard("product_suggestions")
+upcoming_test_leaderboard = Leaderboard("upcoming_tests")
+
+async def rebuild_leaderboards(db):
+    """Warm both leaderboards from MongoDB (called at startup)."""
+    try:
+        await suggestion_leaderboard.rebuild(db.product_suggestions)
+        await upcoming_test_leaderboard.rebuild(db.upcoming_tests)
+    except Exception as e:
+        # Routes fall back to querying MongoDB while the views are cold
+        logger.error(f"Failed to build vote leaderboards: {str(e)}")
+
+def disable_leaderboards():
+    """Several workers: no process sees every vote, so none may answer from memory."""
+    suggestion_leaderboard.disable()
+    upcoming_test_leaderboard.disable()
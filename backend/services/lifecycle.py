@@ -0,0 +1,219 @@
+"""
+Startup and health: index creation, cache warmup and cached readiness checks
+
+Configured through environment variables:
+    MONGO_WARM_CONNECTIONS       pooled connections opened at startup (default 5)
+    WARMUP_TIMEOUT_SECONDS       per-task warmup budget (default 30)
+    HEALTH_CHECK_TTL_SECONDS     how long a dependency check result is reused (default 5)
+    HEALTH_CHECK_TIMEOUT_SECONDS ping timeout for the database check (default 2)
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+# Indexes backing the API's hot queries, created idempotently at startup
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "user_votes": [
+        IndexModel([("user_id", ASCENDING), ("month_year", ASCENDING)], name="user_month"),
+        IndexModel([("user_id", ASCENDING), ("voted_at", DESCENDING)], name="user_recent"),
+        IndexModel([("product_suggestion_id", ASCENDING)], name="suggestion"),
+    ],
+    "product_suggestions": [
+        IndexModel([("status", ASCENDING), ("votes", DESCENDING)], name="status_votes"),
+    ],
+    "upcoming_tests": [
+        IndexModel([("status", ASCENDING), ("votes", DESCENDING)], name="status_votes"),
+    ],
+    "test_reports": [
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "blog_posts": [
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "subscription_tiers": [
+        IndexModel([("is_active", ASCENDING), ("price", ASCENDING)], name="active_price"),
+    ],
+    "user_subscriptions": [
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("end_date", DESCENDING)], name="user_status_end"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_history"),
+        IndexModel([("razorpay_order_id", ASCENDING)], name="razorpay_order"),
+        # Subscription sweeper: lapsed active subscriptions and stale pending orders
+        IndexModel([("status", ASCENDING), ("end_date", ASCENDING)], name="status_end"),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created"),
+    ],
+    "donations": [
+        IndexModel([("razorpay_order_id", ASCENDING)], name="razorpay_order"),
+        IndexModel([("status", ASCENDING), ("completed_at", DESCENDING)], name="status_completed"),
+        IndexModel([("idempotency_key", ASCENDING)], name="idempotency_key_unique", unique=True, sparse=True),
+    ],
+    "revenue_rollups": [
+        IndexModel([("day", ASCENDING), ("source", ASCENDING)], name="day_source"),
+    ],
+    "revenue_events": [
+        IndexModel([("day", ASCENDING)], name="day"),
+    ],
+    "password_resets": [
+        IndexModel([("email", ASCENDING), ("token_hash", ASCENDING)], name="email_token"),
+        # Removes each reset code once its expiration has passed
+        IndexModel([("expiration", ASCENDING)], name="expiration_ttl", expireAfterSeconds=0),
+    ],
+    # One signup per email: the signup endpoints rely on the duplicate key error
+    "waitlist": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "newsletter_subscribers": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+}
+
+# Signup lists whose unique email index needs dedupe_signups.py on old data
+SIGNUP_COLLECTIONS = ("waitlist", "newsletter_subscribers")
+
+WarmupTask = Callable[[Any], Awaitable[Any]]
+
+async def ensure_indexes(db) -> Dict[str, str]:
+    """Create INDEXES; a failure on one collection is logged and does not block the rest."""
+    results = {}
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+            results[collection] = "ok"
+        except Exception as e:
+            logger.error(f"Index creation failed for {collection}: {str(e)}")
+            if collection in SIGNUP_COLLECTIONS:
+                logger.error("If duplicate emails block the unique index, run dedupe_signups.py")
+            results[collection] = "failed"
+    return results
+
+async def open_connection_pool(db, connections: int):
+    """Ping once, then concurrently so the pool holds warm connections before traffic."""
+    await db.command("ping")
+    if connections > 1:
+        await asyncio.gather(*(db.command("ping") for _ in range(connections)))
+
+async def run_warmups(db, tasks: List[Tuple[str, WarmupTask]], timeout: float) -> Dict[str, Dict[str, Any]]:
+    """Run warmup tasks concurrently; each is timed and may fail without stopping startup."""
+
+    async def run(name: str, task: WarmupTask):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(task(db), timeout)
+            status = "ok"
+        except asyncio.TimeoutError:
+            logger.error(f"Warmup '{name}' timed out after {timeout:.0f}s")
+            status = "timeout"
+        except Exception as e:
+            logger.error(f"Warmup '{name}' failed: {str(e)}")
+            status = "failed"
+        return name, {"status": status, "ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    return dict(await asyncio.gather(*(run(name, task) for name, task in tasks)))
+
+class HealthState:
+    """
+    Readiness and liveness for the probes
+
+    The database check is cached for HEALTH_CHECK_TTL_SECONDS and concurrent
+    probes share a single in-flight ping, so probe traffic never turns into
+    a ping per request.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv("HEALTH_CHECK_TTL_SECONDS", "5"))
+        self.timeout = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+        self.warm_connections = int(os.getenv("MONGO_WARM_CONNECTIONS", "5"))
+        self.warmup_timeout = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "30"))
+        self.started_at = time.time()
+        self.startup_complete = False
+        self.shutting_down = False
+        self.startup: Dict[str, Any] = {}
+        self._db = None
+        self._database_ok: Optional[bool] = None
+        self._database_error: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def startup_sequence(self, db, warmups: List[Tuple[str, WarmupTask]]):
+        """Open the pool, create indexes and warm caches; records what happened."""
+        self._db = db
+        start = time.perf_counter()
+
+        try:
+            await asyncio.wait_for(open_connection_pool(db, self.warm_connections), self.timeout * 5)
+            self._record_database(True, None)
+        except Exception as e:
+            logger.error(f"MongoDB unreachable at startup: {str(e)}")
+            self._record_database(False, str(e))
+
+        if self._database_ok:
+            self.startup["indexes"] = await ensure_indexes(db)
+        self.startup["warmups"] = await run_warmups(db, warmups, self.warmup_timeout)
+        self.startup["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        self.startup_complete = True
+        logger.info(f"Startup finished in {self.startup['duration_ms']:.0f}ms: {self.startup['warmups']}")
+
+    def index_ready(self, collection: str) -> bool:
+        """Whether this process created (or confirmed) the collection's INDEXES at startup."""
+        return self.startup.get("indexes", {}).get(collection) == "ok"
+
+    def _record_database(self, ok: bool, error: Optional[str]):
+        self._database_ok = ok
+        self._database_error = error
+        self._checked_at = time.monotonic()
+
+    async def check_database(self) -> bool:
+        if self._db is None:
+            return False
+        if self._database_ok is not None and time.monotonic() - self._checked_at < self.ttl:
+            return self._database_ok
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another probe may have refreshed it while we waited
+            if time.monotonic() - self._checked_at < self.ttl:
+                return self._database_ok
+            try:
+                await asyncio.wait_for(self._db.command("ping"), self.timeout)
+                self._record_database(True, None)
+            except Exception as e:
+                logger.warning(f"Database health check failed: {str(e)}")
+                self._record_database(False, str(e) or type(e).__name__)
+        return self._database_ok
+
+    def database_status(self) -> str:
+        if self._database_ok is None:
+            return "unknown"
+        return "connected" if self._database_ok else "unreachable"
+
+    async def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        database_ok = await self.check_database()
+        ready = self.startup_complete and database_ok and not self.shutting_down
+        body = {
+            "status": "ready" if ready else "not_ready",
+            "startup_complete": self.startup_complete,
+            "database": self.database_status(),
+            "warmups": {name: result["status"] for name, result in self.startup.get("warmups", {}).items()},
+        }
+        failed_indexes = [name for name, result in self.startup.get("indexes", {}).items() if result != "ok"]
+        if failed_indexes:
+            body["failed_indexes"] = failed_indexes
+        if self.shutting_down:
+            body["shutting_down"] = True
+        if self._database_error:
+            body["database_error"] = self._database_error
+        return ready, body
+
+    def liveness(self) -> Dict[str, Any]:
+        return {"status": "alive", "uptime_seconds": round(time.time() - self.started_at, 1)}
+
+health_state = HealthState()
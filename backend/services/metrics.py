@@ -0,0 +1,207 @@
+"""
+Request metrics: per-route latency histograms, status counts, in-flight gauge
+and per-request dependency timings exposed as a Server-Timing header
+"""
+import bisect
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# External dependencies broken out in Server-Timing
+DEPENDENCIES = ("mongo", "mailgun", "razorpay")
+
+# Dependency time accumulated by the request currently being served
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+# ASGI scope of the request currently being served
+_request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> list:
+        lines = []
+        cumulative = 0
+        for bound, hits in zip(LATENCY_BUCKETS, self.buckets):
+            cumulative += hits
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+class MetricsRegistry:
+    """Process-local metric store; rendered by GET /api/metrics."""
+
+    def __init__(self):
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.dependency_latency: Dict[Tuple[str, str], Histogram] = {}
+        self.responses: Counter = Counter()
+        self.in_flight = 0
+
+    def observe_request(self, method: str, route: str, status: int, duration: float, timings: Dict[str, float]):
+        key = (method, route)
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = Histogram()
+        histogram.observe(duration)
+        self.responses[(method, route, status)] += 1
+
+        for dependency, seconds in timings.items():
+            dependency_key = (route, dependency)
+            histogram = self.dependency_latency.get(dependency_key)
+            if histogram is None:
+                histogram = self.dependency_latency[dependency_key] = Histogram()
+            histogram.observe(seconds)
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in sorted(self.latency.items()):
+            lines += histogram.render("http_request_duration_seconds", f'method="{method}",route="{route}"')
+
+        lines += [
+            "# HELP http_responses_total Responses by route and status code",
+            "# TYPE http_responses_total counter",
+        ]
+        for (method, route, status), count in sorted(self.responses.items()):
+            lines.append(f'http_responses_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being served",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP dependency_duration_seconds Time spent in external dependencies per request",
+            "# TYPE dependency_duration_seconds histogram",
+        ]
+        for (route, dependency), histogram in sorted(self.dependency_latency.items()):
+            lines += histogram.render("dependency_duration_seconds", f'route="{route}",dependency="{dependency}"')
+
+        return "\n".join(lines) + "\n"
+
+metrics_registry = MetricsRegistry()
+
+def record_dependency_time(dependency: str, seconds: float):
+    """Add time spent in an external dependency to the current request, if any."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[dependency] = timings.get(dependency, 0.0) + seconds
+
+def route_label(scope: dict) -> str:
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or "<unmatched>"
+
+def current_route() -> Optional[str]:
+    """Method and route template of the request being served, if any."""
+    scope = _request_scope.get()
+    if scope is None:
+        return None
+    return f"{scope['method']} {route_label(scope)}"
+
+@contextmanager
+def track_dependency(dependency: str):
+    """Time a block of code that calls out to Mailgun, Razorpay, etc."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_dependency_time(dependency, time.perf_counter() - start)
+
+class MongoTimingListener(monitoring.CommandListener):
+    """
+    Attributes MongoDB command time to the request that issued it
+
+    Motor copies the caller's context onto its executor threads, so the
+    request's timing dict is visible from these callbacks.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record_dependency_time("mongo", event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        record_dependency_time("mongo", event.duration_micros / 1_000_000)
+
+mongo_timing_listener = MongoTimingListener()
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, status and in-flight metrics
+
+    Routes are labelled with their path template (``/api/reports/{report_id}``)
+    so label cardinality stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = metrics_registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        scope_token = _request_scope.set(scope)
+        start = time.perf_counter()
+        status_code = 500
+        finished = False
+        registry.in_flight += 1
+
+        def finish():
+            # Once per request: when the last body message is sent, so background
+            # tasks (emails after the response) are not counted, else on exit
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            registry.in_flight -= 1
+            registry.observe_request(
+                scope["method"], route_label(scope), status_code, time.perf_counter() - start, dict(timings)
+            )
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = time.perf_counter() - start
+                entries = [f"{name};dur={timings[name] * 1000:.1f}" for name in DEPENDENCIES if name in timings]
+                entries.append(f"app;dur={elapsed * 1000:.1f}")
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(entries).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            finish()
+            _request_timings.reset(token)
+            _request_scope.reset(scope_token)
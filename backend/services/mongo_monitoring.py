@@ -0,0 +1,287 @@
+"""
+MongoDB command monitoring: per-collection/command latency, slow-query log
+and periodic explain() sampling of the hottest query shapes
+
+Configured through environment variables:
+    MONGO_MONITORING_ENABLED        "true" to register the listener (default off)
+    MONGO_SLOW_QUERY_MS             log commands slower than this (default 100)
+    MONGO_EXPLAIN_INTERVAL_SECONDS  explain() sampling period, 0 disables (default 300)
+    MONGO_EXPLAIN_TOP_SHAPES        how many shapes to explain per run (default 5)
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from services.metrics import current_route
+
+logger = logging.getLogger(__name__)
+
+# Commands whose filter is worth explaining, and the fields explain() accepts for them
+EXPLAINABLE_FIELDS = {
+    "find": ("filter", "sort", "projection", "limit", "skip", "hint"),
+    "aggregate": ("pipeline", "hint"),
+    "count": ("query", "limit", "skip", "hint"),
+}
+
+IGNORED_COMMANDS = {"explain", "hello", "isMaster", "ismaster", "ping", "buildInfo", "endSessions", "saslStart", "saslContinue"}
+
+def _shape(value: Any) -> Any:
+    """Replace literal values with '?' so equal queries share one shape."""
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [_shape(item) for item in value]
+        return ["?"]
+    return "?"
+
+def _query_shape(command_name: str, command: Dict[str, Any]) -> str:
+    if command_name == "find":
+        return repr((_shape(command.get("filter", {})), command.get("sort")))
+    if command_name == "aggregate":
+        return repr(_shape(command.get("pipeline", [])))
+    if command_name == "count":
+        return repr(_shape(command.get("query", {})))
+    return ""
+
+def _documents_returned(reply: Dict[str, Any]) -> int:
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    return reply.get("n", 0) if isinstance(reply.get("n"), int) else 0
+
+def _has_collscan(plan: Any) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_has_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(item) for item in plan)
+    return False
+
+class CommandStats:
+    __slots__ = ("count", "failures", "total_seconds", "max_seconds", "documents")
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.documents = 0
+
+class ShapeStats:
+    __slots__ = ("collection", "command_name", "shape", "database", "sample", "count", "total_seconds", "collscan")
+
+    def __init__(self, collection: str, command_name: str, shape: str, database: str):
+        self.collection = collection
+        self.command_name = command_name
+        self.shape = shape
+        self.database = database
+        self.sample: Optional[Dict[str, Any]] = None
+        self.count = 0
+        self.total_seconds = 0.0
+        self.collscan: Optional[bool] = None
+
+class MongoCommandMonitor(monitoring.CommandListener):
+    """
+    Aggregates command latency per (collection, command) and per query shape
+
+    Callbacks run on Motor's executor threads, so shared state is guarded
+    by a lock; the work per command is a couple of dict updates.
+    """
+
+    def __init__(self, slow_query_ms: float = 100.0):
+        self.slow_query_seconds = slow_query_ms / 1000
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[int, Any], Tuple[str, str, Optional[str], Optional[ShapeStats], Optional[str]]] = {}
+        self.commands: Dict[Tuple[str, str], CommandStats] = {}
+        self.shapes: Dict[Tuple[str, str, str], ShapeStats] = {}
+
+    def started(self, event):
+        command_name = event.command_name
+        if command_name in IGNORED_COMMANDS:
+            return
+
+        command = event.command
+        collection = command.get(command_name)
+        if command_name == "getMore":
+            collection = command.get("collection")
+        collection = collection if isinstance(collection, str) else "<none>"
+
+        shape_stats = None
+        if command_name in EXPLAINABLE_FIELDS:
+            shape = _query_shape(command_name, command)
+            key = (collection, command_name, shape)
+            with self._lock:
+                shape_stats = self.shapes.get(key)
+                if shape_stats is None:
+                    shape_stats = self.shapes[key] = ShapeStats(collection, command_name, shape, event.database_name)
+            shape_stats.sample = {field: command[field] for field in EXPLAINABLE_FIELDS[command_name] if field in command}
+
+        self._pending[(event.request_id, event.connection_id)] = (
+            collection, command_name, current_route(), shape_stats, event.database_name
+        )
+
+    def _finish(self, event, reply: Optional[Dict[str, Any]]):
+        pending = self._pending.pop((event.request_id, event.connection_id), None)
+        if pending is None:
+            return
+
+        collection, command_name, route, shape_stats, database = pending
+        seconds = event.duration_micros / 1_000_000
+
+        with self._lock:
+            stats = self.commands.get((collection, command_name))
+            if stats is None:
+                stats = self.commands[(collection, command_name)] = CommandStats()
+            stats.count += 1
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            if reply is None:
+                stats.failures += 1
+            else:
+                stats.documents += _documents_returned(reply)
+
+            if shape_stats is not None:
+                shape_stats.count += 1
+                shape_stats.total_seconds += seconds
+
+        if seconds >= self.slow_query_seconds:
+            logger.warning(
+                f"Slow MongoDB {command_name} on {database}.{collection}: {seconds * 1000:.1f}ms "
+                f"(route: {route or 'background'}, shape: {shape_stats.shape if shape_stats else '-'})"
+            )
+
+    def succeeded(self, event):
+        self._finish(event, event.reply)
+
+    def failed(self, event):
+        self._finish(event, None)
+
+    def top_shapes(self, limit: int) -> List[ShapeStats]:
+        with self._lock:
+            shapes = list(self.shapes.values())
+        shapes.sort(key=lambda shape: shape.total_seconds, reverse=True)
+        return shapes[:limit]
+
+    def snapshot(self, top: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            commands = [
+                {
+                    "collection": collection,
+                    "command": command_name,
+                    "count": stats.count,
+                    "failures": stats.failures,
+                    "total_ms": round(stats.total_seconds * 1000, 1),
+                    "avg_ms": round(stats.total_seconds * 1000 / stats.count, 2) if stats.count else 0,
+                    "max_ms": round(stats.max_seconds * 1000, 1),
+                    "documents": stats.documents
+                }
+                for (collection, command_name), stats in self.commands.items()
+            ]
+        commands.sort(key=lambda item: item["total_ms"], reverse=True)
+
+        shapes = [
+            {
+                "collection": shape.collection,
+                "command": shape.command_name,
+                "shape": shape.shape,
+                "count": shape.count,
+                "total_ms": round(shape.total_seconds * 1000, 1),
+                "collscan": shape.collscan
+            }
+            for shape in self.top_shapes(top)
+        ]
+
+        return {"slow_query_ms": self.slow_query_seconds * 1000, "commands": commands, "top_shapes": shapes}
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP mongo_command_duration_seconds_total Time spent in MongoDB commands",
+            "# TYPE mongo_command_duration_seconds_total counter",
+        ]
+        with self._lock:
+            items = sorted(self.commands.items())
+        for (collection, command_name), stats in items:
+            lines.append(f'mongo_command_duration_seconds_total{{collection="{collection}",command="{command_name}"}} {stats.total_seconds:.6f}')
+        lines += [
+            "# HELP mongo_commands_total MongoDB commands issued",
+            "# TYPE mongo_commands_total counter",
+        ]
+        for (collection, command_name), stats in items:
+            lines.append(f'mongo_commands_total{{collection="{collection}",command="{command_name}"}} {stats.count}')
+        lines += [
+            "# HELP mongo_command_documents_total Documents returned or affected by MongoDB commands",
+            "# TYPE mongo_command_documents_total counter",
+        ]
+        for (collection, command_name), stats in items:
+            lines.append(f'mongo_command_documents_total{{collection="{collection}",command="{command_name}"}} {stats.documents}')
+        return "\n".join(lines) + "\n"
+
+async def explain_top_shapes(client, monitor: MongoCommandMonitor, limit: int):
+    """Run explain() on the costliest query shapes and flag collection scans."""
+    for shape in monitor.top_shapes(limit):
+        if shape.sample is None:
+            continue
+        command = {shape.command_name: shape.collection, **shape.sample}
+        if shape.command_name == "aggregate":
+            command["cursor"] = {}
+        try:
+            result = await client[shape.database].command(
+                {"explain": command, "verbosity": "queryPlanner"}
+            )
+        except Exception as e:
+            logger.debug(f"explain() failed for {shape.collection}.{shape.command_name}: {str(e)}")
+            continue
+
+        shape.collscan = _has_collscan(result.get("queryPlanner", result))
+        if shape.collscan:
+            logger.warning(
+                f"COLLSCAN on {shape.database}.{shape.collection} ({shape.command_name}): "
+                f"{shape.count} calls, {shape.total_seconds * 1000:.0f}ms total, shape {shape.shape}"
+            )
+
+class MongoMonitoring:
+    """Configuration plus lifecycle of the listener and the explain sampler."""
+
+    def __init__(self):
+        self.enabled = os.getenv("MONGO_MONITORING_ENABLED", "false").lower() in ("1", "true", "yes")
+        self.explain_interval = float(os.getenv("MONGO_EXPLAIN_INTERVAL_SECONDS", "300"))
+        self.explain_top_shapes = int(os.getenv("MONGO_EXPLAIN_TOP_SHAPES", "5"))
+        self.monitor = MongoCommandMonitor(float(os.getenv("MONGO_SLOW_QUERY_MS", "100")))
+        self._task: Optional[asyncio.Task] = None
+
+    def listeners(self) -> list:
+        """Event listeners to pass to AsyncIOMotorClient."""
+        return [self.monitor] if self.enabled else []
+
+    async def _sample_forever(self, client):
+        while True:
+            await asyncio.sleep(self.explain_interval)
+            try:
+                await explain_top_shapes(client, self.monitor, self.explain_top_shapes)
+            except Exception as e:
+                logger.error(f"explain() sampling failed: {str(e)}")
+
+    def start(self, client):
+        if self.enabled and self.explain_interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._sample_forever(client))
+            logger.info(
+                f"MongoDB monitoring on: slow query threshold {self.monitor.slow_query_seconds * 1000:.0f}ms, "
+                f"explain sampling every {self.explain_interval:.0f}s"
+            )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+mongo_monitoring = MongoMonitoring()
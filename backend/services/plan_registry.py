@@ -0,0 +1,74 @@
+"""
+Membership plans (subscription_payment_routes) rendered once at import
+
+The plan set only changes with a deploy, so the registry validates it once
+and keeps everything the endpoints send as ready-made bytes with a strong
+ETag. The payment path reads frozen plan models and read-only plan dicts:
+
+    plan = plan_registry.plans["basic_monthly"]        # frozen SubscriptionPlan
+    details = plan_registry.details["basic_monthly"]   # read-only mapping
+
+Plans come from the JSON file named by SUBSCRIPTION_PLANS_FILE when set (a
+list of plan objects, same fields as SubscriptionPlan), otherwise from the
+defaults in the routes module. An invalid file stops startup.
+"""
+import json
+import logging
+import os
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from services.serialization import dumps, strong_etag
+
+logger = logging.getLogger(__name__)
+
+class PlanRegistry:
+    def __init__(self, plans: Iterable[BaseModel]):
+        ordered = list(plans)
+        self.plans: Mapping[str, BaseModel] = MappingProxyType({plan.id: plan for plan in ordered})
+        self.details: Mapping[str, Mapping[str, Any]] = MappingProxyType(
+            {plan.id: MappingProxyType(plan.model_dump()) for plan in ordered}
+        )
+
+        self.listing_body = dumps({"success": True, "plans": [dict(self.details[plan.id]) for plan in ordered]})
+        self.listing_etag = strong_etag(self.listing_body)
+        # plan id -> (body, etag) of GET /subscription-plans/{plan_id}
+        plan_bodies = {}
+        for plan_id, details in self.details.items():
+            body = dumps({"success": True, "plan": dict(details)})
+            plan_bodies[plan_id] = (body, strong_etag(body))
+        self.plan_bodies: Mapping[str, Tuple[bytes, str]] = MappingProxyType(plan_bodies)
+
+    def __contains__(self, plan_id: str) -> bool:
+        return plan_id in self.plans
+
+    def plan_details(self, plan_id: str) -> Dict[str, Any]:
+        """A plain dict copy of a plan, for storing with an order."""
+        return dict(self.details[plan_id])
+
+def read_plans_file(path: str, model: Type[BaseModel]) -> List[BaseModel]:
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    if isinstance(raw, dict):
+        raw = raw.get("plans", raw)
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("expected a non-empty list of plans")
+    plans = [model.model_validate(item) for item in raw]
+    ids = [plan.id for plan in plans]
+    if len(set(ids)) != len(ids):
+        raise ValueError("duplicate plan ids")
+    return plans
+
+def load_plan_registry(model: Type[BaseModel], defaults: Iterable[BaseModel], path: Optional[str] = None) -> PlanRegistry:
+    """Registry from SUBSCRIPTION_PLANS_FILE (or ``path``) if configured, else ``defaults``."""
+    path = path or os.getenv("SUBSCRIPTION_PLANS_FILE")
+    if not path:
+        return PlanRegistry(defaults)
+    try:
+        plans = read_plans_file(path, model)
+    except (OSError, ValueError, ValidationError) as e:
+        raise RuntimeError(f"Invalid SUBSCRIPTION_PLANS_FILE {path}: {str(e)}") from e
+    logger.info(f"Loaded {len(plans)} subscription plans from {path}")
+    return PlanRegistry(plans)
@@ -0,0 +1,531 @@
+"""
+Rate limits for abuse-prone endpoints
+
+Two kinds of limits live here, both written as "<hits>/<seconds>":
+
+Sliding windows, checked by a route itself (password reset): ``limit`` hits
+per key (an email, a client IP) in any ``window_seconds``. Rejected hits are
+not counted, so a client that keeps retrying is let back in once its oldest
+accepted hit leaves the window:
+
+    decision = await reset_email_limiter.hit(email)
+    if not decision.allowed:
+        raise too_many_requests(decision)      # 429 with Retry-After
+
+Token buckets, applied by RateLimitMiddleware to the public write endpoints
+in DEFAULT_POLICIES before any routing, validation or database work. "10/60" is a
+bucket of 10 requests refilled at 10 per 60 seconds, so bursts up to 10 pass
+and the sustained rate is capped. A policy keys each of its buckets on the
+client IP, the user of the bearer token, or a field of the JSON body (e.g.
+the email being registered), and a request is refused with 429 and
+Retry-After as soon as one of them is empty; the tokens it already took
+from the policy's other buckets are given back.
+
+Configured through environment variables:
+    RATE_LIMIT_BACKEND   memory (default, per process) or redis (REDIS_URL,
+                         shared by every worker; needs the redis package)
+    RATE_LIMIT_ENABLED   false turns the middleware off (default true)
+    RATE_LIMIT_<POLICY>  replaces a policy's buckets, e.g.
+                         RATE_LIMIT_AUTH_LOGIN="ip:30/60,body.email:10/300",
+                         or "off" to drop the policy
+    RATE_LIMIT_MAX_KEYS  buckets kept in memory before idle ones are evicted
+                         (default 100000)
+    TRUSTED_PROXY_HOPS   proxies in front of the app that append to
+                         X-Forwarded-For (default 1, Render's load balancer)
+
+If the redis backend is unreachable the request is allowed and logged: a
+limiter outage must not lock users out.
+"""
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from services.serialization import dumps
+from services.state_store import register_local_cache
+
+logger = logging.getLogger(__name__)
+
+PRUNE_EVERY = 1000
+SHARDS = 16
+# Bodies larger than this are not parsed for body.<field> keys
+MAX_KEY_BODY_BYTES = 64 * 1024
+
+class RateDecision(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """"3/900" -> (3, 900.0)"""
+    try:
+        limit, window = rate.split("/", 1)
+        limit, window = int(limit), float(window)
+    except ValueError:
+        raise ValueError(f"Invalid rate {rate!r}, expected <hits>/<seconds>")
+    if limit < 1 or window <= 0:
+        raise ValueError(f"Invalid rate {rate!r}, expected <hits>/<seconds>")
+    return limit, window
+
+class SlidingWindowLimiter:
+    """Exact sliding window: one timestamp per accepted hit and key."""
+
+    backend = "memory"
+
+    def __init__(self, name: str, limit: int, window_seconds: float):
+        self.name = name
+        self.limit = limit
+        self.window = window_seconds
+        self._hits: Dict[str, Deque[float]] = {}
+        self._since_prune = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_rate(cls, name: str, rate: str) -> "SlidingWindowLimiter":
+        return cls(name, *parse_rate(rate))
+
+    def _prune(self, now: float):
+        # Keys with no hit inside the window hold no state worth keeping
+        cutoff = now - self.window
+        for key in [key for key, hits in self._hits.items() if not hits or hits[-1] <= cutoff]:
+            del self._hits[key]
+
+    async def hit(self, key: str) -> RateDecision:
+        now = time.monotonic()
+        self._since_prune += 1
+        if self._since_prune >= PRUNE_EVERY:
+            self._since_prune = 0
+            self._prune(now)
+
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = self._hits[key] = deque()
+        cutoff = now - self.window
+        while hits and hits[0] <= cutoff:
+            hits.popleft()
+        if len(hits) >= self.limit:
+            self.rejected += 1
+            return RateDecision(False, 0, hits[0] + self.window - now)
+        hits.append(now)
+        return RateDecision(True, self.limit - len(hits), 0.0)
+
+    async def reset(self, key: str):
+        self._hits.pop(key, None)
+
+class RedisSlidingWindowLimiter(SlidingWindowLimiter):
+    """The same window in a sorted set per key, shared by every worker."""
+
+    backend = "redis"
+
+    def _key(self, key: str) -> str:
+        return f"choosepure:ratelimit:{self.name}:{key}"
+
+    async def hit(self, key: str) -> RateDecision:
+        from services.state_store import redis_client
+
+        redis_key = self._key(key)
+        now = time.time()
+        member = f"{now}:{uuid.uuid4().hex[:8]}"
+        try:
+            redis = redis_client("RATE_LIMIT_BACKEND=redis")
+            pipe = redis.pipeline(transaction=True)
+            pipe.zremrangebyscore(redis_key, 0, now - self.window)
+            pipe.zadd(redis_key, {member: now})
+            pipe.zcard(redis_key)
+            pipe.zrange(redis_key, 0, 0, withscores=True)
+            pipe.expire(redis_key, math.ceil(self.window))
+            _, _, count, oldest, _ = await pipe.execute()
+            if count > self.limit:
+                # Rejected hits do not count against the window
+                await redis.zrem(redis_key, member)
+                self.rejected += 1
+                return RateDecision(False, 0, max(oldest[0][1] + self.window - now, 0.0))
+            return RateDecision(True, self.limit - count, 0.0)
+        except RuntimeError:
+            raise
+        except Exception as e:
+            logger.error(f"Rate limiter {self.name} unavailable, allowing request: {str(e)}")
+            return RateDecision(True, self.limit, 0.0)
+
+    async def reset(self, key: str):
+        from services.state_store import redis_client
+
+        try:
+            await redis_client("RATE_LIMIT_BACKEND=redis").delete(self._key(key))
+        except Exception as e:
+            logger.error(f"Failed to reset rate limit {self.name}: {str(e)}")
+
+_LIMITERS = {"memory": SlidingWindowLimiter, "redis": RedisSlidingWindowLimiter}
+
+def sliding_window_limiter(name: str, rate: str) -> SlidingWindowLimiter:
+    """A limiter on the backend chosen by RATE_LIMIT_BACKEND."""
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend not in _LIMITERS:
+        raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND {backend!r}, expected memory or redis")
+    if backend == "memory":
+        register_local_cache(
+            f"rate limit {name}",
+            "so a client gets the limit once per worker (RATE_LIMIT_BACKEND=redis shares it)"
+        )
+    return _LIMITERS[backend].from_rate(name, rate)
+
+def client_ip(request: Request) -> str:
+    """
+    The caller's address. Each trusted proxy appends the address it received
+    the request from to X-Forwarded-For, so the entry TRUSTED_PROXY_HOPS from
+    the right is the client; entries further left are client-supplied.
+    """
+    hops = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+    forwarded = request.headers.get("x-forwarded-for")
+    if hops > 0 and forwarded:
+        addresses = [address.strip() for address in forwarded.split(",") if address.strip()]
+        if addresses:
+            return addresses[-min(hops, len(addresses))]
+    return request.client.host if request.client else "unknown"
+
+def too_many_requests(decision: RateDecision, detail: str = "Too many requests, please try again later") -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(decision.retry_after)))}
+    )
+
+class BucketLimit(NamedTuple):
+    # "ip", "user" (bearer token subject, else the IP) or "body.<field>"
+    key: str
+    capacity: int
+    per_seconds: float
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / self.per_seconds
+
+class RoutePolicy(NamedTuple):
+    name: str
+    method: str
+    path: str
+    limits: Tuple[BucketLimit, ...]
+
+def parse_limits(spec: str) -> Tuple[BucketLimit, ...]:
+    """"ip:10/60,body.email:5/300" -> BucketLimits"""
+    limits = []
+    for item in spec.split(","):
+        key, _, rate = item.strip().rpartition(":")
+        if key not in ("ip", "user") and not (key.startswith("body.") and len(key) > 5):
+            raise ValueError(f"Invalid rate limit key {key!r}, expected ip, user or body.<field>")
+        limits.append(BucketLimit(key, *parse_rate(rate)))
+    return tuple(limits)
+
+# Public write endpoints: (name, method, path, default buckets)
+DEFAULT_POLICIES = [
+    ("waitlist", "POST", "/api/waitlist", "ip:5/60,body.email:3/3600"),
+    ("newsletter_subscribe", "POST", "/api/newsletter/subscribe", "ip:5/60,body.email:3/3600"),
+    ("auth_register", "POST", "/api/auth/register", "ip:5/300"),
+    ("auth_login", "POST", "/api/auth/login", "ip:20/60,body.email:10/300"),
+    ("product_vote", "POST", "/api/product-voting/vote", "user:30/60"),
+    ("purchase_report", "POST", "/api/purchase-report", "ip:10/300,body.email:5/300"),
+    ("donation_create_order", "POST", "/api/donations/create-order", "ip:10/300,body.donor_email:5/300"),
+]
+
+def load_policies() -> Dict[Tuple[str, str], RoutePolicy]:
+    """(method, path) -> policy, with RATE_LIMIT_<NAME> overrides applied."""
+    policies = {}
+    for name, method, path, default in DEFAULT_POLICIES:
+        spec = os.getenv(f"RATE_LIMIT_{name.upper()}", default).strip()
+        if spec.lower() == "off":
+            continue
+        try:
+            limits = parse_limits(spec)
+        except ValueError as e:
+            raise RuntimeError(f"Invalid RATE_LIMIT_{name.upper()}: {str(e)}")
+        policies[(method, path)] = RoutePolicy(name, method, path, limits)
+    return policies
+
+class TokenBucketStore:
+    """
+    In-process buckets, split into shards by key so that eviction only ever
+    scans one shard. A bucket that would have refilled completely carries no
+    state and is evicted first, then the least recently used.
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_keys: int, shards: int = SHARDS):
+        self.max_per_shard = max(1, max_keys // shards)
+        # key -> (tokens, monotonic time of last update, time it is full again)
+        self._shards: List[Dict[str, Tuple[float, float, float]]] = [{} for _ in range(shards)]
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def _evict(self, shard: Dict[str, Tuple[float, float, float]], now: float):
+        full = [key for key, (_, _, full_at) in shard.items() if full_at <= now]
+        for key in full:
+            del shard[key]
+        # Insertion order is recency: every take re-inserts its key
+        target = self.max_per_shard * 9 // 10
+        while len(shard) > target:
+            del shard[next(iter(shard))]
+            self.evicted += 1
+        self.evicted += len(full)
+
+    async def take(self, key: str, limit: BucketLimit) -> RateDecision:
+        shard = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        rate = limit.refill_rate
+        state = shard.pop(key, None)
+        tokens = float(limit.capacity) if state is None else min(limit.capacity, state[0] + (now - state[1]) * rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            decision = RateDecision(True, int(tokens), 0.0)
+        else:
+            decision = RateDecision(False, 0, (1 - tokens) / rate)
+        shard[key] = (tokens, now, now + (limit.capacity - tokens) / rate)
+        if len(shard) > self.max_per_shard:
+            self._evict(shard, now)
+        return decision
+
+    async def refund(self, key: str, limit: BucketLimit):
+        """Give back the token of a take whose request was refused by another bucket."""
+        shard = self._shards[hash(key) % len(self._shards)]
+        state = shard.get(key)
+        if state is None:
+            return
+        tokens, updated, full_at = state
+        if tokens < limit.capacity:
+            refunded = min(limit.capacity, tokens + 1)
+            shard[key] = (refunded, updated, full_at - (refunded - tokens) / limit.refill_rate)
+
+# Refill, take and expire in one step, on the Redis server's clock
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1)
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+TOKEN_REFUND_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(math.min(capacity, tokens + 1)))
+end
+return 1
+"""
+
+class RedisTokenBucketStore:
+    """Buckets shared by every worker, one hash per key that expires once full."""
+
+    backend = "redis"
+
+    def __init__(self):
+        self._script = None
+        self._refund_script = None
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return 0
+
+    async def take(self, key: str, limit: BucketLimit) -> RateDecision:
+        from services.state_store import redis_client
+
+        try:
+            if self._script is None:
+                self._script = redis_client("RATE_LIMIT_BACKEND=redis").register_script(TOKEN_BUCKET_SCRIPT)
+            allowed, tokens, retry_after = await self._script(
+                keys=[f"choosepure:bucket:{key}"], args=[limit.capacity, limit.refill_rate]
+            )
+            return RateDecision(bool(int(allowed)), int(float(tokens)), float(retry_after))
+        except RuntimeError:
+            raise
+        except Exception as e:
+            logger.error(f"Rate limit store unavailable, allowing request: {str(e)}")
+            return RateDecision(True, limit.capacity, 0.0)
+
+    async def refund(self, key: str, limit: BucketLimit):
+        from services.state_store import redis_client
+
+        try:
+            if self._refund_script is None:
+                self._refund_script = redis_client("RATE_LIMIT_BACKEND=redis").register_script(TOKEN_REFUND_SCRIPT)
+            await self._refund_script(keys=[f"choosepure:bucket:{key}"], args=[limit.capacity])
+        except Exception as e:
+            logger.error(f"Failed to refund rate limit token: {str(e)}")
+
+def token_bucket_store():
+    """A bucket store on the backend chosen by RATE_LIMIT_BACKEND."""
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "redis":
+        return RedisTokenBucketStore()
+    if backend != "memory":
+        raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND {backend!r}, expected memory or redis")
+    register_local_cache(
+        "rate limit buckets",
+        "so a client gets each bucket once per worker (RATE_LIMIT_BACKEND=redis shares them)"
+    )
+    return TokenBucketStore(max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+
+def _bearer_subject(request: Request) -> Optional[str]:
+    authorization = request.headers.get("authorization", "")
+    if not authorization.lower().startswith("bearer "):
+        return None
+    from jose import JWTError, jwt
+    from auth import ALGORITHM, SECRET_KEY
+    try:
+        subject = jwt.decode(authorization[7:].strip(), SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+    return str(subject) if subject else None
+
+def _body_field(body: Optional[Dict[str, Any]], field: str) -> Optional[str]:
+    value = body.get(field) if isinstance(body, dict) else None
+    if not isinstance(value, str) or not value.strip():
+        return None
+    return value.strip().lower()
+
+class RateLimiter:
+    def __init__(self):
+        self.enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() not in ("false", "0", "no", "off")
+        self.policies = load_policies() if self.enabled else {}
+        self.store = token_bucket_store() if self.policies else None
+        self.limited: Counter = Counter()
+
+    def policy_for(self, scope) -> Optional[RoutePolicy]:
+        if not self.policies:
+            return None
+        return self.policies.get((scope["method"], scope["path"].rstrip("/") or "/"))
+
+    def bucket_key(self, limit: BucketLimit, request: Request, body: Optional[Dict[str, Any]]) -> Optional[str]:
+        """The bucket a request draws from; None skips the limit (e.g. no such body field)."""
+        if limit.key == "user":
+            subject = _bearer_subject(request)
+            return f"user:{subject}" if subject else f"ip:{client_ip(request)}"
+        if limit.key == "ip":
+            return f"ip:{client_ip(request)}"
+        value = _body_field(body, limit.key[5:])
+        return f"{limit.key}:{value}" if value else None
+
+    async def check(self, policy: RoutePolicy, request: Request, body: Optional[Dict[str, Any]]) -> RateDecision:
+        decision = RateDecision(True, 0, 0.0)
+        taken: List[Tuple[str, BucketLimit]] = []
+        for index, limit in enumerate(policy.limits):
+            key = self.bucket_key(limit, request, body)
+            if key is None:
+                continue
+            # One bucket per limit, even when two share a key (burst + sustained)
+            bucket = f"{policy.name}:{index}:{key}"
+            decision = await self.store.take(bucket, limit)
+            if not decision.allowed:
+                # A refused request must not drain the buckets it passed
+                for taken_bucket, taken_limit in taken:
+                    await self.store.refund(taken_bucket, taken_limit)
+                self.limited[policy.name] += 1
+                return decision
+            taken.append((bucket, limit))
+        return decision
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP rate_limited_requests_total Requests refused with 429 by the rate limiter, by policy",
+            "# TYPE rate_limited_requests_total counter",
+        ]
+        for policy in self.policies.values():
+            lines.append(f'rate_limited_requests_total{{policy="{policy.name}"}} {self.limited[policy.name]}')
+        if self.store is not None:
+            lines += [
+                "# HELP rate_limit_buckets In-process rate limit buckets",
+                "# TYPE rate_limit_buckets gauge",
+                f"rate_limit_buckets {len(self.store)}",
+                "# HELP rate_limit_buckets_evicted_total Buckets evicted to stay under RATE_LIMIT_MAX_KEYS",
+                "# TYPE rate_limit_buckets_evicted_total counter",
+                f"rate_limit_buckets_evicted_total {self.store.evicted}",
+            ]
+        return "\n".join(lines) + "\n"
+
+rate_limiter = RateLimiter()
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware applying rate_limiter's route policies
+
+    Only requests matching a policy are touched. When a policy keys on the
+    body, the body is read here and replayed to the app unchanged.
+    """
+
+    def __init__(self, app, limiter: RateLimiter = rate_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def _read_body(self, receive) -> Tuple[List[dict], Optional[Dict[str, Any]]]:
+        messages, chunks, size = [], [], 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                return messages, None
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size <= MAX_KEY_BODY_BYTES:
+                chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        if size > MAX_KEY_BODY_BYTES:
+            return messages, None
+        try:
+            return messages, json.loads(b"".join(chunks) or b"null")
+        except ValueError:
+            return messages, None
+
+    async def __call__(self, scope, receive, send):
+        policy = self.limiter.policy_for(scope) if scope["type"] == "http" else None
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        body = None
+        if any(limit.key.startswith("body.") for limit in policy.limits):
+            buffered, body = await self._read_body(receive)
+            upstream = receive
+
+            async def receive():
+                if buffered:
+                    return buffered.pop(0)
+                return await upstream()
+
+        decision = await self.limiter.check(policy, Request(scope), body)
+        if decision.allowed:
+            await self.app(scope, receive, send)
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"retry-after", str(max(1, math.ceil(decision.retry_after))).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": dumps({"detail": "Too many requests, please try again later"})})
@@ -1,9 +1,13 @@
-import razorpay
 import os
+import asyncio
+import contextvars
+import functools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional
 import hmac
 import hashlib
+from services.metrics import track_dependency
 
 logger = logging.getLogger(__name__)
 
@@ -12,13 +16,49 @@ class RazorpayService:
         self.key_id = os.getenv('RAZORPAY_KEY_ID')
         self.key_secret = os.getenv('RAZORPAY_KEY_SECRET')
         self.webhook_secret = os.getenv('RAZORPAY_WEBHOOK_SECRET')
-        
+        # Concurrent SDK calls: size of both the HTTP connection pool and the worker threads
+        self.pool_size = int(os.getenv('RAZORPAY_POOL_SIZE', '10'))
+        self._client = None
+        self._executor = None
+
+    @property
+    def client(self):
+        """Razorpay SDK client, built on first use so startup skips importing the SDK."""
+        if self._client is None and self.key_id and self.key_secret:
+            import razorpay
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            # Keep-alive connections shared by every call instead of a fresh TLS handshake each time
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size))
+            self._client = razorpay.Client(session=session, auth=(self.key_id, self.key_secret))
+            logger.info("Razorpay client initialized successfully")
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def log_status(self):
+        """Log the configuration; called from the app lifespan rather than at import."""
         if not self.key_id or not self.key_secret:
             logger.warning("Razorpay credentials not found in environment variables")
-            self.client = None
-        else:
-            self.client = razorpay.Client(auth=(self.key_id, self.key_secret))
-            logger.info("Razorpay client initialized successfully")
+
+    async def run(self, function, *args, **kwargs):
+        """
+        Run a blocking SDK call on the gateway's thread pool so the event loop
+        keeps serving other requests. The request context is carried over, so
+        track_dependency timings still land on the calling request.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="razorpay")
+        call = functools.partial(contextvars.copy_context().run, function, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    async def create_order_async(self, amount: float, currency: str = "INR", receipt: str = None, notes: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Non-blocking create_order."""
+        return await self.run(self.create_order, amount, currency, receipt, notes)
 
     def create_order(self, amount: float, currency: str = "INR", receipt: str = None, notes: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -47,7 +87,8 @@ class RazorpayService:
                 "notes": notes or {}
             }
             
-            order = self.client.order.create(data=order_data)
+            with track_dependency("razorpay"):
+                order = self.client.order.create(data=order_data)
             logger.info(f"Razorpay order created: {order['id']}")
             
             return {
@@ -79,7 +120,7 @@ class RazorpayService:
         Returns:
             Boolean indicating if signature is valid
         """
-        if not self.client:
+        if not self.key_id or not self.key_secret:
             logger.error("Razorpay client not initialized")
             return False
         
@@ -118,7 +159,8 @@ class RazorpayService:
             raise Exception("Razorpay client not initialized")
         
         try:
-            payment = self.client.payment.fetch(payment_id)
+            with track_dependency("razorpay"):
+                payment = self.client.payment.fetch(payment_id)
             logger.info(f"Payment details fetched for: {payment_id}")
             
             return {
@@ -173,7 +215,8 @@ class RazorpayService:
                 }
             }
             
-            plan = self.client.plan.create(data=plan_data)
+            with track_dependency("razorpay"):
+                plan = self.client.plan.create(data=plan_data)
             logger.info(f"Subscription plan created: {plan['id']}")
             
             return {
@@ -221,7 +264,8 @@ class RazorpayService:
             if total_count:
                 subscription_data["total_count"] = total_count
             
-            subscription = self.client.subscription.create(data=subscription_data)
+            with track_dependency("razorpay"):
+                subscription = self.client.subscription.create(data=subscription_data)
             logger.info(f"Subscription created: {subscription['id']}")
             
             return {
@@ -0,0 +1,65 @@
+"""
+Write helpers that hand back the written document without reading it again
+
+    report_repository = Repository("test_reports")
+    report = await report_repository.insert(db, report_doc)           # 1 round trip
+    report = await report_repository.update_by_id(db, report_id, {"$set": changes})
+
+``insert`` returns the document it was given (the driver fills in ``_id``);
+updates use ``find_one_and_update(..., return_document=AFTER)``, so every
+write costs a single round trip.
+"""
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+
+from services.dataloader import to_object_id
+
+class Repository:
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+
+    def collection(self, db):
+        return db[self.collection_name]
+
+    async def find_by_id(self, db, doc_id: Any, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        object_id = to_object_id(doc_id)
+        if object_id is None:
+            return None
+        return await self.collection(db).find_one({"_id": object_id}, projection)
+
+    async def insert(self, db, document: Dict[str, Any]) -> Dict[str, Any]:
+        await self.collection(db).insert_one(document)
+        return document
+
+    async def update_one(
+        self,
+        db,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        upsert: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """Apply update to the first match; the document after the update, or None if nothing matched."""
+        return await self.collection(db).find_one_and_update(
+            query, update, projection=projection, upsert=upsert, return_document=ReturnDocument.AFTER
+        )
+
+    async def update_by_id(self, db, doc_id: Any, update: Dict[str, Any], conditions: Optional[Dict[str, Any]] = None,
+                           projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        update_one on ``_id``; extra ``conditions`` make the write conditional
+        (e.g. ``{"voters": {"$ne": user_id}}``), in which case None also means
+        the document exists but did not qualify.
+        """
+        object_id = to_object_id(doc_id)
+        if object_id is None:
+            return None
+        return await self.update_one(db, {"_id": object_id, **(conditions or {})}, update, projection)
+
+    async def delete_by_id(self, db, doc_id: Any) -> bool:
+        object_id = to_object_id(doc_id)
+        if object_id is None:
+            return False
+        result = await self.collection(db).delete_one({"_id": object_id})
+        return result.deleted_count > 0
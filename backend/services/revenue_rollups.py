@@ -0,0 +1,245 @@
+"""
+Pre-aggregated revenue per day, source and plan
+
+Every captured payment is written once to ``revenue_events`` (``_id`` is
+``<source>:<payment id>``, so the verify endpoint and the webhook for the same
+payment count it once) and added to its daily bucket in ``revenue_rollups``:
+
+    {"_id": "2026-10-19|reports|premium", "day": <UTC midnight>,
+     "source": "reports", "plan": "premium", "amount": 1497.0, "count": 3}
+
+Analytics read only the buckets, so a year of revenue is a few hundred small
+documents whatever the payment volume. backfill_revenue.py rebuilds both
+collections from the payment records with ``$merge`` aggregations.
+
+Sources and their plan key:
+    donations       "donation"
+    reports         customerInfo.reportType of the report order
+    subscriptions   tier_id (subscription_routes) or planDetails.id
+                    (subscription_payment_routes)
+"""
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+SOURCES = ("donations", "reports", "subscriptions")
+
+def day_bucket(at: datetime) -> datetime:
+    return datetime.combine(at.date(), time.min)
+
+def bucket_id(day: datetime, source: str, plan: str) -> str:
+    return f"{day:%Y-%m-%d}|{source}|{plan}"
+
+async def record_revenue(
+    db,
+    source: str,
+    reference: Optional[str],
+    amount: float,
+    plan: Optional[str] = None,
+    at: Optional[datetime] = None,
+) -> bool:
+    """
+    Count one captured payment in its daily bucket; False if it was already
+    counted (or could not be recorded). Never raises, so a rollup failure
+    cannot fail the payment flow - backfill_revenue.py repairs the buckets.
+    """
+    if not reference or not amount:
+        return False
+    at = at or datetime.utcnow()
+    day = day_bucket(at)
+    plan = plan or "unknown"
+    try:
+        await db.revenue_events.insert_one({
+            "_id": f"{source}:{reference}",
+            "source": source,
+            "reference": reference,
+            "plan": plan,
+            "amount": amount,
+            "at": at,
+            "day": day,
+        })
+    except DuplicateKeyError:
+        return False
+    except Exception as e:
+        logger.error(f"Failed to record revenue event {source}:{reference}: {str(e)}")
+        return False
+
+    try:
+        await db.revenue_rollups.update_one(
+            {"_id": bucket_id(day, source, plan)},
+            {
+                "$inc": {"amount": amount, "count": 1},
+                "$setOnInsert": {"day": day, "source": source, "plan": plan},
+            },
+            upsert=True,
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Failed to update revenue rollup for {source}:{reference}: {str(e)}")
+        return False
+
+def _iso_string_date(field: str) -> Dict[str, Any]:
+    # Report/subscription state stores keep datetime.isoformat() strings
+    return {"$dateFromString": {
+        "dateString": {"$substrCP": [field, 0, 19]},
+        "format": "%Y-%m-%dT%H:%M:%S",
+        "onError": None,
+        "onNull": None,
+    }}
+
+def _event_pipeline(source: str, match: Dict[str, Any], reference: Any, amount: Any, plan: Any, at: Any,
+                    since: Optional[datetime]) -> List[Dict[str, Any]]:
+    return [
+        {"$match": match},
+        {"$project": {
+            "_id": {"$concat": [f"{source}:", {"$toString": reference}]},
+            "source": {"$literal": source},
+            "reference": {"$toString": reference},
+            "plan": {"$ifNull": [plan, "unknown"]},
+            "amount": amount,
+            "at": at,
+        }},
+        {"$match": {"at": {"$gte": since} if since else {"$type": "date"}}},
+        {"$addFields": {"day": {"$dateTrunc": {"date": "$at", "unit": "day"}}}},
+        # Events recorded by the live path win; history only fills the gaps
+        {"$merge": {"into": "revenue_events", "on": "_id", "whenMatched": "keepExisting", "whenNotMatched": "insert"}},
+    ]
+
+def backfill_pipelines(since: Optional[datetime] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Collection -> aggregation that copies its captured payments into
+    revenue_events. Report orders and subscriptions are only on disk with
+    STATE_BACKEND=mongo (``state_*`` collections); the other backends have
+    nothing to backfill from.
+    """
+    return {
+        "donations": _event_pipeline(
+            "donations",
+            {"status": "completed", "razorpay_payment_id": {"$type": "string"}},
+            "$razorpay_payment_id", "$amount", {"$literal": "donation"}, "$completed_at", since,
+        ),
+        "user_subscriptions": _event_pipeline(
+            "subscriptions",
+            {"razorpay_payment_id": {"$type": "string"}},
+            "$razorpay_payment_id", "$amount_paid", "$tier_id", "$start_date", since,
+        ),
+        "state_report_orders": _event_pipeline(
+            "reports",
+            {"paymentStatus": {"$in": ["completed", "captured"]}, "razorpayPaymentId": {"$type": "string"}},
+            "$razorpayPaymentId", "$customerInfo.amount", "$customerInfo.reportType",
+            _iso_string_date({"$ifNull": ["$confirmedAt", "$capturedAt"]}), since,
+        ),
+        "state_subscriptions": _event_pipeline(
+            "subscriptions",
+            {"paymentStatus": "completed", "razorpayPaymentId": {"$type": "string"}},
+            "$razorpayPaymentId", "$planDetails.amount", "$planDetails.id",
+            _iso_string_date("$activatedAt"), since,
+        ),
+    }
+
+def rollup_pipeline(since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Regroup revenue_events into daily buckets, replacing the buckets it covers."""
+    match = {"day": {"$gte": day_bucket(since)}} if since else {}
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {"$concat": [
+                {"$dateToString": {"format": "%Y-%m-%d", "date": "$day"}}, "|", "$source", "|", "$plan"
+            ]},
+            "day": {"$first": "$day"},
+            "source": {"$first": "$source"},
+            "plan": {"$first": "$plan"},
+            "amount": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+        }},
+        {"$merge": {"into": "revenue_rollups", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+async def backfill(db, since: Optional[datetime] = None, progress=None) -> Dict[str, Any]:
+    """
+    Copy payment history into revenue_events, then rebuild the affected
+    buckets. Both steps run server-side (``$merge``), so no payment document
+    is pulled into this process.
+    """
+    report: Dict[str, Any] = {"events_before": await db.revenue_events.count_documents({}), "sources": {}}
+    for collection, pipeline in backfill_pipelines(since).items():
+        before = await db.revenue_events.count_documents({})
+        await db[collection].aggregate(pipeline).to_list(None)
+        added = await db.revenue_events.count_documents({}) - before
+        report["sources"][collection] = added
+        if progress:
+            progress(collection, added)
+
+    await db.revenue_events.aggregate(rollup_pipeline(since)).to_list(None)
+    report["events_after"] = await db.revenue_events.count_documents({})
+    report["buckets"] = await db.revenue_rollups.count_documents(
+        {"day": {"$gte": day_bucket(since)}} if since else {}
+    )
+    return report
+
+def period_key(day: datetime, granularity: str) -> str:
+    if granularity == "week":
+        # Weeks start on Monday and are keyed by that date
+        return (day - timedelta(days=day.weekday())).strftime("%Y-%m-%d")
+    if granularity == "month":
+        return day.strftime("%Y-%m")
+    return day.strftime("%Y-%m-%d")
+
+def _add(totals: Dict[str, Any], amount: float, count: int):
+    totals["amount"] += amount
+    totals["count"] += count
+
+def summarize(buckets: Iterable[Dict[str, Any]], granularity: str) -> Dict[str, Any]:
+    """Fold daily buckets into periods, with per-source and per-plan breakdowns."""
+    periods: Dict[str, Dict[str, Any]] = {}
+    totals = {"amount": 0, "count": 0}
+    by_source: Dict[str, Dict[str, Any]] = {}
+
+    for bucket in buckets:
+        amount, count = bucket["amount"], bucket["count"]
+        source, plan = bucket["source"], bucket["plan"]
+        key = period_key(bucket["day"], granularity)
+
+        period = periods.setdefault(key, {"period": key, "amount": 0, "count": 0, "sources": {}})
+        _add(period, amount, count)
+        period_source = period["sources"].setdefault(source, {"amount": 0, "count": 0, "plans": {}})
+        _add(period_source, amount, count)
+        _add(period_source["plans"].setdefault(plan, {"amount": 0, "count": 0}), amount, count)
+
+        _add(totals, amount, count)
+        _add(by_source.setdefault(source, {"amount": 0, "count": 0}), amount, count)
+
+    return {
+        "totals": totals,
+        "by_source": by_source,
+        "periods": [periods[key] for key in sorted(periods)],
+    }
+
+async def revenue_summary(
+    db,
+    start: date,
+    end: date,
+    granularity: str = "day",
+    source: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Revenue between start and end (both inclusive, UTC days) from the rollups."""
+    query: Dict[str, Any] = {
+        "day": {"$gte": datetime.combine(start, time.min), "$lt": datetime.combine(end + timedelta(days=1), time.min)}
+    }
+    if source:
+        query["source"] = source
+    buckets: List[Dict[str, Any]] = await db.revenue_rollups.find(
+        query, {"_id": 0, "day": 1, "source": 1, "plan": 1, "amount": 1, "count": 1}
+    ).to_list(None)
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "granularity": granularity,
+        "source": source,
+        **summarize(buckets, granularity),
+    }
@@ -0,0 +1,102 @@
+"""
+Fast JSON responses for documents straight out of MongoDB
+
+FastJSONResponse encodes ``ObjectId``, ``datetime`` and ``Decimal`` natively
+(orjson when installed, the stdlib json module otherwise). Returning it
+from a handler skips FastAPI's ``jsonable_encoder`` pass entirely, so raw
+Mongo documents need no per-field conversion.
+
+For typed payloads, ResponseSerializer compiles a pydantic TypeAdapter once
+per response type and renders it with pydantic-core:
+
+    history_response = ResponseSerializer(List[SubscriptionRecord])
+    return history_response.response(await cursor.to_list(100))
+
+Bodies rendered ahead of time are sent with their ETag by cached_response,
+which answers a matching If-None-Match with 304.
+"""
+import datetime
+import decimal
+import hashlib
+import json
+import logging
+from typing import Annotated, Any, Dict, Optional
+
+from bson import Decimal128, ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BeforeValidator, TypeAdapter
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+def _decimal_value(value: decimal.Decimal):
+    # Same rule as jsonable_encoder: integral decimals become ints
+    return int(value) if value.as_tuple().exponent >= 0 else float(value)
+
+def json_default(obj: Any):
+    """Encoder for the BSON/Python types neither orjson nor pydantic handle."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return _decimal_value(obj.to_decimal())
+    if isinstance(obj, decimal.Decimal):
+        return _decimal_value(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(content: Any) -> bytes:
+        return orjson.dumps(content, default=json_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(content: Any) -> bytes:
+        return json.dumps(
+            content, default=json_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that encodes Mongo documents as-is."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+# String id for response models; accepts the ObjectId from the raw document
+MongoId = Annotated[str, BeforeValidator(lambda value: str(value) if isinstance(value, ObjectId) else value)]
+
+class ResponseSerializer:
+    """Validate-and-dump of one response type, with the schema compiled once."""
+
+    def __init__(self, response_type: Any):
+        self.adapter = TypeAdapter(response_type)
+
+    def dump(self, content: Any) -> bytes:
+        value = self.adapter.validate_python(content)
+        return self.adapter.dump_json(value, by_alias=True, fallback=json_default)
+
+    def response(self, content: Any, status_code: int = 200, background: BackgroundTask = None) -> Response:
+        return Response(self.dump(content), status_code=status_code, media_type="application/json", background=background)
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))
+
+def cached_response(body: bytes, etag: str, if_none_match: Optional[str], cache_control: str = "no-cache") -> Response:
+    """A pre-rendered JSON body with its ETag, or 304 when the client already has it."""
+    headers: Dict[str, str] = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,254 @@
+"""
+Bulk import and export of the waitlist and newsletter lists
+
+Imports read a JSONL or CSV upload line by line and write it with
+``insert_many(ordered=False)`` in batches. The unique email indexes turn a
+lead that is already on the list into a counted duplicate rather than an
+error, and the rest of the batch is still written, so an import is refused
+while this process could not confirm the list's unique index at startup.
+Imported signups get no confirmation email.
+
+Exports stream rows from a Mongo cursor, so neither direction holds more
+than one batch of a list in memory. Imports log their progress after every
+batch and return the full report; exports announce their row count in
+X-Total-Count so a client can show how far the download has got.
+"""
+import csv
+import io
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import BulkWriteError
+
+from models import Newsletter, Waitlist
+from services.lifecycle import health_state
+from services.uploads import iter_rows, iter_upload_lines
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_REJECTIONS = 100
+DUPLICATE_KEY = 11000
+# Rows per chunk written to an export response
+EXPORT_CHUNK_ROWS = 500
+
+def _text(row: Dict[str, Any], *names: str) -> Optional[str]:
+    for name in names:
+        value = row.get(name)
+        if value not in (None, ""):
+            return str(value).strip()
+    return None
+
+def _flag(value: Any, default: bool) -> bool:
+    # Missing or blank (an empty CSV cell) means the default
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() not in ("false", "0", "no")
+    return bool(value)
+
+def _waitlist_entry(row: Dict[str, Any]) -> BaseModel:
+    return Waitlist(
+        first_name=_text(row, "first_name", "firstName"),
+        mobile=_text(row, "mobile", "phone"),
+        email=_text(row, "email"),
+        pincode=_text(row, "pincode")
+    )
+
+def _newsletter_entry(row: Dict[str, Any]) -> BaseModel:
+    return Newsletter(email=_text(row, "email"), active=_flag(row.get("active"), default=True))
+
+class SignupList(NamedTuple):
+    collection: str
+    # Input row -> model, raising ValidationError for a bad row
+    parse: Callable[[Dict[str, Any]], BaseModel]
+    # Exported fields, in column order
+    fields: Tuple[str, ...]
+
+SIGNUP_LISTS = {
+    "waitlist": SignupList("waitlist", _waitlist_entry, ("email", "first_name", "mobile", "pincode", "joined_at")),
+    "newsletter": SignupList("newsletter_subscribers", _newsletter_entry, ("email", "active", "subscribed_at")),
+}
+
+class SignupImportReport:
+    """Running totals for an import, serialisable for progress logs and the admin endpoints."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.processed = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.rejected_rows: List[Dict[str, Any]] = []
+
+    def reject(self, row_number: int, reason: str):
+        self.rejected += 1
+        if len(self.rejected_rows) < MAX_REPORTED_REJECTIONS:
+            self.rejected_rows.append({"row": row_number, "reason": reason})
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "processed": self.processed,
+            "imported": self.imported,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "rejected_rows": self.rejected_rows,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.processed / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+def _row_error(e: ValidationError) -> str:
+    error = e.errors()[0]
+    field = ".".join(str(part) for part in error.get("loc", ())) or "row"
+    return f"Invalid {field}: {error.get('msg', 'invalid value')}"
+
+async def _insert_batch(db, signup_list: SignupList, batch: List[Tuple[int, Dict[str, Any]]], report: SignupImportReport):
+    try:
+        result = await db[signup_list.collection].insert_many([doc for _, doc in batch], ordered=False)
+        report.imported += len(result.inserted_ids)
+    except BulkWriteError as e:
+        report.imported += e.details.get("nInserted", 0)
+        for error in e.details.get("writeErrors", []):
+            if error.get("code") == DUPLICATE_KEY:
+                report.duplicates += 1
+            else:
+                report.reject(batch[error["index"]][0], f"Insert failed: {error.get('errmsg', 'unknown error')}")
+
+async def import_signups(
+    db,
+    list_name: str,
+    rows: AsyncIterator[Dict[str, Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Stream rows into a signup list; ``progress`` gets the running report
+    after every batch.
+
+    Waitlist rows need ``email``, ``first_name`` (or ``firstName``) and
+    ``mobile``; newsletter rows need ``email`` and may set ``active``.
+    """
+    signup_list = SIGNUP_LISTS[list_name]
+    report = SignupImportReport()
+    batch = []
+
+    async for row in rows:
+        report.processed += 1
+        if "_raw" in row:
+            report.reject(report.processed, "Malformed row")
+            continue
+        try:
+            entry = signup_list.parse(row)
+        except ValidationError as e:
+            report.reject(report.processed, _row_error(e))
+            continue
+        batch.append((report.processed, entry.dict(by_alias=True, exclude={"id"})))
+
+        if len(batch) >= batch_size:
+            await _insert_batch(db, signup_list, batch, report)
+            batch = []
+            if progress:
+                progress(report.as_dict())
+
+    if batch:
+        await _insert_batch(db, signup_list, batch, report)
+
+    summary = report.as_dict()
+    logger.info(
+        f"{list_name} import finished: {summary['imported']} imported, {summary['duplicates']} duplicates, "
+        f"{summary['rejected']} rejected ({summary['rows_per_second']} rows/s)"
+    )
+    return summary
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+async def export_signups(
+    db,
+    list_name: str,
+    file_format: str,
+    query: Optional[Dict[str, Any]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> AsyncIterator[str]:
+    """CSV (with a header row) or JSONL of a signup list in _id (signup) order, in chunks."""
+    signup_list = SIGNUP_LISTS[list_name]
+    fields = signup_list.fields
+    cursor = db[signup_list.collection].find(
+        query or {}, {"_id": 0, **{field: 1 for field in fields}}
+    ).sort("_id", 1).batch_size(batch_size)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if file_format == "csv" else None
+    if writer:
+        writer.writerow(fields)
+    exported = 0
+    try:
+        async for doc in cursor:
+            values = [_cell(doc.get(field)) for field in fields]
+            if writer:
+                writer.writerow(["" if value is None else value for value in values])
+            else:
+                buffer.write(json.dumps(dict(zip(fields, values))) + "\n")
+            exported += 1
+            if exported % EXPORT_CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+        logger.info(f"{list_name} export finished: {exported} rows")
+    finally:
+        await cursor.close()
+
+MEDIA_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+def _check_format(file_format: str):
+    if file_format not in MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format must be jsonl or csv"
+        )
+
+async def import_upload(db, list_name: str, file: UploadFile, file_format: Optional[str], batch_size: int) -> Dict[str, Any]:
+    """Import an admin upload, logging progress after every batch."""
+    file_format = file_format or ("csv" if (file.filename or "").endswith(".csv") else "jsonl")
+    _check_format(file_format)
+    # Duplicates are only caught by the unique email index
+    if not health_state.index_ready(SIGNUP_LISTS[list_name].collection):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The unique email index is missing, run dedupe_signups.py and restart before importing"
+        )
+
+    def log_progress(report: Dict[str, Any]):
+        logger.info(
+            f"{list_name} import: {report['processed']} rows, {report['imported']} imported, "
+            f"{report['duplicates']} duplicates, {report['rejected']} rejected"
+        )
+
+    return await import_signups(
+        db,
+        list_name,
+        iter_rows(iter_upload_lines(file), file_format),
+        batch_size=max(1, min(batch_size, 10000)),
+        progress=log_progress
+    )
+
+async def export_response(db, list_name: str, file_format: str, query: Optional[Dict[str, Any]] = None) -> StreamingResponse:
+    """Stream a signup list as a download; X-Total-Count is the number of rows to expect."""
+    _check_format(file_format)
+    total = await db[SIGNUP_LISTS[list_name].collection].count_documents(query or {})
+    filename = f"{list_name}-{datetime.utcnow():%Y-%m-%d}.{file_format}"
+    return StreamingResponse(
+        export_signups(db, list_name, file_format, query),
+        media_type=MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Total-Count": str(total)}
+    )
@@ -0,0 +1,269 @@
+"""
+Key/value stores for request state that has to be shared by every worker
+
+Report orders, membership subscriptions and the Razorpay plan cache used to
+live in module-level dicts, which only works with a single worker process.
+They now go through a StateStore whose backend is chosen at startup:
+
+    STATE_BACKEND   memory (default, single worker only) | mongo | redis
+    REDIS_URL       used by the redis backend (default redis://localhost:6379/0)
+    APP_WORKERS     worker count, when it cannot be read from the command line
+                    or WEB_CONCURRENCY
+
+With more than one worker the app refuses to start while any store is
+process-local (see check_worker_safety). In-process caches that tolerate
+several workers (entitlements, the tier catalog, the donation ledger, memory
+rate limits) declare with register_local_cache how far a worker's copy can
+drift from the others, and that bound is logged at startup.
+"""
+import json
+import logging
+import os
+import re
+import shlex
+import sys
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+class StateStore(ABC):
+    """Interface: string keys mapping to JSON-compatible dicts."""
+
+    backend = "abstract"
+    process_local = False
+
+    def __init__(self, namespace: str, lookup_fields: Tuple[str, ...] = ()):
+        self.namespace = namespace
+        self.lookup_fields = lookup_fields
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    async def update(self, key: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Merge fields into an existing value; returns the new value or None if missing."""
+
+    @abstractmethod
+    async def find_by(self, field: str, value: Any) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(key, value) of the first entry whose field equals value; field must be a lookup field."""
+
+    async def prepare(self):
+        """Create indexes / check connectivity; called once at startup."""
+
+class MemoryStateStore(StateStore):
+    """Process-local dict; values are copied so callers cannot mutate the store by accident."""
+
+    backend = "memory"
+    process_local = True
+
+    def __init__(self, namespace: str, lookup_fields: Tuple[str, ...] = ()):
+        super().__init__(namespace, lookup_fields)
+        self._data: Dict[str, Dict[str, Any]] = {}
+
+    async def get(self, key):
+        value = self._data.get(key)
+        return dict(value) if value is not None else None
+
+    async def set(self, key, value):
+        self._data[key] = dict(value)
+
+    async def update(self, key, fields):
+        value = self._data.get(key)
+        if value is None:
+            return None
+        value.update(fields)
+        return dict(value)
+
+    async def find_by(self, field, value):
+        for key, item in self._data.items():
+            if item.get(field) == value:
+                return key, dict(item)
+        return None
+
+class MongoStateStore(StateStore):
+    """One document per key in the ``state_<namespace>`` collection of the app database."""
+
+    backend = "mongo"
+
+    @property
+    def collection(self):
+        from server import db
+        return db[f"state_{self.namespace}"]
+
+    async def get(self, key):
+        return await self.collection.find_one({"_id": key}, {"_id": 0})
+
+    async def set(self, key, value):
+        await self.collection.replace_one({"_id": key}, {"_id": key, **value}, upsert=True)
+
+    async def update(self, key, fields):
+        return await self.collection.find_one_and_update(
+            {"_id": key},
+            {"$set": fields},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def find_by(self, field, value):
+        doc = await self.collection.find_one({field: value})
+        if doc is None:
+            return None
+        return doc.pop("_id"), doc
+
+    async def prepare(self):
+        for field in self.lookup_fields:
+            await self.collection.create_index(field)
+
+_redis_client = None
+
+def redis_client(feature: str = "REDIS_URL"):
+    """Shared redis.asyncio client for REDIS_URL; ``feature`` names the setting that needs it in errors."""
+    global _redis_client
+    if _redis_client is None:
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError:
+            raise RuntimeError(f"{feature} requires the redis package (pip install redis)")
+        _redis_client = redis_asyncio.from_url(
+            os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True
+        )
+    return _redis_client
+
+class RedisStateStore(StateStore):
+    """
+    JSON values under ``choosepure:<namespace>:<key>``; lookup fields keep a
+    secondary key pointing back to the primary one. Requires the optional
+    ``redis`` package.
+    """
+
+    backend = "redis"
+
+    def _redis(self):
+        return redis_client("STATE_BACKEND=redis")
+
+    def _key(self, key: str) -> str:
+        return f"choosepure:{self.namespace}:{key}"
+
+    def _lookup_key(self, field: str, value: Any) -> str:
+        return f"choosepure:{self.namespace}:by:{field}:{value}"
+
+    async def get(self, key):
+        raw = await self._redis().get(self._key(key))
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key, value):
+        pipe = self._redis().pipeline(transaction=True)
+        pipe.set(self._key(key), json.dumps(value, default=str))
+        for field in self.lookup_fields:
+            if value.get(field) is not None:
+                pipe.set(self._lookup_key(field, value[field]), key)
+        await pipe.execute()
+
+    async def update(self, key, fields):
+        from redis.exceptions import WatchError
+
+        redis_key = self._key(key)
+        async with self._redis().pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(redis_key)
+                    raw = await pipe.get(redis_key)
+                    if raw is None:
+                        await pipe.unwatch()
+                        return None
+                    value = {**json.loads(raw), **fields}
+                    pipe.multi()
+                    pipe.set(redis_key, json.dumps(value, default=str))
+                    for field in self.lookup_fields:
+                        if fields.get(field) is not None:
+                            pipe.set(self._lookup_key(field, fields[field]), key)
+                    await pipe.execute()
+                    return value
+                except WatchError:
+                    continue
+
+    async def find_by(self, field, value):
+        key = await self._redis().get(self._lookup_key(field, value))
+        if key is None:
+            return None
+        item = await self.get(key)
+        return (key, item) if item is not None else None
+
+    async def prepare(self):
+        await self._redis().ping()
+
+BACKENDS = {
+    "memory": MemoryStateStore,
+    "mongo": MongoStateStore,
+    "redis": RedisStateStore,
+}
+
+# Every store created through create_store, for the startup checks
+STORES: List[StateStore] = []
+# In-process caches outside the stores: name -> how far one worker's copy can lag or diverge
+LOCAL_CACHES: Dict[str, str] = {}
+
+def register_local_cache(name: str, staleness: str):
+    """Declare per-process state that is safe with several workers, and its cross-worker bound."""
+    LOCAL_CACHES[name] = staleness
+
+def create_store(namespace: str, lookup_fields: Tuple[str, ...] = ()) -> StateStore:
+    backend = os.getenv("STATE_BACKEND", "memory").lower()
+    if backend not in BACKENDS:
+        raise RuntimeError(f"Unknown STATE_BACKEND '{backend}', expected one of: {', '.join(BACKENDS)}")
+    store = BACKENDS[backend](namespace, lookup_fields)
+    STORES.append(store)
+    return store
+
+def _workers_from_args(args: List[str]) -> Optional[int]:
+    for index, arg in enumerate(args):
+        match = re.fullmatch(r"(?:--workers|-w)(?:=(\d+))?", arg)
+        if match is None:
+            continue
+        value = match.group(1) or (args[index + 1] if index + 1 < len(args) else "")
+        if value.isdigit():
+            return int(value)
+    return None
+
+def detect_worker_count() -> int:
+    """
+    Worker processes serving the app, from (in order) APP_WORKERS, the
+    uvicorn/gunicorn command line (spawned uvicorn workers inherit the
+    parent's argv), GUNICORN_CMD_ARGS and WEB_CONCURRENCY; 1 if unknown.
+    """
+    if os.getenv("APP_WORKERS", "").isdigit():
+        return int(os.environ["APP_WORKERS"])
+    workers = _workers_from_args(sys.argv)
+    if workers is None:
+        workers = _workers_from_args(shlex.split(os.getenv("GUNICORN_CMD_ARGS", "")))
+    if workers is None and os.getenv("WEB_CONCURRENCY", "").isdigit():
+        workers = int(os.environ["WEB_CONCURRENCY"])
+    return workers or 1
+
+def check_worker_safety(workers: int):
+    """
+    Refuse to run several workers on top of process-local stores, and log
+    how stale each registered in-process cache can get across them.
+    """
+    local = [store.namespace for store in STORES if store.process_local]
+    if workers > 1 and local:
+        raise RuntimeError(
+            f"{workers} workers configured but these stores are process-local: {', '.join(local)}. "
+            f"Set STATE_BACKEND=mongo or STATE_BACKEND=redis, or run a single worker."
+        )
+    if workers > 1:
+        for name, staleness in LOCAL_CACHES.items():
+            logger.warning(f"{workers} workers: {name} is kept per worker, {staleness}")
+
+async def prepare_stores(db=None):
+    """Startup warmup: create lookup indexes or check Redis connectivity."""
+    for store in STORES:
+        await store.prepare()
@@ -0,0 +1,291 @@
+"""
+Periodic maintenance of user_subscriptions: expiry, abandoned orders and
+renewal reminders
+
+Each sweep, in batches of SUBSCRIPTION_SWEEP_BATCH_SIZE:
+    - active subscriptions past their end_date become "expired"
+    - pending orders (create-order without a verified payment) older than
+      PENDING_ORDER_TTL_HOURS become "abandoned"
+    - active subscriptions ending within RENEWAL_REMINDER_DAYS are claimed
+      and a reminder email is queued for each
+
+The claim is a conditional update_many tagged with the sweep's id and time
+(renewal_reminder_sweep / renewal_reminder_claimed_at), so with several
+workers every reminder is still sent once. It is a lease: renewal_reminder_sent_at
+is only set once the email went out. A reminder dropped from a full queue,
+failed (up to MAX_REMINDER_ATTEMPTS times) or still queued at shutdown is
+released for the next sweep, and the claim of a worker that died expires
+after REMINDER_LEASE. A subscription whose user is gone or has no email is
+marked sent with a renewal_reminder_skipped reason, so it leaves the sweep
+for good. Emails go through an in-process queue drained by a
+background sender, never by the sweep itself.
+
+Configured through environment variables:
+    SUBSCRIPTION_SWEEP_INTERVAL_SECONDS  time between sweeps, 0 disables (default 300)
+    SUBSCRIPTION_SWEEP_BATCH_SIZE        documents per update_many (default 500)
+    PENDING_ORDER_TTL_HOURS              age at which pending orders are abandoned (default 24)
+    RENEWAL_REMINDER_DAYS                reminder lead time, 0 disables (default 3)
+    RENEWAL_REMINDER_QUEUE_SIZE          reminders waiting to be sent (default 1000)
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from email_service import email_service
+from services.dataloader import find_by_ids
+from services.entitlements import entitlements
+from services.tier_catalog import tier_catalog
+
+logger = logging.getLogger(__name__)
+
+REMINDER_LEASE = timedelta(hours=1)
+MAX_REMINDER_ATTEMPTS = 3
+
+class SubscriptionSweeper:
+    def __init__(self):
+        self.interval = float(os.getenv("SUBSCRIPTION_SWEEP_INTERVAL_SECONDS", "300"))
+        self.batch_size = int(os.getenv("SUBSCRIPTION_SWEEP_BATCH_SIZE", "500"))
+        self.pending_ttl = timedelta(hours=float(os.getenv("PENDING_ORDER_TTL_HOURS", "24")))
+        self.reminder_lead = timedelta(days=float(os.getenv("RENEWAL_REMINDER_DAYS", "3")))
+        self.reminders: asyncio.Queue = asyncio.Queue(maxsize=int(os.getenv("RENEWAL_REMINDER_QUEUE_SIZE", "1000")))
+        self.counters: Counter = Counter()
+        self.last_sweep: Dict[str, Any] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._db = None
+
+    async def _update_in_batches(self, db, query: Dict[str, Any], changes: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Apply ``$set: changes`` to every match, batch_size ids per update_many.
+        Returns the (_id, user_id) of the documents in the updated batches and
+        how many of them this call modified.
+        """
+        matched, modified = [], 0
+        while True:
+            batch = await db.user_subscriptions.find(query, {"user_id": 1}).limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                return matched, modified
+            # Re-checked by the update: another worker may have got there first
+            result = await db.user_subscriptions.update_many(
+                {"_id": {"$in": [doc["_id"] for doc in batch]}, **query}, {"$set": changes}
+            )
+            matched += batch
+            modified += result.modified_count
+            if result.modified_count == 0 or len(batch) < self.batch_size:
+                return matched, modified
+
+    async def expire_lapsed(self, db, now: datetime) -> int:
+        expired, modified = await self._update_in_batches(
+            db,
+            {"status": "active", "end_date": {"$lte": now}},
+            {"status": "expired", "expired_at": now}
+        )
+        for doc in expired:
+            entitlements.invalidate(doc["user_id"])
+        return modified
+
+    async def abandon_pending(self, db, now: datetime) -> int:
+        _, modified = await self._update_in_batches(
+            db,
+            {"status": "pending", "created_at": {"$lt": now - self.pending_ttl}},
+            {"status": "abandoned", "abandoned_at": now}
+        )
+        return modified
+
+    async def queue_reminders(self, db, now: datetime) -> int:
+        if self.reminder_lead <= timedelta(0):
+            return 0
+        sweep_id = uuid.uuid4().hex
+        batches, modified = await self._update_in_batches(
+            db,
+            {
+                "status": "active",
+                "end_date": {"$gt": now, "$lte": now + self.reminder_lead},
+                "renewal_reminder_sent_at": {"$exists": False},
+                "renewal_reminder_attempts": {"$not": {"$gte": MAX_REMINDER_ATTEMPTS}},
+                "$or": [
+                    {"renewal_reminder_claimed_at": {"$exists": False}},
+                    {"renewal_reminder_claimed_at": {"$lt": now - REMINDER_LEASE}}
+                ]
+            },
+            {"renewal_reminder_claimed_at": now, "renewal_reminder_sweep": sweep_id}
+        )
+        if not modified:
+            return 0
+        # Only the documents this sweep's update claimed, not another worker's
+        claimed = await db.user_subscriptions.find(
+            {"_id": {"$in": [doc["_id"] for doc in batches]}, "renewal_reminder_sweep": sweep_id},
+            {"user_id": 1, "tier_id": 1, "end_date": 1}
+        ).to_list(None)
+        if not claimed:
+            return 0
+
+        users = await find_by_ids(db.users, (doc["user_id"] for doc in claimed), {"email": 1, "name": 1})
+        await tier_catalog.refresh(db)
+        queued = 0
+        skipped: Dict[str, List[Any]] = {}
+        for doc in claimed:
+            user = users.get(str(doc["user_id"]))
+            if user is None or not user.get("email"):
+                skipped.setdefault("user not found" if user is None else "no email", []).append(doc["_id"])
+                continue
+            reminder = {
+                "subscription_id": doc["_id"],
+                "sweep": sweep_id,
+                "email": user["email"],
+                "name": user.get("name") or "there",
+                "plan": tier_catalog.tiers.get(str(doc["tier_id"]), {}).get("name", "ChoosePure"),
+                "end_date": doc["end_date"].strftime("%Y-%m-%d")
+            }
+            try:
+                self.reminders.put_nowait(reminder)
+                queued += 1
+            except asyncio.QueueFull:
+                self.counters["reminders_dropped"] += 1
+                logger.warning(f"Renewal reminder queue full, reminder to {user['email']} left for the next sweep")
+                await self._release(db, reminder, failed=False)
+        for reason, ids in skipped.items():
+            await self._skip(db, ids, sweep_id, reason)
+        return queued
+
+    async def _skip(self, db, subscription_ids: List[Any], sweep_id: str, reason: str):
+        """Close claimed reminders that can never be sent; they count as sent."""
+        await db.user_subscriptions.update_many(
+            {"_id": {"$in": subscription_ids}, "renewal_reminder_sweep": sweep_id},
+            {
+                "$set": {"renewal_reminder_sent_at": datetime.utcnow(), "renewal_reminder_skipped": reason},
+                "$unset": {"renewal_reminder_claimed_at": ""}
+            }
+        )
+        self.counters["reminders_skipped"] += len(subscription_ids)
+        logger.warning(f"Skipped {len(subscription_ids)} renewal reminders: {reason}")
+
+    async def _mark_sent(self, db, reminder: Dict[str, Any]):
+        await db.user_subscriptions.update_one(
+            {"_id": reminder["subscription_id"], "renewal_reminder_sweep": reminder["sweep"]},
+            {"$set": {"renewal_reminder_sent_at": datetime.utcnow()}, "$unset": {"renewal_reminder_claimed_at": ""}}
+        )
+
+    async def _release(self, db, reminder: Dict[str, Any], failed: bool):
+        """Give the claim back so a later sweep queues the reminder again."""
+        update: Dict[str, Any] = {"$unset": {"renewal_reminder_claimed_at": "", "renewal_reminder_sweep": ""}}
+        if failed:
+            update["$inc"] = {"renewal_reminder_attempts": 1}
+        try:
+            await db.user_subscriptions.update_one(
+                {"_id": reminder["subscription_id"], "renewal_reminder_sweep": reminder["sweep"]}, update
+            )
+        except Exception as e:
+            logger.error(f"Failed to release renewal reminder claim for {reminder['email']}: {str(e)}")
+
+    async def sweep(self, db) -> Dict[str, Any]:
+        """One pass of every maintenance step; also usable on demand."""
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        result = {
+            "expired": await self.expire_lapsed(db, now),
+            "abandoned": await self.abandon_pending(db, now),
+            "reminders_queued": await self.queue_reminders(db, now),
+        }
+        result["duration_seconds"] = round(time.perf_counter() - started, 3)
+        result["finished_at"] = datetime.utcnow().isoformat()
+
+        self.counters["sweeps"] += 1
+        self.counters["expired"] += result["expired"]
+        self.counters["abandoned"] += result["abandoned"]
+        self.counters["reminders_queued"] += result["reminders_queued"]
+        self.last_sweep = result
+        if result["expired"] or result["abandoned"] or result["reminders_queued"]:
+            logger.info(
+                f"Subscription sweep: {result['expired']} expired, {result['abandoned']} abandoned, "
+                f"{result['reminders_queued']} reminders queued in {result['duration_seconds']}s"
+            )
+        return result
+
+    async def _sweep_forever(self, db):
+        while True:
+            try:
+                await self.sweep(db)
+            except Exception as e:
+                self.counters["sweep_errors"] += 1
+                logger.error(f"Subscription sweep failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def _send_reminders(self, db):
+        while True:
+            reminder = await self.reminders.get()
+            try:
+                try:
+                    result = await email_service.send_renewal_reminder_email(
+                        reminder["email"], reminder["name"], reminder["plan"], reminder["end_date"]
+                    )
+                    sent = bool(result.get("success"))
+                    if not sent:
+                        logger.error(f"Failed to send renewal reminder to {reminder['email']}: {result.get('message')}")
+                except Exception as e:
+                    sent = False
+                    logger.error(f"Failed to send renewal reminder to {reminder['email']}: {str(e)}")
+                self.counters["reminders_sent" if sent else "reminders_failed"] += 1
+                if sent:
+                    await self._mark_sent(db, reminder)
+                else:
+                    await self._release(db, reminder, failed=True)
+            except Exception as e:
+                logger.error(f"Failed to record renewal reminder to {reminder['email']}: {str(e)}")
+            finally:
+                self.reminders.task_done()
+
+    def start(self, db):
+        if self.interval > 0 and not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._sweep_forever(db)),
+                asyncio.create_task(self._send_reminders(db)),
+            ]
+            self._db = db
+            logger.info(f"Subscription sweeper on: every {self.interval:.0f}s, batches of {self.batch_size}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        # Not sent by this process: released for the next sweep on any worker
+        while self._db is not None and not self.reminders.empty():
+            await self._release(self._db, self.reminders.get_nowait(), failed=False)
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP subscription_sweeps_total Subscription maintenance sweeps run",
+            "# TYPE subscription_sweeps_total counter",
+            f"subscription_sweeps_total {self.counters['sweeps']}",
+            "# HELP subscription_sweep_errors_total Sweeps that failed",
+            "# TYPE subscription_sweep_errors_total counter",
+            f"subscription_sweep_errors_total {self.counters['sweep_errors']}",
+            "# HELP subscription_sweep_duration_seconds Duration of the last sweep",
+            "# TYPE subscription_sweep_duration_seconds gauge",
+            f"subscription_sweep_duration_seconds {self.last_sweep.get('duration_seconds', 0)}",
+            "# HELP subscriptions_swept_total Subscriptions moved by the sweeper, by new status",
+            "# TYPE subscriptions_swept_total counter",
+            f'subscriptions_swept_total{{status="expired"}} {self.counters["expired"]}',
+            f'subscriptions_swept_total{{status="abandoned"}} {self.counters["abandoned"]}',
+            "# HELP renewal_reminders_total Renewal reminder emails by outcome",
+            "# TYPE renewal_reminders_total counter",
+        ]
+        for outcome in ("queued", "sent", "failed", "dropped", "skipped"):
+            lines.append(f'renewal_reminders_total{{outcome="{outcome}"}} {self.counters["reminders_" + outcome]}')
+        lines += [
+            "# HELP renewal_reminder_queue_depth Reminders waiting to be sent",
+            "# TYPE renewal_reminder_queue_depth gauge",
+            f"renewal_reminder_queue_depth {self.reminders.qsize()}",
+        ]
+        return "\n".join(lines) + "\n"
+
+subscription_sweeper = SubscriptionSweeper()
@@ -0,0 +1,100 @@
+"""
+Subscription tiers held in memory, with the pricing page response pre-rendered
+
+The catalog is loaded at startup (registry warmup) and written through by
+the admin tier endpoints, so the pricing page and the payment path never
+query subscription_tiers:
+
+    tier = await tier_catalog.get(db, tier_id)     # dict hit
+    body, etag = await tier_catalog.listing(db)     # {"tiers": [...]} as bytes
+
+Tiers are kept in API form (``id`` string, no ``created_at``), inactive ones
+included so orders placed before a tier was withdrawn still verify. Workers
+that did not perform an admin write pick it up within
+TIER_CATALOG_TTL_SECONDS (default 300); an unknown tier id also triggers a
+reload, at most once every MISS_RELOAD_SECONDS.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from services.serialization import dumps, strong_etag
+from services.state_store import register_local_cache
+
+logger = logging.getLogger(__name__)
+
+MISS_RELOAD_SECONDS = 5
+
+def to_api_tier(doc: Dict[str, Any]) -> Dict[str, Any]:
+    tier = {key: value for key, value in doc.items() if key not in ("_id", "created_at")}
+    tier["id"] = str(doc["_id"])
+    return tier
+
+class TierCatalog:
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.tiers: Dict[str, Dict[str, Any]] = {}
+        self.body = b'{"tiers":[]}'
+        self.etag = ""
+        self.ready = False
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _rebuild(self):
+        active: List[Dict[str, Any]] = sorted(
+            (tier for tier in self.tiers.values() if tier.get("is_active") is True),
+            key=lambda tier: tier.get("price", 0)
+        )
+        self.body = dumps({"tiers": active})
+        self.etag = strong_etag(self.body)
+
+    async def _load(self, db):
+        docs = await db.subscription_tiers.find({}).to_list(None)
+        self.tiers = {str(doc["_id"]): to_api_tier(doc) for doc in docs}
+        self._rebuild()
+        self._loaded_at = time.monotonic()
+        self.ready = True
+
+    async def load(self, db):
+        async with self._lock:
+            await self._load(db)
+
+    def _stale(self) -> bool:
+        return not self.ready or time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    async def refresh(self, db):
+        """Reload if this process's copy is older than the TTL."""
+        if self._stale():
+            async with self._lock:
+                if self._stale():
+                    await self._load(db)
+
+    def put(self, doc: Dict[str, Any]):
+        """Write-through of a tier document just written by an admin endpoint."""
+        self.tiers[str(doc["_id"])] = to_api_tier(doc)
+        self._rebuild()
+
+    async def get(self, db, tier_id: str) -> Optional[Dict[str, Any]]:
+        """The tier in API form (treat as read-only), None if it does not exist."""
+        await self.refresh(db)
+        tier = self.tiers.get(tier_id)
+        if tier is None and ObjectId.is_valid(tier_id) and time.monotonic() - self._loaded_at > MISS_RELOAD_SECONDS:
+            # Possibly created through another worker since the last load
+            await self.load(db)
+            tier = self.tiers.get(tier_id)
+        return tier
+
+    async def listing(self, db) -> Tuple[bytes, str]:
+        """Pre-rendered ``{"tiers": [...]}`` of the active tiers by price, and its ETag."""
+        await self.refresh(db)
+        return self.body, self.etag
+
+tier_catalog = TierCatalog(ttl_seconds=float(os.getenv("TIER_CATALOG_TTL_SECONDS", "300")))
+register_local_cache(
+    "tier_catalog",
+    f"tier edits made on another worker show up within {tier_catalog.ttl_seconds:g}s (TIER_CATALOG_TTL_SECONDS)"
+)
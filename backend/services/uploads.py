@@ -0,0 +1,90 @@
+"""
+Line and row readers shared by the bulk imports (votes, waitlist, newsletter)
+
+Uploads and files are read line by line, so an import never holds the whole
+input in memory:
+
+    rows = iter_rows(iter_upload_lines(file), "csv")     # admin upload
+    rows = iter_rows(iter_lines(open(path)), "jsonl")    # CLI file
+"""
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, Iterable
+
+from fastapi import HTTPException, status
+
+# A CSV record whose quotes are still open after this many characters is malformed
+MAX_CSV_RECORD_CHARS = 64 * 1024
+
+async def iter_lines(lines: Iterable[str]) -> AsyncIterator[str]:
+    """Adapt a synchronous line iterable (e.g. an open file) for iter_rows."""
+    for line in lines:
+        yield line
+
+async def iter_upload_lines(upload, chunk_size: int = 64 * 1024) -> AsyncIterator[str]:
+    """
+    Stream lines out of a FastAPI UploadFile without reading it into memory;
+    an upload that is not UTF-8 is refused with 400.
+    """
+    # Incremental: a multibyte character may be split across two chunks
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            buffer += decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                yield line
+        buffer += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload is not UTF-8 encoded, save the file as UTF-8 and retry"
+        )
+    if buffer:
+        yield buffer
+
+async def iter_rows(lines: AsyncIterator[str], file_format: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Parse JSONL or CSV (with a header row) into dicts, one record at a time.
+    A quoted CSV field may span lines; a record whose quotes never close is
+    returned as ``{"_raw": ...}`` like a malformed JSONL line.
+    """
+    header = None
+    record = None
+    async for line in lines:
+        line = line.rstrip("\r\n")
+        if record is not None:
+            # Inside a quoted CSV field: the newline belongs to the value
+            line = record + "\n" + line
+            record = None
+        elif not line.strip():
+            continue
+
+        if file_format == "jsonl":
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                row = None
+            yield row if isinstance(row, dict) else {"_raw": line}
+            continue
+
+        # An odd number of quotes (escaped ones come in pairs) leaves a field open
+        if line.count('"') % 2:
+            if len(line) <= MAX_CSV_RECORD_CHARS:
+                record = line
+            elif header is not None:
+                yield {"_raw": line}
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        yield dict(zip(header, values))
+
+    if record is not None and header is not None:
+        yield {"_raw": record}
@@ -0,0 +1,186 @@
+"""
+Bulk import / replay of product votes into user_votes
+
+Rows come from services/uploads.py (a file for the CLI, an UploadFile for the
+admin endpoint).
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_REJECTIONS = 100
+
+def _parse_vote(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn an input row into a user_votes document, raising ValueError if invalid."""
+    if "_raw" in row:
+        raise ValueError("Malformed row")
+
+    user_id = str(row.get("user_id") or "").strip()
+    suggestion_id = str(row.get("product_suggestion_id") or "").strip()
+    if not user_id:
+        raise ValueError("Missing user_id")
+    if not ObjectId.is_valid(suggestion_id):
+        raise ValueError("Invalid product_suggestion_id")
+
+    voted_at = row.get("voted_at")
+    if isinstance(voted_at, str) and voted_at:
+        try:
+            voted_at = datetime.fromisoformat(voted_at.replace("Z", "+00:00")).replace(tzinfo=None)
+        except ValueError:
+            raise ValueError("Invalid voted_at")
+    elif not isinstance(voted_at, datetime):
+        voted_at = datetime.utcnow()
+
+    return {
+        "user_id": user_id,
+        "product_suggestion_id": suggestion_id,
+        "voted_at": voted_at,
+        "month_year": row.get("month_year") or voted_at.strftime("%Y-%m")
+    }
+
+class VoteImportReport:
+    """Running totals for an import, serialisable for the CLI and the admin endpoint."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.processed = 0
+        self.imported = 0
+        self.rejected = 0
+        self.rejected_rows: List[Dict[str, Any]] = []
+        self.suggestions_moved_to_testing = 0
+
+    def reject(self, row_number: int, reason: str):
+        self.rejected += 1
+        if len(self.rejected_rows) < MAX_REPORTED_REJECTIONS:
+            self.rejected_rows.append({"row": row_number, "reason": reason})
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "processed": self.processed,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "rejected_rows": self.rejected_rows,
+            "suggestions_moved_to_testing": self.suggestions_moved_to_testing,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.processed / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+async def _flush_batch(db, batch: List[Tuple[int, Dict[str, Any]]], report: VoteImportReport):
+    """Validate one batch against product_suggestions and write it."""
+    suggestion_ids = {ObjectId(vote["product_suggestion_id"]) for _, vote in batch}
+    suggestions = {
+        str(doc["_id"]): doc
+        async for doc in db.product_suggestions.find(
+            {"_id": {"$in": list(suggestion_ids)}},
+            {"status": 1, "voters": 1}
+        )
+    }
+
+    accepted = []
+    seen = set()
+    for row_number, vote in batch:
+        suggestion = suggestions.get(vote["product_suggestion_id"])
+        if not suggestion:
+            report.reject(row_number, "Product suggestion not found")
+            continue
+        if suggestion.get("status") != "voting":
+            report.reject(row_number, "Voting is closed for this product")
+            continue
+
+        key = (vote["user_id"], vote["product_suggestion_id"])
+        if key in seen or vote["user_id"] in suggestion.get("voters", []):
+            report.reject(row_number, "Duplicate vote")
+            continue
+
+        seen.add(key)
+        accepted.append((row_number, vote))
+
+    if not accepted:
+        return
+
+    failed = set()
+    try:
+        result = await db.user_votes.insert_many([vote for _, vote in accepted], ordered=False)
+        report.imported += len(result.inserted_ids)
+    except BulkWriteError as e:
+        report.imported += e.details.get("nInserted", 0)
+        for error in e.details.get("writeErrors", []):
+            failed.add(error["index"])
+            report.reject(accepted[error["index"]][0], f"Insert failed: {error.get('errmsg', 'unknown error')}")
+
+    new_voters: Dict[str, List[str]] = {}
+    for index, (_, vote) in enumerate(accepted):
+        if index not in failed:
+            new_voters.setdefault(vote["product_suggestion_id"], []).append(vote["user_id"])
+    if not new_voters:
+        return
+
+    # Counters first, then threshold transitions, in one ordered bulk_write
+    operations = [
+        UpdateOne(
+            {"_id": ObjectId(suggestion_id)},
+            {"$inc": {"votes": len(voters)}, "$push": {"voters": {"$each": voters}}}
+        )
+        for suggestion_id, voters in new_voters.items()
+    ]
+    operations += [
+        UpdateOne(
+            {
+                "_id": ObjectId(suggestion_id),
+                "status": "voting",
+                "$expr": {"$gte": ["$votes", "$vote_threshold"]}
+            },
+            {"$set": {"status": "testing"}}
+        )
+        for suggestion_id in new_voters
+    ]
+    result = await db.product_suggestions.bulk_write(operations, ordered=True)
+    report.suggestions_moved_to_testing += result.modified_count - len(new_voters)
+
+async def import_votes(
+    db,
+    rows: AsyncIterator[Dict[str, Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Stream vote rows into user_votes and update suggestion counters
+
+    Rows need ``user_id`` and ``product_suggestion_id``; ``voted_at`` and
+    ``month_year`` are optional. Monthly vote limits are not applied since
+    this replays votes that were already accepted once.
+    """
+    report = VoteImportReport()
+    batch = []
+
+    async for row in rows:
+        report.processed += 1
+        try:
+            batch.append((report.processed, _parse_vote(row)))
+        except ValueError as e:
+            report.reject(report.processed, str(e))
+
+        if len(batch) >= batch_size:
+            await _flush_batch(db, batch, report)
+            batch = []
+            if progress:
+                progress(report.as_dict())
+
+    if batch:
+        await _flush_batch(db, batch, report)
+
+    summary = report.as_dict()
+    logger.info(
+        f"Vote import finished: {summary['imported']} imported, {summary['rejected']} rejected "
+        f"({summary['rows_per_second']} rows/s)"
+    )
+    return summary
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test idempotent donation order creation (routes/donation_routes.py)
+"""
+
+import asyncio
+import sys
+
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+# Add current directory to path
+sys.path.insert(0, '.')
+
+from routes.donation_routes import DonationCreate, create_donation_order
+from services.razorpay_service import razorpay_service
+
+class FakeDonations:
+    """The donations calls made by create-order, on equality filters"""
+
+    def __init__(self):
+        self.docs = []
+
+    def _match(self, doc, query):
+        return all(doc.get(field) == value for field, value in query.items())
+
+    async def find_one(self, query, projection=None):
+        return next((dict(doc) for doc in self.docs if self._match(doc, query)), None)
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        existing = await self.find_one(query)
+        if existing is None and upsert:
+            self.docs.append(dict(update["$setOnInsert"]))
+        return existing
+
+    async def insert_one(self, doc):
+        if any(d["_id"] == doc["_id"] for d in self.docs):
+            raise DuplicateKeyError("duplicate _id")
+        self.docs.append(dict(doc))
+
+    async def update_one(self, query, update):
+        for doc in self.docs:
+            if self._match(doc, query):
+                doc.update(update["$set"])
+                return
+
+    async def delete_one(self, query):
+        for doc in self.docs:
+            if self._match(doc, query):
+                self.docs.remove(doc)
+                return
+
+class FakeDb:
+    def __init__(self):
+        self.donations = FakeDonations()
+
+class FakeGateway:
+    """create_order_async that fails the first ``failures`` calls"""
+
+    def __init__(self, failures=0, error=RuntimeError("gateway timeout")):
+        self.failures = failures
+        self.error = error
+        self.orders = 0
+
+    async def create_order_async(self, amount, currency="INR", receipt=None, notes=None):
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        self.orders += 1
+        return {"success": True, "order_id": f"order_{self.orders}"}
+
+DONATION = DonationCreate(amount=500, donor_name="Asha", donor_email="asha@example.com")
+
+async def create(db, key="key-1", donation=DONATION):
+    return await create_donation_order(donation, idempotency_key=key, db=db)
+
+def with_gateway(gateway):
+    razorpay_service.client = object()
+    razorpay_service.create_order_async = gateway.create_order_async
+
+async def failed_then_retried():
+    db = FakeDb()
+    gateway = FakeGateway(failures=1)
+    with_gateway(gateway)
+    try:
+        await create(db)
+    except HTTPException as e:
+        assert e.status_code == 500
+    else:
+        raise AssertionError("expected HTTPException")
+    assert db.donations.docs == []
+    return await create(db), db
+
+def test_failed_order_releases_the_idempotency_key():
+    """A retry after a gateway error creates the order instead of a 409"""
+    order, db = asyncio.run(failed_then_retried())
+
+    assert order["order_id"] == "order_1"
+    assert len(db.donations.docs) == 1
+    assert db.donations.docs[0]["razorpay_order_id"] == "order_1"
+
+async def cancelled_then_retried():
+    db = FakeDb()
+    gateway = FakeGateway(failures=1, error=asyncio.CancelledError())
+    with_gateway(gateway)
+    try:
+        await create(db)
+    except asyncio.CancelledError:
+        pass
+    else:
+        raise AssertionError("expected CancelledError")
+    assert db.donations.docs == []
+    return await create(db)
+
+def test_cancelled_order_releases_the_idempotency_key():
+    order = asyncio.run(cancelled_then_retried())
+    assert order["order_id"] == "order_1"
+
+async def created_then_replayed():
+    db = FakeDb()
+    gateway = FakeGateway()
+    with_gateway(gateway)
+    first = await create(db)
+    second = await create(db)
+    try:
+        await create(db, donation=DonationCreate(amount=900, donor_name="Asha", donor_email="asha@example.com"))
+    except HTTPException as e:
+        mismatch = e.status_code
+    return first, second, mismatch, gateway.orders
+
+def test_retry_replays_the_first_order():
+    first, second, mismatch, orders = asyncio.run(created_then_replayed())
+
+    assert second == first
+    assert orders == 1
+    assert mismatch == 409
+
+if __name__ == "__main__":
+    test_failed_order_releases_the_idempotency_key()
+    test_cancelled_order_releases_the_idempotency_key()
+    test_retry_replays_the_first_order()
+    print("✅ Donation order tests passed")
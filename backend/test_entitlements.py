@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test the single-flight lookups of the entitlement cache (services/entitlements.py)
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.insert(0, '.')
+
+from services.entitlements import EntitlementCache
+
+class FakeSubscriptions:
+    """user_subscriptions.find_one that waits until released"""
+
+    def __init__(self):
+        self.queries = 0
+        self.release = asyncio.Event()
+
+    async def find_one(self, query, projection=None, sort=None):
+        self.queries += 1
+        await self.release.wait()
+        return {"tier_id": "premium", "end_date": datetime.utcnow() + timedelta(days=30)}
+
+class FakeDb:
+    def __init__(self):
+        self.user_subscriptions = FakeSubscriptions()
+
+async def cancel_first_caller():
+    cache = EntitlementCache(ttl_seconds=60, max_entries=10)
+    db = FakeDb()
+
+    first = asyncio.create_task(cache.get(db, "u"))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.get(db, "u"))
+    await asyncio.sleep(0)
+    first.cancel()
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert first.cancelled()
+
+    later = asyncio.create_task(cache.get(db, "u"))
+    await asyncio.sleep(0)
+    db.user_subscriptions.release.set()
+    later = await asyncio.wait_for(later, timeout=1)
+    waited = await asyncio.wait_for(waiter, timeout=1)
+    return cache, db, later, waited
+
+def test_cancelled_lookup_does_not_block_later_callers():
+    """A caller cancelled mid-query must not leave its future behind"""
+    cache, db, later, waited = asyncio.run(cancel_first_caller())
+
+    assert later is not None and later.tier_id == "premium"
+    assert waited == later
+    assert cache._pending == {}
+    # The cancelled query plus one retry shared by the waiter and the later call
+    assert db.user_subscriptions.queries == 2
+
+async def fail_first_lookup():
+    cache = EntitlementCache(ttl_seconds=60, max_entries=10)
+    db = FakeDb()
+
+    async def failing(query, projection=None, sort=None):
+        raise RuntimeError("mongo down")
+
+    db.user_subscriptions.find_one = failing
+    try:
+        await cache.get(db, "u")
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("expected RuntimeError")
+    return cache
+
+def test_failed_lookup_is_not_left_pending():
+    cache = asyncio.run(fail_first_lookup())
+    assert cache._pending == {}
+
+if __name__ == "__main__":
+    test_cancelled_lookup_does_not_block_later_callers()
+    test_failed_lookup_is_not_left_pending()
+    print("✅ Entitlement cache tests passed")
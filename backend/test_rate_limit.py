@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test the rate limits (services/rate_limit.py)
+"""
+
+import asyncio
+import json
+import sys
+
+# Add current directory to path
+sys.path.insert(0, '.')
+
+from services.rate_limit import (
+    RateLimiter,
+    RateLimitMiddleware,
+    RoutePolicy,
+    SlidingWindowLimiter,
+    TokenBucketStore,
+    parse_limits,
+)
+
+def limiter_for(spec: str) -> RateLimiter:
+    limiter = RateLimiter()
+    limiter.policies = {("POST", "/api/waitlist"): RoutePolicy("waitlist", "POST", "/api/waitlist", parse_limits(spec))}
+    limiter.store = TokenBucketStore(max_keys=1000)
+    return limiter
+
+class EchoApp:
+    """Answers 200 with the request body it received"""
+
+    async def __call__(self, scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": body})
+
+async def post(app, payload: dict, ip: str = "203.0.113.7"):
+    """One POST /api/waitlist through the ASGI app, with the body split in two messages"""
+    raw = json.dumps(payload).encode()
+    messages = [
+        {"type": "http.request", "body": raw[:5], "more_body": True},
+        {"type": "http.request", "body": raw[5:], "more_body": False},
+    ]
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/waitlist",
+        "headers": [(b"content-type", b"application/json"), (b"x-forwarded-for", ip.encode())],
+        "client": ("10.0.0.1", 1234),
+        "query_string": b"",
+    }
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    headers = dict(sent[0].get("headers", []))
+    return sent[0]["status"], headers, b"".join(message.get("body", b"") for message in sent[1:])
+
+def test_body_is_replayed_to_the_app():
+    """A policy keyed on the body reads it, and the route still gets all of it"""
+    app = RateLimitMiddleware(EchoApp(), limiter_for("ip:5/60,body.email:3/3600"))
+    payload = {"email": "Lead@Example.com", "firstName": "Lead"}
+
+    status, _, body = asyncio.run(post(app, payload))
+
+    assert status == 200
+    assert json.loads(body) == payload
+
+def test_refused_request_gets_429_with_retry_after():
+    app = RateLimitMiddleware(EchoApp(), limiter_for("ip:5/60,body.email:2/3600"))
+
+    async def run():
+        return [await post(app, {"email": "lead@example.com"}) for _ in range(3)]
+
+    responses = asyncio.run(run())
+
+    assert [status for status, _, _ in responses] == [200, 200, 429]
+    _, headers, body = responses[2]
+    assert int(headers[b"retry-after"]) >= 1
+    assert json.loads(body) == {"detail": "Too many requests, please try again later"}
+    assert app.limiter.limited["waitlist"] == 1
+
+def test_refused_request_does_not_drain_earlier_buckets():
+    """Refused by the email bucket: the IP bucket gets its token back"""
+    app = RateLimitMiddleware(EchoApp(), limiter_for("ip:3/3600,body.email:1/3600"))
+
+    async def run():
+        statuses = [(await post(app, {"email": "same@example.com"}))[0] for _ in range(4)]
+        # The IP bucket has two tokens left: one taken by the first request, none by the refused ones
+        statuses += [(await post(app, {"email": f"other{i}@example.com"}))[0] for i in range(3)]
+        return statuses
+
+    assert asyncio.run(run()) == [200, 429, 429, 429, 200, 200, 429]
+
+def test_sliding_window_lets_a_client_back_in():
+    limiter = SlidingWindowLimiter("reset", limit=2, window_seconds=0.2)
+
+    async def run():
+        decisions = [await limiter.hit("a@example.com") for _ in range(3)]
+        await asyncio.sleep(0.25)
+        decisions.append(await limiter.hit("a@example.com"))
+        return decisions
+
+    decisions = asyncio.run(run())
+
+    assert [decision.allowed for decision in decisions] == [True, True, False, True]
+    assert 0 < decisions[2].retry_after <= 0.2
+
+if __name__ == "__main__":
+    test_body_is_replayed_to_the_app()
+    test_refused_request_gets_429_with_retry_after()
+    test_refused_request_does_not_drain_earlier_buckets()
+    test_sliding_window_lets_a_client_back_in()
+    print("✅ Rate limit tests passed")
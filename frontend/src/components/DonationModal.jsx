@@ -8,8 +8,13 @@ import { Textarea } from './ui/textarea';
 import { donationAPI } from '../services/api';
 import { toast } from '../hooks/use-toast';
 
+// One key per distinct donation attempt, so a retried click reuses the same Razorpay order
+const newIdempotencyKey = () =>
+  window.crypto?.randomUUID ? window.crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
 const DonationModal = ({ onClose }) => {
   const [loading, setLoading] = useState(false);
+  const [idempotencyKey, setIdempotencyKey] = useState(newIdempotencyKey);
   const [customAmount, setCustomAmount] = useState('');
   const [selectedAmount, setSelectedAmount] = useState(500);
   const [formData, setFormData] = useState({
@@ -24,17 +29,20 @@ const DonationModal = ({ onClose }) => {
   const handleAmountSelect = (amount) => {
     setSelectedAmount(amount);
     setCustomAmount('');
+    setIdempotencyKey(newIdempotencyKey());
   };
 
   const handleCustomAmountChange = (e) => {
     const value = e.target.value;
     setCustomAmount(value);
     setSelectedAmount(null);
+    setIdempotencyKey(newIdempotencyKey());
   };
 
   const handleChange = (e) => {
     const { name, value } = e.target;
     setFormData({ ...formData, [name]: value });
+    setIdempotencyKey(newIdempotencyKey());
   };
 
   const handleDonate = async () => {
@@ -68,7 +76,7 @@ const DonationModal = ({ onClose }) => {
         donor_email: formData.donor_email,
         donor_phone: formData.donor_phone,
         message: formData.message
-      });
+      }, idempotencyKey);
 
       const { order_id, key_id } = orderResponse.data;
 
@@ -106,7 +106,9 @@ export const subscriptionAPI = {
 
 // Donation APIs
 export const donationAPI = {
-  createOrder: (data) => api.post('/donations/create-order', data),
+  createOrder: (data, idempotencyKey) => api.post('/donations/create-order', data, {
+    headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {},
+  }),
   verifyPayment: (data) => api.post('/donations/verify-payment', data),
   getStats: () => api.get('/donations/stats'),
   getRecent: (limit) => api.get(`/donations/recent?limit=${limit || 10}`),